@@ -7,38 +7,169 @@ Created by URDev
 import sys
 import time
 import argparse
-from urllib.parse import urljoin, urlparse
+from urllib.parse import urljoin, urlparse, urlsplit
+from array import array
 from collections import deque
+from email.utils import parsedate_to_datetime
+from contextlib import contextmanager, redirect_stdout
+from functools import lru_cache, wraps
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+import concurrent.futures
 import threading
+import multiprocessing
+import heapq
+import itertools
+import hashlib
+import math
+import random
+import re
+import signal
+from html.parser import HTMLParser
 import json
+import zlib
+from xml.etree import ElementTree
+import codecs
+import tempfile
+import io
+import platform
+import sqlite3
 import os
+import copy
+import contextvars
+import importlib
+import importlib.util
+from collections.abc import MutableMapping
 
 # Third-party imports (must be installed separately)
 try:
-    import requests
-    from bs4 import BeautifulSoup
     from colorama import init, Fore, Style
     COLORAMA_AVAILABLE = True
 except ImportError as e:
-    print(f"Error: Missing required module: {e}")
-    print("Install with: pip install requests beautifulsoup4 colorama")
-    sys.exit(1)
+    raise ImportError(f"{e} - install with: pip install requests beautifulsoup4 colorama") from e
 
-# Initialize colorama for cross-platform colors
-init(autoreset=True)
+# Optional: peak memory reporting (not available on Windows)
+try:
+    import resource
+except ImportError:
+    resource = None
+
+class LazyModule:
+    """
+    Stand-in for a module that is imported on first attribute access.
+    Heavy and optional dependencies load only once a crawl needs them, so
+    importing rovercrawler as a library stays fast.
+    """
+    
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+    
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+def module_available(name):
+    """Whether a module can be imported, without importing it"""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+# HTTP client of the threaded backend, by far the slowest import
+requests = LazyModule('requests')
+if not module_available('requests'):
+    raise ImportError("No module named 'requests' - install with: pip install requests beautifulsoup4 colorama")
+
+# requests' transport; raw body reads raise its exceptions unwrapped
+urllib3 = LazyModule('urllib3')
+
+# Default link extractor (--parser soup)
+bs4 = LazyModule('bs4')
+
+# Optional: lxml link extractor (--parser lxml)
+lxml_etree = LazyModule('lxml.etree')
+LXML_AVAILABLE = module_available('lxml')
+
+# Optional: vectorized link-graph analysis (--graph)
+np = LazyModule('numpy')
+NUMPY_AVAILABLE = module_available('numpy')
+
+# Optional: HTTP/2 client (--http2)
+httpx = LazyModule('httpx')
+HTTPX_AVAILABLE = module_available('httpx')
+
+# Optional: asyncio backend (--async)
+asyncio = LazyModule('asyncio')
+aiohttp = LazyModule('aiohttp')
+AIOHTTP_AVAILABLE = module_available('aiohttp')
 
 # ============================================================================
 # 1. GLOBAL CONFIGURATION
 # ============================================================================
 
-CONFIG = {
+DEFAULT_CONFIG = {
     "max_depth": 3,
     "max_pages": 100,           # Safety limit
     "follow_external": False,
     "timeout": 10,
     "verbose": False,
     "user_agent": "Mozilla/5.0 (compatible; RoverCrawler/2.1; +https://github.com/urdev)",
-    "rate_limit": 0.5,          # Seconds between requests
+    "rate_limit": 0.5,          # Seconds between requests to the same host
+    "max_host_delay": 60,       # Upper bound for adaptive per-host backoff
+    "workers": 1,               # Concurrent fetch/parse workers
+    "link_parser": "soup",      # Link extractor: soup, fast or lxml
+    "parse_processes": 0,       # Worker processes for link extraction (0 = in-thread)
+    "parse_batch": 16,          # Max pages shipped to a parse process at once
+    "bloom_capacity": 0,        # Expected URLs for Bloom-filter dedup (0 = exact)
+    "bloom_error": 0.001,       # Bloom-filter false positive rate
+    "state_dir": None,          # Directory for crawl checkpoints (None = disabled)
+    "resume": False,            # Continue the crawl saved in state_dir
+    "checkpoint_pages": 100,    # Checkpoint after this many processed pages...
+    "checkpoint_interval": 30,  # ...or this many seconds, whichever comes first
+    "cache_dir": None,          # Directory for the conditional-request HTTP cache
+    "cache_max_mb": 256,        # Size limit for cached link lists
+    "ndjson_path": None,        # Stream one JSON record per page to this file
+    "ndjson_batch": 50,         # Records buffered between writes
+    "pool_per_host": 0,         # Pooled connections per host (0 = max(workers, 10))
+    "pool_total": 100,          # Pooled connections across all hosts
+    "keep_alive": True,         # Reuse connections between requests
+    "keepalive_timeout": 15,    # Seconds an idle connection is kept (async/HTTP2)
+    "http2": False,             # Multiplexed HTTP/2 client (needs httpx[http2])
+    "retries": 0,               # Re-queue attempts for failed/transient responses
+    "retry_backoff": 1.0,       # Host pause before a retry, doubled per attempt
+    "max_body_bytes": 10 * 1024 * 1024,  # Stop reading a page after this many bytes (0 = no cap)
+    "prefilter": False,         # Skip URLs learned to be non-HTML
+    "head_probe": False,        # HEAD-check unfamiliar extensions before fetching
+    "prefilter_min_samples": 3, # Observations before a URL pattern is trusted
+    "prefilter_explore": 20,    # Fetch 1 in N predicted non-HTML URLs anyway
+    "shared_dir": None,         # Directory shared with distributed workers (None = local crawl)
+    "shared_window": 256,       # URLs handed out to workers ahead of the tree
+    "lease_batch": 16,          # URLs a worker leases at a time
+    "lease_seconds": 30,        # Leases not renewed for this long are handed out again
+    "local_workers": 0,         # Worker processes the coordinator starts itself
+    "trap_detect": False,       # Cap URL patterns and skip near-duplicate pages
+    "trap_pattern_cap": 100,    # URLs admitted per path template (/page/#, /cal/#/#)
+    "trap_max_segments": 12,    # Longer paths are treated as traps
+    "trap_max_path": 300,       # Path length (characters) treated as a trap
+    "trap_repeat": 3,           # A path segment this many times is a trap (0 = off)
+    "simhash_distance": 6,      # Link-set simhash bits within which pages are duplicates
+    "simhash_min_links": 8,     # Pages with fewer links are never called duplicates
+    "metrics_port": None,       # Serve /metrics and /status on 127.0.0.1:PORT
+    "status_file": None,        # Rewrite a JSON status file while crawling
+    "status_interval": 5,       # Seconds between status samples
+    "link_graph": False,        # Record every link as an edge (not only tree edges)
+    "pagerank": False,          # Rank the link graph with PageRank
+    "pagerank_damping": 0.85,   # PageRank damping factor
+    "robots": False,            # Obey robots.txt rules and Crawl-delay
+    "robots_agent": "RoverCrawler",  # Name matched against robots.txt User-agent lines
+    "sitemaps": False,          # Seed the frontier from sitemaps (implies robots)
+    "sitemap_max_files": 100,   # Sitemap files read, counting index entries
+    "crawl_order": "bfs",       # Frontier order: 'bfs' (FIFO) or 'priority' (scored)
+    "score_weights": {"depth": 1.0, "novelty": 2.0, "inlinks": 0.5},  # Priority frontier features
+    "dir_cap": 0,               # Pages per directory before the rest wait (0 = no cap, priority only)
+    "incremental_dir": None,    # Site snapshot to recrawl against (None = full crawl)
+    "batch_sites": 0,           # Sites crawled at once in batch mode (0 = 2 x workers)
     "colors": {
         "root": Fore.GREEN + Style.BRIGHT,
         "link": Fore.CYAN,
@@ -51,6 +182,126 @@ CONFIG = {
     }
 }
 
+class CrawlConfig(dict):
+    """
+    Settings for one crawler: DEFAULT_CONFIG updated with `base` (a dict
+    of settings, possibly partial) and then with keyword overrides.
+    Unknown keys raise KeyError rather than being silently ignored.
+    """
+    
+    def __init__(self, base=None, **overrides):
+        super().__init__(copy.deepcopy(DEFAULT_CONFIG))
+        for settings in (base or {}, overrides):
+            unknown = sorted(set(settings) - set(DEFAULT_CONFIG))
+            if unknown:
+                raise KeyError(f"Unknown config keys: {', '.join(unknown)}")
+            self.update(copy.deepcopy(dict(settings)))
+
+# Settings an incremental recrawl replaces with its snapshot, or cannot honour
+# (its own frontier has no sitemap seeding, trap checks, prefilter or order)
+INCREMENTAL_EXCLUDES = (
+    ('shared_dir', 'distributed crawling'),
+    ('state_dir', 'checkpoints'),
+    ('cache_dir', 'the HTTP cache'),
+    ('ndjson_path', 'a page stream'),
+    ('parse_processes', 'parse processes'),
+    ('link_graph', 'the link graph'),
+    ('sitemaps', 'sitemap seeding'),
+    ('trap_detect', 'trap detection'),
+    ('prefilter', 'the content-type prefilter'),
+    ('head_probe', 'HEAD probes'),
+    ('crawl_order', 'the priority order'),
+    ('bloom_capacity', 'Bloom-filter dedup'),
+)
+
+def check_config(config):
+    """
+    Raise ValueError for settings that cannot be combined. Crawlers check
+    their config before starting; the CLI checks its own up front.
+    """
+    if config['bloom_capacity']:
+        # Both look known URLs up by id, which a Bloom filter cannot do
+        if config['link_graph']:
+            raise ValueError("The link graph needs exact URL ids and is not supported with Bloom-filter dedup")
+        if config['crawl_order'] == 'priority':
+            raise ValueError("The priority order needs exact URL ids to count in-links and is not "
+                             "supported with Bloom-filter dedup")
+    if config['link_graph'] and config['resume']:
+        raise ValueError("The link graph is not checkpointed and cannot be resumed")
+    if config['resume'] and not (config['state_dir'] or config['shared_dir']):
+        raise ValueError("Resuming needs a state directory (or a shared directory)")
+    if config['shared_dir'] and config['cache_dir']:
+        raise ValueError("The HTTP cache is not supported in distributed crawls")
+    if config['incremental_dir']:
+        for key, feature in INCREMENTAL_EXCLUDES:
+            if config[key] != DEFAULT_CONFIG[key]:
+                raise ValueError(f"An incremental recrawl does not support {feature}")
+    if config['http2'] and not HTTPX_AVAILABLE:
+        raise ValueError("HTTP/2 requires httpx: pip install 'httpx[http2]'")
+    if config['link_parser'] == 'lxml' and not LXML_AVAILABLE:
+        raise ValueError("The lxml link parser requires lxml: pip install lxml")
+
+# The CrawlConfig in effect in the current thread or asyncio task, if any
+_active_config = contextvars.ContextVar('rovercrawler_config')
+
+# What the CLI configures, and what CONFIG means outside any crawler
+_process_config = CrawlConfig()
+
+class ActiveConfig(MutableMapping):
+    """
+    The module-wide CONFIG: a view of the CrawlConfig in effect in the
+    current context (see use_config), or of the process-wide settings
+    when none is. Crawlers activate their own config while they run, so
+    crawls with different settings can share one process.
+    """
+    
+    @staticmethod
+    def current():
+        """The CrawlConfig reads and writes go to"""
+        return _active_config.get(_process_config)
+    
+    def __getitem__(self, key):
+        return _active_config.get(_process_config)[key]
+    
+    def __setitem__(self, key, value):
+        _active_config.get(_process_config)[key] = value
+    
+    def __delitem__(self, key):
+        del _active_config.get(_process_config)[key]
+    
+    def __iter__(self):
+        return iter(self.current())
+    
+    def __len__(self):
+        return len(self.current())
+    
+    def __repr__(self):
+        return f"ActiveConfig({self.current()!r})"
+
+CONFIG = ActiveConfig()
+
+@contextmanager
+def use_config(config):
+    """Make `config` what CONFIG reads in this context until the block ends"""
+    token = _active_config.set(config)
+    try:
+        yield config
+    finally:
+        _active_config.reset(token)
+
+def config_thread_pool(workers):
+    """ThreadPoolExecutor whose threads see the CONFIG in effect here"""
+    return ThreadPoolExecutor(max_workers=workers, initializer=_active_config.set,
+                              initargs=(ActiveConfig.current(),))
+
+def configured(method):
+    """Run a crawler method with the crawler's own config in effect"""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with use_config(self.config):
+            return method(self, *args, **kwargs)
+    return wrapper
+
 # ============================================================================
 # 2. BANNER DISPLAY
 # ============================================================================
@@ -77,6 +328,10 @@ def print_banner():
 # 3. URL NORMALIZATION & FILTERING
 # ============================================================================
 
+# File extensions never worth fetching
+SKIP_EXTENSIONS = ('.pdf', '.jpg', '.jpeg', '.png', '.gif', '.zip',
+                   '.tar', '.gz', '.exe', '.dmg', '.mp3', '.mp4', '.avi')
+
 def normalize_url(base_url, link):
     """
     Normalize a URL relative to base URL
@@ -136,37 +391,468 @@ def should_crawl_url(url, root_domain, visited):
             return False
     
     # Check file extensions to skip
-    skip_extensions = {'.pdf', '.jpg', '.jpeg', '.png', '.gif', '.zip', 
-                      '.tar', '.gz', '.exe', '.dmg', '.mp3', '.mp4', '.avi'}
-    if any(url.lower().endswith(ext) for ext in skip_extensions):
+    if url.lower().endswith(SKIP_EXTENSIONS):
         return False
     
     return True
 
+class UrlFilter:
+    """
+    Per-crawl URL normalizer and filter.
+    
+    Built once per crawl with the extension and scheme rules precompiled.
+    Normalization is memoized on (base, href) - or on href alone for
+    absolute links - and crawl decisions are memoized per URL, so the
+    navigation links repeated on every page are parsed only once.
+    """
+    
+    ABSOLUTE_PREFIXES = ('http://', 'https://')
+    
+    def __init__(self, root_domain=None, follow_external=None, cache_size=65536, robots=None):
+        self.root_domain = (root_domain or '').lower()
+        self.follow_external = CONFIG['follow_external'] if follow_external is None else follow_external
+        self.robots = robots        # RobotsCache, or None to ignore robots.txt
+        self._normalize = lru_cache(maxsize=cache_size)(normalize_url)
+        self.allows = lru_cache(maxsize=cache_size)(self._allows)
+        self.host = lru_cache(maxsize=cache_size)(self._host)
+    
+    def normalize(self, base_url, link):
+        """Memoized normalize_url"""
+        if not link:
+            return None
+        if link.startswith(self.ABSOLUTE_PREFIXES):
+            # urljoin leaves absolute http(s) links untouched, so the base is
+            # irrelevant and one cache entry serves every page
+            return self._normalize('', link)
+        return self._normalize(base_url, link)
+    
+    def normalize_all(self, base_url, links):
+        """Normalize every href found on one page, returning a set of URLs"""
+        normalize = self.normalize
+        result = {normalize(base_url, link) for link in links}
+        result.discard(None)
+        return result
+    
+    @staticmethod
+    def _host(url):
+        """Host (netloc) of a URL"""
+        return urlsplit(url).netloc
+    
+    def _allows(self, url):
+        """Domain, scheme, extension and robots.txt rules for a normalized URL (dedup is left to the caller)"""
+        if not self._admits(url):
+            return False
+        if self.robots is not None and not self.robots.allows(url):
+            return False
+        return True
+    
+    def _admits(self, url):
+        """Domain, scheme and extension rules alone"""
+        if not url or not url.startswith(self.ABSOLUTE_PREFIXES):
+            return False
+        if not self.follow_external and self.host(url) != self.root_domain:
+            return False
+        return not url.endswith(SKIP_EXTENSIONS)
+    
+    def robots_pending(self, links):
+        """
+        One link per host among `links` that allows() would have to fetch
+        (or wait for) robots.txt to decide on, so a fetch worker can get
+        the rules in before the coordinator asks
+        """
+        if self.robots is None:
+            return []
+        pending = {}
+        for link in links:
+            if self._admits(link):
+                host = self.host(link)
+                if host not in pending and not self.robots.known(host):
+                    pending[host] = link
+        return list(pending.values())
+
+# Extensions that are served as HTML often enough never to be probed
+HTML_EXTENSIONS = ('', '.html', '.htm', '.xhtml', '.shtml', '.php', '.asp', '.aspx', '.jsp', '.cgi')
+
+class ContentTypePrefilter:
+    """
+    Learns which URLs are not HTML, so they need not be fetched at all.
+    
+    Every response's Content-Type is recorded against the URL's first two
+    and first path segments (per host) and its extension, consulted in
+    that order. Once a key has `min_samples` observations that are at
+    least 90% non-HTML, matching URLs are predicted non-HTML and skipped.
+    One in `explore` of those is fetched anyway, and an HTML answer
+    retrains the key, so a wrong prediction does not stick; when a key
+    stops predicting non-HTML, learn() hands back the URLs it skipped so
+    they can be fetched after all. URLs with an extension that no key
+    knows can optionally be probed with HEAD before the GET.
+    """
+    
+    NON_HTML_RATIO = 0.9
+    
+    def __init__(self, min_samples=None, explore=None, head_probe=None):
+        self.min_samples = CONFIG['prefilter_min_samples'] if min_samples is None else min_samples
+        self.explore = CONFIG['prefilter_explore'] if explore is None else explore
+        self.head_probe = CONFIG['head_probe'] if head_probe is None else head_probe
+        self.seen = {}       # key -> [html count, non-html count]
+        self.skipped = {}    # key -> predictions made, for exploration
+        self.skipped_urls = {}  # key -> URLs skipped on its prediction
+    
+    @staticmethod
+    def extension(url):
+        """'.pdf' for /files/report.pdf, '' without an extension"""
+        last = urlsplit(url).path.rsplit('/', 1)[-1]
+        dot = last.rfind('.')
+        return last[dot:] if dot > 0 else ''
+    
+    @classmethod
+    def keys(cls, url):
+        """
+        Path-prefix keys from most to least specific, then the extension
+        key. Extensionless URLs have no extension key: they are too varied
+        to share one.
+        """
+        parts = urlsplit(url)
+        segments = parts.path.split('/')[1:]
+        keys = []
+        for depth in (2, 1):
+            if len(segments) > depth:
+                keys.append(('prefix', parts.netloc + '/' + '/'.join(segments[:depth])))
+        extension = cls.extension(url)
+        if extension:
+            keys.append(('ext', extension))
+        return keys
+    
+    def learn(self, url, is_html):
+        """
+        Record a response's Content-Type. Returns the URLs skipped on a key
+        that this HTML answer has stopped predicting non-HTML
+        """
+        released = []
+        for key in self.keys(url):
+            counts = self.seen.setdefault(key, [0, 0])
+            counts[0 if is_html else 1] += 1
+            if is_html and key in self.skipped_urls and not self._verdict(key):
+                released.extend(self.skipped_urls.pop(key))
+        return released
+    
+    def _verdict(self, key):
+        """True if the key predicts non-HTML, False if HTML, None if unsure"""
+        counts = self.seen.get(key)
+        if counts is None or counts[0] + counts[1] < self.min_samples:
+            return None
+        return counts[1] >= self.NON_HTML_RATIO * (counts[0] + counts[1])
+    
+    def predict(self, url):
+        """(key, verdict) from the first key with a confident verdict"""
+        for key in self.keys(url):
+            verdict = self._verdict(key)
+            if verdict is not None:
+                return key, verdict
+        return None, None
+    
+    def skip(self, url):
+        """
+        True if the URL should not be fetched. Returns None (fetch it)
+        for the occasional predicted-non-HTML URL kept as an exploration
+        sample, so callers can count a misprediction if it turns out HTML
+        """
+        key, verdict = self.predict(url)
+        if not verdict:
+            return False
+        made = self.skipped[key] = self.skipped.get(key, 0) + 1
+        if self.explore and made % self.explore == 0:
+            return None
+        self.skipped_urls.setdefault(key, []).append(url)
+        return True
+    
+    def should_probe(self, url):
+        """HEAD-check URLs with an unfamiliar extension and no prediction"""
+        if not self.head_probe:
+            return False
+        return self.extension(url) not in HTML_EXTENSIONS and self.predict(url)[1] is None
+
+# Path segments that look like session or object ids rather than names
+ID_SEGMENT = re.compile(r'^(?=.*\d)(?=.*[a-z])[0-9a-z_-]{16,}$')
+
+def url_pattern(url, query=True):
+    """
+    Shape of a URL: host and path with digit runs as '#' and id-like
+    segments as '*', plus the sorted query keys unless `query` is False
+    """
+    parts = urlsplit(url)
+    segments = ['*' if ID_SEGMENT.match(segment) else re.sub(r'\d+', '#', segment)
+                for segment in parts.path.split('/')]
+    pattern = parts.netloc + '/'.join(segments)
+    if query and parts.query:
+        keys = sorted({pair.split('=', 1)[0] for pair in parts.query.split('&')})
+        pattern += '?' + '&'.join(keys)
+    return pattern
+
+def simhash(features):
+    """64-bit simhash of a set of strings (near-identical sets -> few differing bits)"""
+    ones = [0] * 64
+    for feature in features:
+        value = int.from_bytes(hashlib.blake2b(feature.encode('utf-8', 'surrogatepass'),
+                                               digest_size=8).digest(), 'little')
+        while value:
+            low = value & -value
+            ones[low.bit_length() - 1] += 1
+            value ^= low
+    half = len(features) / 2
+    return sum(1 << bit for bit, count in enumerate(ones) if count > half)
+
+class TrapDetector:
+    """
+    Stops a crawl from spending its page budget inside a crawler trap.
+    
+    Newly discovered URLs are refused when their path is very long or
+    repeats a segment (/a/b/a/b/a), or once `pattern_cap` URLs with the
+    same url_pattern() (query ignored) were admitted (/page/#, /cal/#/#/#, /s/*/...).
+    
+    Fetched pages are fingerprinted with a simhash of their link set; a page
+    within `distance` bits of an earlier one is not descended into. Hashes
+    are indexed by `distance + 1` bit blocks - two hashes that close share
+    at least one block exactly - so a lookup only compares a few candidates.
+    """
+    
+    def __init__(self, pattern_cap=None, max_segments=None, max_path=None, repeat=None,
+                 distance=None, min_links=None):
+        self.pattern_cap = CONFIG['trap_pattern_cap'] if pattern_cap is None else pattern_cap
+        self.max_segments = CONFIG['trap_max_segments'] if max_segments is None else max_segments
+        self.max_path = CONFIG['trap_max_path'] if max_path is None else max_path
+        self.repeat = CONFIG['trap_repeat'] if repeat is None else repeat
+        self.distance = CONFIG['simhash_distance'] if distance is None else distance
+        self.min_links = CONFIG['simhash_min_links'] if min_links is None else min_links
+        self.templates = {}         # template -> URLs admitted
+        self.pruned = {}            # url -> (reason, template)
+        self.block_bits = 64 // (self.distance + 1)
+        self.blocks = [{} for _ in range(self.distance + 1)]   # block value -> [(hash, url)]
+        self.duplicates = []        # (url, near-duplicate of)
+    
+    def _reason(self, url):
+        path = urlsplit(url).path
+        segments = [segment for segment in path.split('/') if segment]
+        if len(segments) > self.max_segments or len(path) > self.max_path:
+            return 'long_path', None
+        if self.repeat and segments:
+            counts = {}
+            for segment in segments:
+                counts[segment] = counts.get(segment, 0) + 1
+            if max(counts.values()) >= self.repeat:
+                return 'repeated_segments', None
+        template = url_pattern(url, query=False)
+        admitted = self.templates.get(template, 0)
+        if self.pattern_cap and admitted >= self.pattern_cap:
+            return 'pattern_cap', template
+        self.templates[template] = admitted + 1
+        return None, template
+    
+    def admit(self, url):
+        """Whether a newly discovered URL may be queued"""
+        if url in self.pruned:
+            return False
+        reason, template = self._reason(url)
+        if reason is None:
+            return True
+        self.pruned[url] = (reason, template)
+        if CONFIG['verbose']:
+            print(f"{CONFIG['colors']['dim']}[i] Trap ({reason}): {url}{CONFIG['colors']['reset']}")
+        return False
+    
+    def duplicate_of(self, url, links):
+        """The earlier page whose link set nearly matches this one's, or None (and remember it)"""
+        if len(links) < self.min_links:
+            return None
+        fingerprint = simhash(links)
+        mask = (1 << self.block_bits) - 1
+        keys = [(fingerprint >> (index * self.block_bits)) & mask for index in range(len(self.blocks))]
+        for index, key in enumerate(keys):
+            for other, other_url in self.blocks[index].get(key, ()):
+                if bin(fingerprint ^ other).count('1') <= self.distance:
+                    self.duplicates.append((url, other_url))
+                    if CONFIG['verbose']:
+                        print(f"{CONFIG['colors']['dim']}[i] Near-duplicate of {other_url}, not descending: {url}{CONFIG['colors']['reset']}")
+                    return other_url
+        for index, key in enumerate(keys):
+            self.blocks[index].setdefault(key, []).append((fingerprint, url))
+        return None
+    
+    def counts(self):
+        """Pruned URLs per reason"""
+        counts = {'pattern_cap': 0, 'repeated_segments': 0, 'long_path': 0}
+        for reason, _ in self.pruned.values():
+            counts[reason] += 1
+        return counts
+    
+    def report(self, examples=5):
+        """What was pruned and why, as a JSON-serializable dict"""
+        by_template = {}
+        other = {'repeated_segments': [], 'long_path': []}
+        for url, (reason, template) in self.pruned.items():
+            if reason == 'pattern_cap':
+                by_template.setdefault(template, []).append(url)
+            else:
+                other[reason].append(url)
+        return {
+            'pruned_urls': len(self.pruned),
+            'by_reason': self.counts(),
+            'patterns': [{'template': template, 'admitted': self.templates[template],
+                          'pruned': len(urls), 'examples': sorted(urls)[:examples]}
+                         for template, urls in sorted(by_template.items(), key=lambda item: -len(item[1]))],
+            'repeated_segments': sorted(other['repeated_segments'])[:examples],
+            'long_paths': sorted(other['long_path'])[:examples],
+            'duplicate_pages': [{'url': url, 'duplicate_of': original}
+                                for url, original in self.duplicates],
+        }
+
 # ============================================================================
 # 4. HTML PARSING
 # ============================================================================
 
-def extract_links(html_content, base_url):
+# Tags whose href attribute is collected as a link
+LINK_TAGS = ('a', 'link')
+
+class SoupHrefParser:
+    """Reference extractor: builds a full BeautifulSoup tree, then searches it"""
+    
+    def __init__(self):
+        self.chunks = []
+    
+    def feed(self, data):
+        self.chunks.append(data)
+    
+    def close(self):
+        soup = bs4.BeautifulSoup(''.join(self.chunks), 'html.parser')
+        return [tag['href'] for tag in soup.find_all(list(LINK_TAGS), href=True)]
+
+class FastHrefParser(HTMLParser):
+    """
+    Streaming extractor built on html.parser events.
+    
+    Uses the same tokenizer as the soup extractor, but looks at each start
+    tag once and keeps nothing except the href values.
+    """
+    
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.hrefs = []
+    
+    def handle_starttag(self, tag, attrs):
+        if tag in LINK_TAGS:
+            href = None
+            for name, value in attrs:
+                if name == 'href':
+                    href = value  # Last duplicate wins, as in BeautifulSoup
+            if href:
+                self.hrefs.append(href)
+    
+    handle_startendtag = handle_starttag
+    
+    def close(self):
+        super().close()
+        return self.hrefs
+
+class _LxmlHrefTarget:
+    """lxml parser target that records hrefs without building a tree"""
+    
+    def __init__(self):
+        self.hrefs = []
+    
+    def start(self, tag, attrib):
+        if tag in LINK_TAGS:
+            href = attrib.get('href')
+            if href:
+                self.hrefs.append(href)
+    
+    def end(self, tag):
+        pass
+    
+    def data(self, data):
+        pass
+    
+    def close(self):
+        return self.hrefs
+
+class LxmlHrefParser:
+    """
+    Streaming extractor built on libxml2; the fastest option.
+    
+    libxml2 keeps the first of a repeated attribute where html.parser keeps
+    the last, and drops the rest without reporting it. Chunks are scanned
+    for a link tag with two hrefs, and such pages are re-parsed with
+    FastHrefParser so every parser returns the same links. (Markup inside
+    <textarea> or <title> is text to libxml2, but not to html.parser in
+    older Python versions.)
+    """
+    
+    DUPLICATE_HREF = re.compile(r'<(?:a|link)\s[^>]*?\bhref\s*=[^>]*?\shref\s*=', re.IGNORECASE)
+    MAX_TAIL = 4096
+    
+    def __init__(self):
+        self.parser = lxml_etree.HTMLParser(target=_LxmlHrefTarget())
+        self.chunks = []
+        self.tail = ''          # Unterminated tag carried into the next chunk
+        self.duplicate = False
+    
+    def feed(self, data):
+        self.chunks.append(data)
+        if not self.duplicate:
+            text = self.tail + data
+            self.duplicate = self.DUPLICATE_HREF.search(text) is not None
+            start = text.rfind('<')
+            self.tail = text[start:start + self.MAX_TAIL] if start >= 0 and '>' not in text[start:] else ''
+        self.parser.feed(data)
+    
+    def close(self):
+        hrefs = self.parser.close()
+        if not self.duplicate:
+            return hrefs
+        fallback = FastHrefParser()
+        for chunk in self.chunks:
+            fallback.feed(chunk)
+        return fallback.close()
+
+def make_href_parser(kind=None):
+    """
+    Create an incremental href parser (feed() chunks, close() -> hrefs)
+    kind is 'soup', 'fast' or 'lxml' (defaults to CONFIG['link_parser'])
+    """
+    kind = kind or CONFIG['link_parser']
+    if kind == 'fast':
+        return FastHrefParser()
+    if kind == 'lxml':
+        if not LXML_AVAILABLE:
+            raise RuntimeError("The lxml link parser requires lxml: pip install lxml")
+        return LxmlHrefParser()
+    if kind == 'soup':
+        return SoupHrefParser()
+    raise ValueError(f"Unknown link parser: {kind}")
+
+def extract_links(html_content, base_url, parser=None, url_filter=None, timings=None):
     """
     Extract all unique links from HTML content
     """
     links = set()
     
     try:
-        soup = BeautifulSoup(html_content, 'html.parser')
-        
-        # Find all anchor tags
-        for a_tag in soup.find_all('a', href=True):
-            url = normalize_url(base_url, a_tag['href'])
-            if url:
-                links.add(url)
-        
-        # Also check for link tags (less common)
-        for link_tag in soup.find_all('link', href=True):
-            url = normalize_url(base_url, link_tag['href'])
-            if url:
-                links.add(url)
+        start = time.perf_counter()
+        href_parser = make_href_parser(parser)
+        href_parser.feed(html_content)
+        
+        # Anchor tags plus link tags (less common)
+        hrefs = href_parser.close()
+        parsed = time.perf_counter()
+        if url_filter is not None:
+            links = url_filter.normalize_all(base_url, hrefs)
+        else:
+            for href in hrefs:
+                url = normalize_url(base_url, href)
+                if url:
+                    links.add(url)
+        if timings is not None:
+            timings.record('parse', parsed - start)
+            timings.record('normalize', time.perf_counter() - parsed)
                 
     except Exception as e:
         if CONFIG['verbose']:
@@ -174,216 +860,3703 @@ def extract_links(html_content, base_url):
     
     return links
 
-# ============================================================================
-# 5. CRAWLER CORE
-# ============================================================================
+# Normalization cache for the current parse worker process
+_process_url_filter = None
 
-class RoverCrawler:
-    """Main crawler class"""
+def parse_batch(pages, parser=None):
+    """
+    Extract links for a batch of (html, url) pages
+    Runs inside parse worker processes, so it returns plain sorted lists
+    """
+    global _process_url_filter
+    if _process_url_filter is None:
+        _process_url_filter = UrlFilter()
+    return [sorted(extract_links(html, url, parser, _process_url_filter)) for html, url in pages]
+
+class ParseStage:
+    """
+    Optional pipeline stage that runs link extraction in worker processes.
     
-    def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': CONFIG['user_agent']
-        })
-        self.last_request_time = 0
-        self.lock = threading.Lock()
-        self.stats = {
-            'pages_crawled': 0,
-            'links_found': 0,
-            'errors': 0,
-            'start_time': time.time()
-        }
+    Downloaded pages are grouped into batches to amortize pickling and IPC;
+    submit() returns a per-page Future resolved when its batch comes back.
+    The coordinator keeps sole ownership of the crawl state.
+    """
     
-    def rate_limit(self):
-        """Enforce rate limiting between requests"""
-        current_time = time.time()
-        elapsed = current_time - self.last_request_time
-        if elapsed < CONFIG['rate_limit']:
-            time.sleep(CONFIG['rate_limit'] - elapsed)
-        self.last_request_time = time.time()
+    def __init__(self, processes, batch_size=None, parser=None):
+        self.pool = ProcessPoolExecutor(max_workers=processes)
+        self.batch_size = max(1, batch_size or CONFIG['parse_batch'])
+        self.parser = parser or CONFIG['link_parser']
+        self.batch = []      # (html, url, future) not yet shipped
     
-    def fetch_url(self, url):
-        """Fetch a URL with error handling"""
-        self.rate_limit()
-        
-        if CONFIG['verbose']:
-            print(f"{CONFIG['colors']['info']}[→] Fetching: {url}{CONFIG['colors']['reset']}")
-        
-        try:
-            response = self.session.get(
-                url,
-                timeout=CONFIG['timeout'],
-                allow_redirects=True,
-                verify=True  # SSL verification
-            )
-            
-            # Check if it's HTML
-            content_type = response.headers.get('Content-Type', '').lower()
-            if 'text/html' not in content_type:
-                if CONFIG['verbose']:
-                    print(f"{CONFIG['colors']['dim']}[i] Skipping non-HTML: {content_type[:30]}{CONFIG['colors']['reset']}")
-                return None
-            
-            # Check status code
-            if response.status_code != 200:
-                if CONFIG['verbose']:
-                    print(f"{CONFIG['colors']['warning']}[!] Status {response.status_code}: {url}{CONFIG['colors']['reset']}")
-                return None
-            
-            self.stats['pages_crawled'] += 1
-            return response.text
-            
-        except requests.exceptions.RequestException as e:
-            if CONFIG['verbose']:
-                print(f"{CONFIG['colors']['error']}[!] Request failed: {e}{CONFIG['colors']['reset']}")
-            self.stats['errors'] += 1
-            return None
-        except Exception as e:
-            if CONFIG['verbose']:
-                print(f"{CONFIG['colors']['error']}[!] Unexpected error: {e}{CONFIG['colors']['reset']}")
-            self.stats['errors'] += 1
-            return None
+    def submit(self, html, url):
+        """Queue a page for parsing, shipping the batch once it is full"""
+        future = Future()
+        if html is None:
+            future.set_result(None)
+            return future
+        self.batch.append((html, url, future))
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+        return future
     
-    def crawl(self, start_url, max_depth=None):
-        """
-        Main crawl function using BFS for more predictable results
-        Returns tree structure
-        """
-        if max_depth is None:
-            max_depth = CONFIG['max_depth']
+    def flush(self):
+        """Ship whatever is queued, even if the batch is not full"""
+        if not self.batch:
+            return
+        batch, self.batch = self.batch, []
+        job = self.pool.submit(parse_batch, [(html, url) for html, url, _ in batch], self.parser)
         
-        root_domain = urlparse(start_url).netloc
-        visited = set()
-        to_visit = deque([(start_url, 0)])  # (url, depth)
-        tree = {}
-        
-        print(f"{CONFIG['colors']['info']}[*] Starting crawl of {start_url}{CONFIG['colors']['reset']}")
-        print(f"{CONFIG['colors']['dim']}[*] Max depth: {max_depth}, Max pages: {CONFIG['max_pages']}{CONFIG['colors']['reset']}")
+        def deliver(job):
+            try:
+                results = job.result()
+            except Exception as e:
+                for _, _, future in batch:
+                    future.set_exception(e)
+                return
+            for (_, _, future), links in zip(batch, results):
+                future.set_result(links)
         
-        url_parent_map = {start_url: None}
+        job.add_done_callback(deliver)
+    
+    def submit_page(self, page):
+        """Queue a fetched PageResult; the Future resolves to it with links filled in"""
+        future = Future()
+        if page.html is None:
+            # Failed, skipped or answered from the cache - nothing to parse
+            future.set_result(page)
+            return future
         
-        while to_visit and len(visited) < CONFIG['max_pages']:
-            current_url, depth = to_visit.popleft()
-            
-            # Skip if already visited or too deep
-            if current_url in visited or depth > max_depth:
-                continue
-            
-            visited.add(current_url)
-            
-            # Fetch the page
-            html = self.fetch_url(current_url)
-            if html is None:
-                continue
-            
-            # Extract links
-            links = extract_links(html, current_url)
-            self.stats['links_found'] += len(links)
-            
-            if CONFIG['verbose']:
-                print(f"{CONFIG['colors']['dim']}[i] Found {len(links)} links at depth {depth}{CONFIG['colors']['reset']}")
-            
-            # Process each link
-            for link in links:
-                if link not in visited and should_crawl_url(link, root_domain, visited):
-                    to_visit.append((link, depth + 1))
-                    url_parent_map[link] = current_url
-            
-            # Update progress
-            if len(visited) % 10 == 0:
-                elapsed = time.time() - self.stats['start_time']
-                print(f"{CONFIG['colors']['dim']}[i] Progress: {len(visited)} pages, {len(to_visit)} in queue ({elapsed:.1f}s){CONFIG['colors']['reset']}")
+        def attach(links_future):
+            try:
+                page.links = links_future.result()
+            except Exception as e:
+                future.set_exception(e)
+                return
+            page.html = None
+            future.set_result(page)
         
-        # Build tree structure from parent map
-        return self._build_tree(start_url, url_parent_map, visited)
+        self.submit(page.html, page.url).add_done_callback(attach)
+        return future
     
-    def _build_tree(self, root_url, parent_map, visited_urls):
-        """Build tree structure from parent-child relationships"""
-        # First, find all children for each URL
-        children_map = {}
-        for url in visited_urls:
-            parent = parent_map.get(url)
-            if parent:
-                if parent not in children_map:
-                    children_map[parent] = []
-                children_map[parent].append(url)
-        
-        # Recursively build tree
-        def build_subtree(url):
-            subtree = {}
-            for child in children_map.get(url, []):
-                subtree[child] = build_subtree(child)
-            return subtree
-        
-        return {root_url: build_subtree(root_url)}
+    def collect(self, pending):
+        """Stage every finished download in the pending window"""
+        for entry in pending:
+            job = entry[2]
+            if entry[3] is None and (not isinstance(job, Future) or job.done()):
+                entry[3] = self.submit_page(job.result() if isinstance(job, Future) else job)
     
-    def print_stats(self):
-        """Print crawling statistics"""
-        elapsed = time.time() - self.stats['start_time']
-        print(f"\n{CONFIG['colors']['info']}{'='*60}{CONFIG['colors']['reset']}")
-        print(f"{CONFIG['colors']['root']}CRAWL STATISTICS:{CONFIG['colors']['reset']}")
-        print(f"{CONFIG['colors']['dim']}  Pages crawled: {self.stats['pages_crawled']}")
-        print(f"  Links found:  {self.stats['links_found']}")
-        print(f"  Errors:       {self.stats['errors']}")
-        print(f"  Time elapsed: {elapsed:.1f} seconds")
-        if elapsed > 0:
-            print(f"  Avg speed:    {self.stats['pages_crawled']/elapsed:.1f} pages/sec{CONFIG['colors']['reset']}")
-        print(f"{CONFIG['colors']['info']}{'='*60}{CONFIG['colors']['reset']}")
+    def result(self, entry):
+        """Wait for a pending entry to be downloaded and parsed"""
+        if entry[3] is None:
+            job = entry[2]
+            entry[3] = self.submit_page(job.result() if isinstance(job, Future) else job)
+        if not entry[3].done():
+            self.flush()
+        return entry[3].result()
+    
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
 
 # ============================================================================
-# 6. TREE RENDERING
+# 5. POLITENESS SCHEDULING
 # ============================================================================
 
-def print_tree(tree, prefix="", is_last=True, is_root=True):
+def parse_retry_after(value):
+    """Parse a Retry-After header (seconds or HTTP date) into seconds"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+class HostPoliteness:
     """
-    Print tree structure with colors and formatting
+    Per-host request spacing.
+    
+    Each host has its own next-allowed time, so requests to different hosts
+    never wait on each other while each host still sees `rate_limit` spacing.
+    The spacing backs off on 429/503 and Retry-After, and relaxes again on
+    successful responses.
     """
-    if not tree:
-        return
     
-    items = list(tree.items())
-    for i, (url, children) in enumerate(items):
-        is_last_item = (i == len(items) - 1)
-        
-        # Determine branch characters
-        if is_root and i == 0:
-            branch = ""
-            new_prefix = ""
-        else:
-            branch = "└── " if is_last_item else "├── "
-            new_prefix = prefix + ("    " if is_last_item else "│   ")
-        
-        # Color coding
-        parsed = urlparse(url)
-        root_domain = urlparse(list(tree.keys())[0]).netloc
-        
-        if parsed.netloc != root_domain:
-            color = CONFIG['colors']['external']
-            suffix = " (external)"
-        else:
-            color = CONFIG['colors']['link']
-            suffix = ""
-        
-        # Print the line
-        print(f"{prefix}{branch}{color}{parsed.path or '/'}{suffix}{CONFIG['colors']['reset']}")
-        
-        # Recursively print children
-        print_tree(children, new_prefix, is_last_item, False)
-
-# ============================================================================
-# 7. INTERACTIVE MODE
-# ============================================================================
-
-def interactive_setup():
-    """Interactive configuration setup"""
-    print(f"{CONFIG['colors']['root']}INTERACTIVE MODE{CONFIG['colors']['reset']}")
-    print(f"{CONFIG['colors']['dim']}Configure the crawler (press Enter for defaults):{CONFIG['colors']['reset']}")
-    print()
+    BACKOFF_STATUSES = (429, 503)
     
-    # Get target URL
-    while True:
-        url = input(f"{CONFIG['colors']['info']}Target URL (include http:// or https://): {CONFIG['colors']['reset']}").strip()
+    def __init__(self, delay=None, max_delay=None):
+        self.base_delay = CONFIG['rate_limit'] if delay is None else delay
+        self.max_delay = CONFIG['max_host_delay'] if max_delay is None else max_delay
+        self.lock = threading.Lock()
+        self.next_allowed = {}   # host -> timestamp
+        self.delays = {}         # host -> current spacing (only when != base)
+        self.paused_until = {}   # host -> end of the last backoff/defer pause
+    
+    def delay(self, host):
+        """Current spacing for a host"""
+        return self.delays.get(host, self.base_delay)
+    
+    def set_delay(self, host, delay):
+        """Override the spacing for a host (e.g. from Crawl-delay)"""
+        with self.lock:
+            self.delays[host] = min(max(delay, self.base_delay), self.max_delay)
+    
+    def ready_at(self, host):
+        """Earliest time the next request to `host` may start"""
+        return self.next_allowed.get(host, 0)
+    
+    def paused(self, host):
+        """Whether a backoff or defer() currently holds off requests to a host"""
+        return self.paused_until.get(host, 0) > time.time()
+    
+    def _pause(self, host, seconds):
+        until = time.time() + seconds
+        self.next_allowed[host] = max(self.next_allowed.get(host, 0), until)
+        self.paused_until[host] = max(self.paused_until.get(host, 0), until)
+    
+    def reserve(self, host):
+        """Claim the next request slot for a host and return its start time"""
+        with self.lock:
+            now = time.time()
+            slot = max(now, self.next_allowed.get(host, 0))
+            self.next_allowed[host] = slot + self.delays.get(host, self.base_delay)
+        return slot
+    
+    def defer(self, host, seconds):
+        """Hold off all requests to a host for `seconds`"""
+        with self.lock:
+            self._pause(host, min(seconds, self.max_delay))
+    
+    def feedback(self, host, status_code, retry_after=None):
+        """Adapt a host's spacing to the response it just returned"""
+        with self.lock:
+            current = self.delays.get(host, self.base_delay)
+            if status_code in self.BACKOFF_STATUSES:
+                wait = parse_retry_after(retry_after)
+                backed_off = min(max(current * 2, 1.0), self.max_delay)
+                self.delays[host] = backed_off
+                self._pause(host, min(wait, self.max_delay) if wait is not None else backed_off)
+            elif host in self.delays and status_code < 400:
+                # Decay back towards the configured spacing
+                relaxed = max(self.base_delay, current * 0.75)
+                if relaxed <= self.base_delay:
+                    del self.delays[host]
+                else:
+                    self.delays[host] = relaxed
+
+class UrlHeap:
+    """
+    Max-priority queue with O(log n) push, pop and priority update.
+    
+    Updating an item pushes a new entry and marks the old one stale; stale
+    entries are dropped when they reach the top. Equal priorities pop in
+    insertion order, so a constant score behaves like a FIFO.
+    """
+    
+    _STALE = object()
+    
+    def __init__(self):
+        self.heap = []              # [-priority, order, item]
+        self.entries = {}           # item -> its live heap entry
+        self.counter = itertools.count()
+    
+    def __len__(self):
+        return len(self.entries)
+    
+    def __bool__(self):
+        return bool(self.entries)
+    
+    def __contains__(self, item):
+        return item in self.entries
+    
+    def push(self, item, priority):
+        """Queue an item, or move an already queued one to a new priority"""
+        old = self.entries.get(item)
+        if old is not None:
+            old[2] = self._STALE
+        entry = [-priority, next(self.counter), item]
+        self.entries[item] = entry
+        heapq.heappush(self.heap, entry)
+    
+    def pop(self):
+        """Remove the highest-priority item: (item, priority)"""
+        while self.heap:
+            priority, _, item = heapq.heappop(self.heap)
+            if item is not self._STALE:
+                del self.entries[item]
+                return item, -priority
+        raise IndexError('pop from an empty UrlHeap')
+
+def url_directory(url):
+    """Host and path up to the last '/'"""
+    parts = urlsplit(url)
+    return parts.netloc + parts.path[:parts.path.rfind('/') + 1]
+
+class CrawlOrder:
+    """
+    Scores queued URL ids for a priority frontier; higher is crawled first.
+    
+    The score is a weighted sum of FEATURES (`name: function(order, url_id)`;
+    pass `features` or subclass to plug in others):
+      depth    -depth, so shallow pages still tend to come first
+      novelty  1 / (1 + pages already fetched with the same url_pattern()),
+               so the 40th '/page/#' waits behind a path shape not seen yet
+      inlinks  log2(1 + times the URL has been linked so far)
+    Once `dir_cap` pages of a directory were fetched, its other URLs sink
+    below everything else: they are only crawled if the budget allows.
+    
+    Novelty and caps only fall as the crawl goes on, so HostFrontier
+    re-scores lazily when an item reaches the top; in-links only rise and
+    are pushed with HostFrontier.update().
+    """
+    
+    FEATURES = {
+        'depth': lambda order, url_id: -order.store.depths[url_id],
+        'novelty': lambda order, url_id: 1.0 / (1 + order.patterns.get(url_pattern(order.store.urls[url_id]), 0)),
+        'inlinks': lambda order, url_id: math.log2(1 + order.inlinks.get(url_id, 1)),
+    }
+    CAPPED = -1e6
+    
+    def __init__(self, store, weights=None, dir_cap=None, features=None):
+        self.store = store
+        self.weights = dict(CONFIG['score_weights'] if weights is None else weights)
+        self.dir_cap = CONFIG['dir_cap'] if dir_cap is None else dir_cap
+        self.features = dict(self.FEATURES)
+        self.features.update(features or {})
+        unknown = set(self.weights) - set(self.features)
+        if unknown:
+            raise ValueError(f"unknown score feature(s): {', '.join(sorted(unknown))}")
+        self.patterns = {}          # url pattern -> pages fetched
+        self.directories = {}       # directory -> pages fetched
+        self.inlinks = {}           # url id -> links to it seen (when above 1)
+    
+    def score(self, url_id):
+        score = sum(weight * self.features[name](self, url_id)
+                    for name, weight in self.weights.items() if weight)
+        if self.dir_cap and self.directories.get(url_directory(self.store.urls[url_id]), 0) >= self.dir_cap:
+            score += self.CAPPED
+        return score
+    
+    def dispatched(self, url_id):
+        """Count a URL leaving the frontier against its pattern and directory"""
+        url = self.store.urls[url_id]
+        pattern = url_pattern(url)
+        self.patterns[pattern] = self.patterns.get(pattern, 0) + 1
+        directory = url_directory(url)
+        self.directories[directory] = self.directories.get(directory, 0) + 1
+    
+    def linked(self, url_id):
+        """Count another link to an already discovered URL"""
+        self.inlinks[url_id] = self.inlinks.get(url_id, 1) + 1
+
+def parse_score_weights(spec):
+    """Parse 'depth=1,novelty=2' into a weights dict"""
+    weights = {}
+    for item in spec.split(','):
+        if not item.strip():
+            continue
+        name, _, value = item.partition('=')
+        name = name.strip()
+        if name not in CrawlOrder.FEATURES:
+            raise ValueError(f"unknown score feature: {name}")
+        weights[name] = float(value) if value else 1.0
+    return weights
+
+class HostFrontier:
+    """
+    Crawl queue split into per-host FIFO queues.
+    
+    Items are (url, depth) tuples, or anything else if the host is passed
+    to append() explicitly (the crawler queues plain URL ids).
+    
+    popleft() serves the host that may be fetched soonest, so a window of
+    workers interleaves ready hosts instead of queueing behind one slow or
+    throttled host. With a single host it behaves exactly like a deque.
+    
+    With a CrawlOrder, items must be URL ids and each host queue is a
+    UrlHeap: a host's best-scored URL is served instead of its oldest.
+    """
+    
+    def __init__(self, politeness, items=(), order=None):
+        self.politeness = politeness
+        self.order = order
+        self.queues = {}     # host -> deque (or UrlHeap) of items
+        self.host_order = {} # host -> first-seen index (stable tie-break)
+        self.ready = []      # heap of (ready_at, order, host)
+        self.size = 0
+        for item in items:
+            self.append(item)
+    
+    def __len__(self):
+        return self.size
+    
+    def __bool__(self):
+        return self.size > 0
+    
+    def append(self, item, host=None):
+        if host is None:
+            host = urlparse(item[0]).netloc
+        queue = self.queues.get(host)
+        if queue is None:
+            queue = self.queues[host] = deque() if self.order is None else UrlHeap()
+            self.host_order.setdefault(host, len(self.host_order))
+        if not queue:
+            heapq.heappush(self.ready, (self.politeness.ready_at(host), self.host_order[host], host))
+        if self.order is None:
+            queue.append(item)
+        else:
+            queue.push(item, self.order.score(item))
+        self.size += 1
+    
+    def update(self, item, host):
+        """Re-score an item if it is still queued (priority frontier only)"""
+        queue = self.queues.get(host)
+        if self.order is not None and queue is not None and item in queue:
+            queue.push(item, self.order.score(item))
+    
+    def _soonest(self):
+        """(ready time, order, host) of the host that may be fetched soonest"""
+        while True:
+            ready_at, order, host = self.ready[0]
+            actual = self.politeness.ready_at(host)
+            if actual > ready_at:
+                # Host was reserved or throttled since it was pushed
+                heapq.heapreplace(self.ready, (actual, order, host))
+                continue
+            return actual, order, host
+    
+    def next_ready(self):
+        """Earliest time popleft() may serve a host (the queue must not be empty)"""
+        return self._soonest()[0]
+    
+    def popleft(self):
+        actual, order, host = self._soonest()
+        queue = self.queues[host]
+        item = queue.popleft() if self.order is None else self._pop_best(queue)
+        self.size -= 1
+        if queue:
+            heapq.heapreplace(self.ready, (actual, order, host))
+        else:
+            heapq.heappop(self.ready)
+        return item
+    
+    def _pop_best(self, queue):
+        """Pop the best item, re-queueing any whose score fell since it was pushed"""
+        while True:
+            item, priority = queue.pop()
+            score = self.order.score(item)
+            if score < priority and queue:
+                queue.push(item, score)
+                continue
+            self.order.dispatched(item)
+            return item
+
+# ============================================================================
+# 6. URL STORE
+# ============================================================================
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter for seen-checks on very large crawls.
+    
+    Uses about 1.8 bytes (14.4 bits) per expected URL at a 0.1% error rate; a false
+    positive means a URL is wrongly treated as seen and never crawled.
+    """
+    
+    def __init__(self, capacity, error_rate=0.001):
+        capacity = max(1, capacity)
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+    
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+    
+    def __contains__(self, key):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+    
+    def add(self, key):
+        """Add a key, returning True if it was (probably) new"""
+        new = False
+        for pos in self._positions(key):
+            mask = 1 << (pos & 7)
+            if not self.bits[pos >> 3] & mask:
+                self.bits[pos >> 3] |= mask
+                new = True
+        return new
+
+class UrlStore:
+    """
+    Compact record of every URL discovered during a crawl.
+    
+    Each URL is stored once and referred to by an integer id everywhere
+    else: the frontier queues ids, and parents and depths live in typed
+    arrays indexed by id. Dedup happens when a URL is first discovered, so
+    the frontier never holds duplicates. With a Bloom capacity, the
+    url -> id index is replaced by a Bloom filter; the id -> url list is
+    still kept, so this saves the dict (tens of bytes per URL) but not
+    the URL strings themselves.
+    """
+    
+    def __init__(self, bloom_capacity=None):
+        bloom_capacity = CONFIG['bloom_capacity'] if bloom_capacity is None else bloom_capacity
+        self.urls = []                   # id -> url
+        self.parents = array('l')        # id -> parent id (-1 for the root)
+        self.depths = array('H')         # id -> crawl depth
+        self.visited = bytearray()       # id -> 1 once dispatched
+        self.visited_count = 0
+        if bloom_capacity:
+            self.index = None
+            self.bloom = BloomFilter(bloom_capacity, CONFIG['bloom_error'])
+        else:
+            self.index = {}              # url -> id
+            self.bloom = None
+    
+    def __len__(self):
+        return len(self.urls)
+    
+    def __contains__(self, url):
+        if self.bloom is not None:
+            return url in self.bloom
+        return url in self.index
+    
+    def add(self, url, parent_id=-1, depth=0):
+        """Intern a newly discovered URL and return its id, or None if already seen"""
+        if self.bloom is not None:
+            if not self.bloom.add(url):
+                return None
+        elif url in self.index:
+            return None
+        return self._intern(url, parent_id, depth)
+    
+    def restore(self, url, parent_id, depth):
+        """Re-add a URL loaded from a checkpoint, keeping ids stable"""
+        if self.bloom is not None:
+            self.bloom.add(url)
+        return self._intern(url, parent_id, depth)
+    
+    def _intern(self, url, parent_id, depth):
+        url_id = len(self.urls)
+        if self.index is not None:
+            self.index[url] = url_id
+        self.urls.append(url)
+        self.parents.append(parent_id)
+        self.depths.append(depth)
+        self.visited.append(0)
+        return url_id
+    
+    def mark_visited(self, url_id):
+        if not self.visited[url_id]:
+            self.visited[url_id] = 1
+            self.visited_count += 1
+    
+    def visited_ids(self):
+        """Ids of dispatched URLs, in discovery order"""
+        return [url_id for url_id, flag in enumerate(self.visited) if flag]
+
+class LinkGraph:
+    """
+    Every link between known URLs, as two parallel integer arrays.
+    
+    Edges are (source id, target id) pairs of UrlStore ids, appended as
+    pages are processed; nothing is kept per node, so the graph costs 16
+    bytes per edge. Degrees, CSR adjacency and PageRank are computed from
+    the arrays when asked for, vectorized with NumPy when it is installed.
+    """
+    
+    def __init__(self):
+        self.sources = array('q')
+        self.targets = array('q')
+    
+    def __len__(self):
+        return len(self.sources)
+    
+    def add(self, source, targets):
+        """Record the links of one page (targets: ids, without duplicates)"""
+        self.sources.extend(itertools.repeat(source, len(targets)))
+        self.targets.extend(targets)
+    
+    def _numpy_edges(self):
+        return (np.frombuffer(self.sources, dtype=np.int64),
+                np.frombuffer(self.targets, dtype=np.int64))
+    
+    def degrees(self, nodes):
+        """(in-degree, out-degree) sequences indexed by id"""
+        if NUMPY_AVAILABLE:
+            sources, targets = self._numpy_edges()
+            return np.bincount(targets, minlength=nodes), np.bincount(sources, minlength=nodes)
+        in_degree = array('q', bytes(8 * nodes))
+        out_degree = array('q', bytes(8 * nodes))
+        for target in self.targets:
+            in_degree[target] += 1
+        for source in self.sources:
+            out_degree[source] += 1
+        return in_degree, out_degree
+    
+    def csr(self, nodes):
+        """(indptr, indices): the targets of id i are indices[indptr[i]:indptr[i + 1]]"""
+        if NUMPY_AVAILABLE:
+            sources, targets = self._numpy_edges()
+            indptr = np.zeros(nodes + 1, dtype=np.int64)
+            np.cumsum(np.bincount(sources, minlength=nodes), out=indptr[1:])
+            return indptr, targets[np.argsort(sources, kind='stable')]
+        # Counting sort by source
+        _, out_degree = self.degrees(nodes)
+        indptr = array('q', bytes(8 * (nodes + 1)))
+        for node in range(nodes):
+            indptr[node + 1] = indptr[node] + out_degree[node]
+        position = array('q', indptr[:-1])
+        indices = array('q', bytes(8 * len(self.targets)))
+        for source, target in zip(self.sources, self.targets):
+            indices[position[source]] = target
+            position[source] += 1
+        return indptr, indices
+    
+    def pagerank(self, nodes, damping=None, iterations=100, tolerance=1e-9):
+        """PageRank by power iteration; rank of dangling pages is spread evenly"""
+        damping = CONFIG['pagerank_damping'] if damping is None else damping
+        if not nodes:
+            return []
+        if NUMPY_AVAILABLE:
+            sources, targets = self._numpy_edges()
+            out_degree = np.bincount(sources, minlength=nodes)
+            share = np.divide(1.0, out_degree, out=np.zeros(nodes), where=out_degree > 0)
+            dangling = out_degree == 0
+            rank = np.full(nodes, 1.0 / nodes)
+            for _ in range(iterations):
+                passed = np.bincount(targets, weights=(rank * share)[sources], minlength=nodes)
+                new = damping * passed + (1 - damping + damping * rank[dangling].sum()) / nodes
+                delta = np.abs(new - rank).sum()
+                rank = new
+                if delta < tolerance:
+                    break
+            return rank
+        
+        _, out_degree = self.degrees(nodes)
+        share = [1.0 / degree if degree else 0.0 for degree in out_degree]
+        dangling = [node for node, degree in enumerate(out_degree) if not degree]
+        rank = [1.0 / nodes] * nodes
+        for _ in range(iterations):
+            passed = [0.0] * nodes
+            for source, target in zip(self.sources, self.targets):
+                passed[target] += rank[source] * share[source]
+            base = (1 - damping + damping * sum(rank[node] for node in dangling)) / nodes
+            new = [base + damping * value for value in passed]
+            delta = sum(abs(a - b) for a, b in zip(new, rank))
+            rank = new
+            if delta < tolerance:
+                break
+        return rank
+
+# ============================================================================
+# 7. CHECKPOINTING
+# ============================================================================
+
+class CrawlState:
+    """
+    SQLite checkpoint of a crawl, kept in `state_dir/crawl.sqlite`.
+    
+    Every discovered URL is stored with its id, parent id, depth and a done
+    flag (fetched and its links recorded). Saves are incremental: only new
+    URLs and newly finished pages are written. On resume, unfinished URLs -
+    including those that were in flight - go back on the queue in id order.
+    """
+    
+    FILENAME = 'crawl.sqlite'
+    
+    def __init__(self, state_dir):
+        os.makedirs(state_dir, exist_ok=True)
+        self.path = os.path.join(state_dir, self.FILENAME)
+        self.db = sqlite3.connect(self.path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS urls ("
+                        "id INTEGER PRIMARY KEY, url TEXT NOT NULL, parent INTEGER NOT NULL, "
+                        "depth INTEGER NOT NULL, done INTEGER NOT NULL DEFAULT 0)")
+        self.db.commit()
+        self.saved_urls = self.db.execute("SELECT COUNT(*) FROM urls").fetchone()[0]
+    
+    def start_url(self):
+        """Start URL of the saved crawl, or None"""
+        row = self.db.execute("SELECT value FROM meta WHERE key = 'start_url'").fetchone()
+        return row[0] if row else None
+    
+    @classmethod
+    def saved_start_url(cls, state_dir):
+        """Start URL recorded in a state directory, or None"""
+        path = os.path.join(state_dir, cls.FILENAME)
+        if not os.path.exists(path):
+            return None
+        db = sqlite3.connect(path)
+        try:
+            row = db.execute("SELECT value FROM meta WHERE key = 'start_url'").fetchone()
+        except sqlite3.Error:
+            row = None
+        finally:
+            db.close()
+        return row[0] if row else None
+    
+    def get_meta(self, key, default=None):
+        row = self.db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+    
+    def reset(self, start_url):
+        """Discard any previous state and start a new crawl"""
+        self.db.execute("DELETE FROM urls")
+        self.db.execute("DELETE FROM meta")
+        self.db.execute("INSERT INTO meta VALUES ('start_url', ?)", (start_url,))
+        self.db.commit()
+        self.saved_urls = 0
+    
+    def load(self, store):
+        """Fill an empty UrlStore from the checkpoint; return the ids still to crawl"""
+        queued = []
+        for url_id, url, parent, depth, done in self.db.execute(
+                "SELECT id, url, parent, depth, done FROM urls ORDER BY id"):
+            store.restore(url, parent, depth)
+            if done:
+                store.mark_visited(url_id)
+            else:
+                queued.append(url_id)
+        return queued
+    
+    def save(self, store, done_ids, stats):
+        """Write URLs discovered and pages finished since the last save"""
+        total = len(store)
+        with self.db:
+            self.db.executemany(
+                "INSERT OR IGNORE INTO urls (id, url, parent, depth) VALUES (?, ?, ?, ?)",
+                ((url_id, store.urls[url_id], store.parents[url_id], store.depths[url_id])
+                 for url_id in range(self.saved_urls, total)))
+            self.db.executemany("UPDATE urls SET done = 1 WHERE id = ?",
+                                ((url_id,) for url_id in done_ids))
+            self.db.execute("INSERT OR REPLACE INTO meta VALUES ('stats', ?)", (json.dumps(stats),))
+        self.saved_urls = total
+    
+    def close(self):
+        self.db.close()
+
+# ============================================================================
+# 8. HTTP CACHE
+# ============================================================================
+
+class CacheEntry:
+    """Validators and extracted links of a previously fetched page"""
+    
+    __slots__ = ('etag', 'last_modified', 'links', 'size')
+    
+    def __init__(self, etag, last_modified, links, size):
+        self.etag = etag
+        self.last_modified = last_modified
+        self.links = links
+        self.size = size
+
+class HttpCache:
+    """
+    Persistent conditional-request cache in `cache_dir/http_cache.sqlite`.
+    
+    Keyed by normalized URL, it keeps each page's ETag/Last-Modified and
+    the links extracted from it. Recrawls send If-None-Match /
+    If-Modified-Since, and a 304 reuses the stored links without
+    downloading or parsing the page. Least recently used entries are
+    evicted once the stored link lists exceed the size limit.
+    
+    Only the coordinator thread touches the cache.
+    """
+    
+    FILENAME = 'http_cache.sqlite'
+    
+    def __init__(self, cache_dir, max_mb=None):
+        os.makedirs(cache_dir, exist_ok=True)
+        max_mb = CONFIG['cache_max_mb'] if max_mb is None else max_mb
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.db = sqlite3.connect(os.path.join(cache_dir, self.FILENAME))
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS pages ("
+                        "url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, links TEXT NOT NULL, "
+                        "body_bytes INTEGER NOT NULL, stored_bytes INTEGER NOT NULL, accessed REAL NOT NULL)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS pages_accessed ON pages (accessed)")
+        self.db.commit()
+        self.total_bytes = self.db.execute("SELECT COALESCE(SUM(stored_bytes), 0) FROM pages").fetchone()[0]
+        self.writes = 0
+    
+    def lookup(self, url):
+        """Cached entry for a URL, or None"""
+        row = self.db.execute("SELECT etag, last_modified, links, body_bytes FROM pages WHERE url = ?",
+                              (url,)).fetchone()
+        if row is None:
+            return None
+        self.db.execute("UPDATE pages SET accessed = ? WHERE url = ?", (time.time(), url))
+        etag, last_modified, links, body_bytes = row
+        return CacheEntry(etag, last_modified, links.split('\n') if links else [], body_bytes)
+    
+    def store(self, url, etag, last_modified, links, body_bytes):
+        """Remember a page's validators and links"""
+        blob = '\n'.join(sorted(links))
+        stored = len(url) + len(blob) + len(etag or '') + len(last_modified or '')
+        old = self.db.execute("SELECT stored_bytes FROM pages WHERE url = ?", (url,)).fetchone()
+        if old:
+            self.total_bytes -= old[0]
+        self.db.execute("INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (url, etag, last_modified, blob, body_bytes, stored, time.time()))
+        self.total_bytes += stored
+        if self.total_bytes > self.max_bytes:
+            self.evict()
+        self.writes += 1
+        if self.writes % 100 == 0:
+            self.db.commit()
+    
+    def evict(self):
+        """Drop least recently used entries until the cache is at 90% of its limit"""
+        target = self.max_bytes * 0.9
+        rows = self.db.execute("SELECT url, stored_bytes FROM pages ORDER BY accessed")
+        doomed = []
+        for url, stored in rows:
+            if self.total_bytes <= target:
+                break
+            doomed.append((url,))
+            self.total_bytes -= stored
+        self.db.executemany("DELETE FROM pages WHERE url = ?", doomed)
+    
+    def close(self):
+        self.db.commit()
+        self.db.close()
+
+# ============================================================================
+# 9. INSTRUMENTATION
+# ============================================================================
+
+class PhaseHistogram:
+    """Latency histogram with power-of-two microsecond buckets"""
+    
+    __slots__ = ('count', 'total', 'max', 'buckets')
+    
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * 40     # Bucket b holds samples below 2**b microseconds
+    
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.buckets[min(39, int(seconds * 1e6).bit_length())] += 1
+    
+    def percentile(self, q):
+        """Upper bound of the bucket holding the q-th percentile, in seconds"""
+        if not self.count:
+            return 0.0
+        rank = math.ceil(q / 100 * self.count)
+        seen = 0
+        for bucket, hits in enumerate(self.buckets):
+            seen += hits
+            if seen >= rank:
+                return min(self.max, (1 << bucket) / 1e6)
+        return self.max
+    
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'total_s': round(self.total, 6),
+            'mean_ms': round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            'p50_ms': round(self.percentile(50) * 1000, 3),
+            'p95_ms': round(self.percentile(95) * 1000, 3),
+            'max_ms': round(self.max * 1000, 3),
+            'buckets_us': {1 << bucket: hits for bucket, hits in enumerate(self.buckets) if hits},
+        }
+
+class PhaseTimings:
+    """
+    Where crawl time goes, one histogram per hot-path phase.
+    
+    Recording is a bucket increment under a lock, cheap enough to leave on
+    for every crawl. Phases: rate_limit (politeness sleep), dns and connect
+    (async backend only; requests folds them into ttfb), ttfb (request sent
+    to headers received), download (body), parse (href extraction),
+    normalize (URL normalization), filter (scope checks, dedup and enqueue)
+    and dequeue (frontier pop and slot reservation).
+    """
+    
+    PHASES = ('rate_limit', 'dns', 'connect', 'ttfb', 'download',
+              'parse', 'normalize', 'filter', 'dequeue')
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.phases = {}
+    
+    def record(self, phase, seconds):
+        with self.lock:
+            histogram = self.phases.get(phase)
+            if histogram is None:
+                histogram = self.phases[phase] = PhaseHistogram()
+            histogram.add(seconds)
+    
+    def ordered(self):
+        """(phase, histogram) pairs in hot-path order"""
+        known = [(name, self.phases[name]) for name in self.PHASES if name in self.phases]
+        return known + [(name, h) for name, h in self.phases.items() if name not in self.PHASES]
+    
+    def to_dict(self):
+        with self.lock:
+            return {name: histogram.to_dict() for name, histogram in self.ordered()}
+
+def run_profiled(func, report_file, top=40):
+    """
+    Run func() under cProfile and tracemalloc and write a text report.
+    
+    The raw profile is saved next to the report as REPORT.prof for tools
+    like snakeviz. cProfile only sees the calling thread, so profile with
+    one worker (or the async backend) to capture fetch and parse time.
+    """
+    import cProfile
+    import pstats
+    import tracemalloc
+    profiler = cProfile.Profile()
+    tracemalloc.start()
+    profiler.enable()
+    try:
+        return func()
+    finally:
+        profiler.disable()
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        
+        report = io.StringIO()
+        report.write(f"RoverCrawler profile - {time.strftime('%Y-%m-%d %H:%M:%S')}\n\n")
+        report.write(f"CPU (top {top} by cumulative time)\n")
+        pstats.Stats(profiler, stream=report).sort_stats('cumulative').print_stats(top)
+        report.write(f"Memory (traced): current {current / 1048576:.1f} MB, peak {peak / 1048576:.1f} MB\n")
+        report.write(f"Top {top} allocation sites:\n")
+        for stat in snapshot.statistics('lineno')[:top]:
+            report.write(f"  {stat}\n")
+        with open(report_file, 'w', encoding='utf-8') as f:
+            f.write(report.getvalue())
+        profiler.dump_stats(report_file + '.prof')
+        print(f"{CONFIG['colors']['info']}[✓] Profile written to {report_file} (raw: {report_file}.prof){CONFIG['colors']['reset']}")
+
+def error_class(error):
+    """Short class of a fetch failure, for error counts by class"""
+    name = type(error).__name__.lower()
+    if 'timeout' in name:
+        return 'timeout'
+    if 'ssl' in name or 'certificate' in name:
+        return 'ssl'
+    if 'connect' in name:
+        return 'connection'
+    return 'request'
+
+class MetricsReporter:
+    """
+    Live crawl metrics for orchestration: an HTTP endpoint on 127.0.0.1
+    (`/metrics` in Prometheus text format, `/status` as JSON) and/or a JSON
+    status file rewritten every `interval` seconds.
+    
+    Everything runs in background threads that only read the crawler's
+    counters, so the crawl loop pays nothing beyond the counters themselves.
+    """
+    
+    MAX_HOSTS = 100                 # Hosts reported, busiest first
+    
+    def __init__(self, crawler, port=None, status_file=None, interval=None):
+        self.crawler = crawler
+        self.port = CONFIG['metrics_port'] if port is None else port
+        self.status_file = CONFIG['status_file'] if status_file is None else status_file
+        self.interval = CONFIG['status_interval'] if interval is None else interval
+        self.state = 'running'
+        self.rate = 0.0             # Pages processed per second over the last interval
+        self.stop_event = threading.Event()
+        self.threads = []
+        self.server = None
+    
+    def start(self):
+        """Start the sampler (and the endpoint, if a port was given); raises OSError if the port is taken"""
+        if self.port:
+            from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+            reporter = self
+            
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path == '/metrics':
+                        body = reporter.prometheus().encode('utf-8')
+                        content_type = 'text/plain; version=0.0.4; charset=utf-8'
+                    elif self.path in ('/', '/status'):
+                        body = json.dumps(reporter.snapshot(), indent=2).encode('utf-8')
+                        content_type = 'application/json'
+                    else:
+                        self.send_error(404)
+                        return
+                    self.send_response(200)
+                    self.send_header('Content-Type', content_type)
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                
+                def log_message(self, format, *args):
+                    pass
+            
+            self.server = ThreadingHTTPServer(('127.0.0.1', self.port), Handler)
+            self.server.daemon_threads = True
+            self.threads.append(threading.Thread(target=self.server.serve_forever, daemon=True))
+            print(f"{CONFIG['colors']['dim']}[*] Metrics on http://127.0.0.1:{self.server.server_address[1]}/metrics{CONFIG['colors']['reset']}")
+        self.threads.append(threading.Thread(target=self._sample, daemon=True))
+        for thread in self.threads:
+            thread.start()
+        return self
+    
+    def stop(self):
+        """Stop the threads, writing a last status file with the final state"""
+        if self.state == 'running':
+            self.state = 'finished'
+        self.stop_event.set()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+        for thread in self.threads:
+            thread.join(timeout=5)
+        self.write_status()
+    
+    def _sample(self):
+        last_count, last_time = self.crawler.processed, time.time()
+        while not self.stop_event.wait(self.interval):
+            count, now = self.crawler.processed, time.time()
+            self.rate = (count - last_count) / (now - last_time)
+            last_count, last_time = count, now
+            self.write_status()
+    
+    def write_status(self):
+        """Replace the status file atomically (readers never see half a file)"""
+        if not self.status_file:
+            return
+        temp = self.status_file + '.tmp'
+        try:
+            with open(temp, 'w') as f:
+                json.dump(self.snapshot(), f, indent=2)
+            os.replace(temp, self.status_file)
+        except OSError as e:
+            if CONFIG['verbose']:
+                print(f"{CONFIG['colors']['warning']}[!] Could not write status file: {e}{CONFIG['colors']['reset']}")
+    
+    def snapshot(self):
+        """Current metrics as a JSON-serializable dict"""
+        crawler = self.crawler
+        stats = crawler.stats
+        elapsed = time.time() - stats['start_time']
+        to_visit = getattr(crawler, 'to_visit', None)
+        pending = getattr(crawler, 'pending', None)
+        hosts = sorted(crawler.host_times.copy().items(), key=lambda item: -item[1][0])[:self.MAX_HOSTS]
+        return {
+            'state': self.state,
+            'elapsed': round(elapsed, 3),
+            'pages_processed': crawler.processed,
+            'pages_crawled': stats['pages_crawled'],
+            'pages_per_sec': round(self.rate, 2),
+            'pages_per_sec_avg': round(crawler.processed / elapsed, 2) if elapsed > 0 else 0.0,
+            'queue_depth': len(to_visit) if to_visit is not None else 0,
+            'in_flight': len(pending) if pending is not None else 0,
+            'errors': crawler.error_classes.copy(),
+            'bytes_downloaded': stats['bytes_downloaded'],
+            'retries': stats['retries'],
+            'hosts': {host: {'requests': count, 'avg_ms': round(total / count * 1000, 1),
+                             'max_ms': round(peak * 1000, 1)}
+                      for host, (count, total, peak) in hosts},
+        }
+    
+    def prometheus(self):
+        """Current metrics in the Prometheus text exposition format"""
+        status = self.snapshot()
+        lines = []
+        
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP rovercrawler_{name} {help_text}")
+            lines.append(f"# TYPE rovercrawler_{name} {kind}")
+            for labels, value in samples:
+                label_text = ','.join(f'{key}="{prometheus_escape(text)}"' for key, text in labels)
+                lines.append(f"rovercrawler_{name}{{{label_text}}} {value}" if label_text
+                             else f"rovercrawler_{name} {value}")
+        
+        metric('up', 'gauge', 'Whether the crawl is still running', [((), int(status['state'] == 'running'))])
+        metric('elapsed_seconds', 'gauge', 'Seconds since the crawl started', [((), status['elapsed'])])
+        metric('pages_processed_total', 'counter', 'Pages handled, failures included', [((), status['pages_processed'])])
+        metric('pages_crawled_total', 'counter', 'Pages fetched successfully', [((), status['pages_crawled'])])
+        metric('pages_per_second', 'gauge', 'Pages processed per second over the last interval', [((), status['pages_per_sec'])])
+        metric('queue_depth', 'gauge', 'URLs waiting in the frontier', [((), status['queue_depth'])])
+        metric('in_flight', 'gauge', 'Fetches dispatched and not yet processed', [((), status['in_flight'])])
+        metric('errors_total', 'counter', 'Failed fetches by class',
+               [((('class', name),), count) for name, count in sorted(status['errors'].items())])
+        metric('bytes_downloaded_total', 'counter', 'Body bytes downloaded', [((), status['bytes_downloaded'])])
+        metric('retries_total', 'counter', 'Fetches re-queued after a failure', [((), status['retries'])])
+        hosts = sorted(self.crawler.host_times.copy().items(), key=lambda item: -item[1][0])[:self.MAX_HOSTS]
+        lines.append("# HELP rovercrawler_fetch_seconds Fetch latency by host")
+        lines.append("# TYPE rovercrawler_fetch_seconds summary")
+        for host, (count, total, _) in hosts:
+            lines.append(f'rovercrawler_fetch_seconds_sum{{host="{prometheus_escape(host)}"}} {total:.6f}')
+            lines.append(f'rovercrawler_fetch_seconds_count{{host="{prometheus_escape(host)}"}} {count}')
+        metric('fetch_seconds_max', 'gauge', 'Slowest fetch by host',
+               [((('host', host),), f"{peak:.6f}") for host, (_, _, peak) in hosts])
+        return '\n'.join(lines) + '\n'
+
+def prometheus_escape(value):
+    """Escape a Prometheus label value"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+# ============================================================================
+# 10. HTTP TRANSPORT
+# ============================================================================
+
+# httpx's request exceptions, once an HTTP/2 client has been built
+_httpx_errors = ()
+
+def http_errors():
+    """
+    Exceptions of a failed request. Looked up when a request fails rather
+    than at import, so importing rovercrawler does not import requests
+    """
+    return (requests.exceptions.RequestException,) + _httpx_errors
+
+def pool_limits(workers=None):
+    """(connections per host, connections in total) for the configured pool"""
+    workers = max(1, CONFIG['workers'] if workers is None else workers)
+    per_host = CONFIG['pool_per_host'] or max(workers, 10)
+    return per_host, max(CONFIG['pool_total'], per_host)
+
+@lru_cache(maxsize=None)
+def counting_adapter():
+    """The CountingAdapter class, defined on first use (it subclasses requests' HTTPAdapter)"""
+    
+    class CountingAdapter(requests.adapters.HTTPAdapter):
+        """
+        HTTPAdapter that counts requests sent and sockets opened, so reuse
+        of pooled keep-alive connections can be checked from the stats
+        """
+        
+        def __init__(self, *args, **kwargs):
+            self.lock = threading.Lock()
+            self.opened = 0
+            self.sent = 0
+            super().__init__(*args, **kwargs)
+        
+        def init_poolmanager(self, *args, **kwargs):
+            super().init_poolmanager(*args, **kwargs)
+            adapter = self
+            
+            def counting(pool_cls):
+                class Connection(pool_cls.ConnectionCls):
+                    def connect(self):
+                        with adapter.lock:
+                            adapter.opened += 1
+                        super().connect()
+                return type(pool_cls.__name__, (pool_cls,), {'ConnectionCls': Connection})
+            
+            # urllib3 reconnects dropped keep-alive connections in place, so
+            # sockets are counted where they are opened, not per pooled object
+            self.poolmanager.pool_classes_by_scheme = {
+                scheme: counting(pool_cls)
+                for scheme, pool_cls in self.poolmanager.pool_classes_by_scheme.items()
+            }
+        
+        def send(self, request, **kwargs):
+            with self.lock:
+                self.sent += 1
+            return super().send(request, **kwargs)
+        
+        def connection_counts(self):
+            """(connections opened, requests sent) so far"""
+            with self.lock:
+                return self.opened, self.sent
+    
+    return CountingAdapter
+
+BODY_CHUNK = 64 * 1024      # Bytes read from the socket at a time
+DRAIN_BYTES = 64 * 1024     # Unwanted bodies up to this size are read to keep the connection
+
+class BodyReader:
+    """
+    Incremental decoder for a streamed response body.
+    
+    Chunks are decoded as they arrive and either fed straight to an href
+    parser or kept as text; feed() returns False once `limit` bytes have
+    been read, so memory and bandwidth per page stay bounded.
+    """
+    
+    def __init__(self, encoding, href_parser=None, limit=None):
+        try:
+            self.decoder = codecs.getincrementaldecoder(encoding or 'utf-8')(errors='replace')
+        except LookupError:
+            self.decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self.parser = href_parser
+        self.limit = CONFIG['max_body_bytes'] if limit is None else limit
+        self.parts = []
+        self.size = 0
+        self.truncated = False
+        self.parse_time = 0.0
+    
+    def feed(self, chunk):
+        if self.limit and self.size + len(chunk) >= self.limit:
+            self.truncated = self.size + len(chunk) > self.limit
+            chunk = chunk[:self.limit - self.size]
+            self.size += len(chunk)
+            self._emit(self.decoder.decode(chunk))
+            return False
+        self.size += len(chunk)
+        self._emit(self.decoder.decode(chunk))
+        return True
+    
+    def _emit(self, text):
+        if not text:
+            return
+        if self.parser is None:
+            self.parts.append(text)
+            return
+        start = time.perf_counter()
+        try:
+            self.parser.feed(text)
+        except Exception as e:
+            # Same outcome as extract_links: an unparseable page has no links
+            if CONFIG['verbose']:
+                print(f"{CONFIG['colors']['warning']}[!] Parse error: {e}{CONFIG['colors']['reset']}")
+            self.parser = _NoHrefs()
+        self.parse_time += time.perf_counter() - start
+    
+    def close(self):
+        """The decoded text, or the parser's hrefs if one was given"""
+        self._emit(self.decoder.decode(b'', final=True))
+        if self.parser is None:
+            return ''.join(self.parts)
+        start = time.perf_counter()
+        try:
+            hrefs = self.parser.close()
+        except Exception as e:
+            if CONFIG['verbose']:
+                print(f"{CONFIG['colors']['warning']}[!] Parse error: {e}{CONFIG['colors']['reset']}")
+            hrefs = []
+        self.parse_time += time.perf_counter() - start
+        return hrefs
+
+class _NoHrefs:
+    """Stand-in for a parser that failed mid-body"""
+    
+    def feed(self, data):
+        pass
+    
+    def close(self):
+        return []
+
+def make_http_client(workers=None, hosts=None):
+    """
+    HTTP client for the threaded backend.
+    
+    A requests.Session whose adapter pools `pool_per_host` connections for
+    up to `hosts` (default: pool_total / pool_per_host) hosts, or an httpx
+    HTTP/2 client with `pool_total` multiplexed connections when
+    CONFIG['http2'] is set.
+    """
+    per_host, total = pool_limits(workers)
+    headers = {'User-Agent': CONFIG['user_agent']}
+    if not CONFIG['keep_alive']:
+        headers['Connection'] = 'close'
+    
+    if CONFIG['http2']:
+        global _httpx_errors
+        if not HTTPX_AVAILABLE:
+            raise RuntimeError("HTTP/2 requires httpx: pip install 'httpx[http2]'")
+        _httpx_errors = (httpx.HTTPError,)
+        limits = httpx.Limits(max_connections=total,
+                              max_keepalive_connections=total if CONFIG['keep_alive'] else 0,
+                              keepalive_expiry=CONFIG['keepalive_timeout'])
+        try:
+            return httpx.Client(http2=True, limits=limits, headers=headers,
+                                timeout=CONFIG['timeout'], follow_redirects=True)
+        except ImportError:
+            raise RuntimeError("HTTP/2 requires the h2 package: pip install 'httpx[http2]'")
+    
+    session = requests.Session()
+    session.headers.update(headers)
+    adapter = counting_adapter()(pool_connections=max(1, hosts or total // per_host), pool_maxsize=per_host)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+# ============================================================================
+# 11. ROBOTS & SITEMAPS
+# ============================================================================
+
+class RobotsRules:
+    """
+    Compiled Allow/Disallow rules of one robots.txt group.
+    
+    Rules are kept longest first, so the first one that matches is the most
+    specific (RFC 9309), with Allow ahead of Disallow at equal length. Plain
+    paths are checked with str.startswith; only rules using '*' or '$' are
+    compiled to regexes.
+    """
+    
+    def __init__(self, rules=(), disallow_all=False):
+        compiled = []
+        for allow, path in rules:
+            if not path:
+                continue            # "Disallow:" with no path allows everything
+            if '*' in path or path.endswith('$'):
+                anchored = path.endswith('$')
+                body = path[:-1] if anchored else path
+                regex = re.compile('.*'.join(map(re.escape, body.split('*'))) + ('$' if anchored else ''))
+                compiled.append((len(path), allow, None, regex.match))
+            else:
+                compiled.append((len(path), allow, path, None))
+        compiled.sort(key=lambda rule: (-rule[0], not rule[1]))
+        self.rules = [rule[1:] for rule in compiled]    # (allow, prefix, match)
+        self.disallow_all = disallow_all
+    
+    def __len__(self):
+        return len(self.rules)
+    
+    def allows(self, path):
+        if self.disallow_all:
+            return False
+        for allow, prefix, match in self.rules:
+            if path.startswith(prefix) if match is None else match(path):
+                return allow
+        return True
+
+def parse_robots(text, agent):
+    """
+    Rules for `agent` from a robots.txt body: (RobotsRules, Crawl-delay or
+    None, Sitemap URLs). The groups naming the longest part of the agent
+    apply, or the '*' groups if none does.
+    """
+    groups = []                     # [agents, rules, delay]
+    sitemaps = []
+    group = None
+    in_agents = False
+    for line in text.splitlines():
+        field, _, value = line.split('#', 1)[0].partition(':')
+        field = field.strip().lower()
+        value = value.strip()
+        if field == 'user-agent':
+            # Consecutive User-agent lines share one group
+            if not in_agents:
+                group = [[], [], None]
+                groups.append(group)
+            group[0].append(value.lower())
+            in_agents = True
+            continue
+        in_agents = False
+        if field == 'sitemap' and value:
+            sitemaps.append(value)
+        elif group is None:
+            continue
+        elif field in ('allow', 'disallow'):
+            # Crawled URLs are lowercased by normalize_url, so the rules are too
+            group[1].append((field == 'allow', value.lower()))
+        elif field == 'crawl-delay':
+            try:
+                group[2] = float(value)
+            except ValueError:
+                pass
+    
+    agent = agent.lower()
+    best = max((len(name) for names, _, _ in groups for name in names
+                if name != '*' and name in agent), default=0)
+    if best:
+        chosen = [g for g in groups if any(name != '*' and name in agent and len(name) == best
+                                           for name in g[0])]
+    else:
+        chosen = [g for g in groups if '*' in g[0]]
+    rules = [rule for g in chosen for rule in g[1]]
+    delays = [g[2] for g in chosen if g[2] is not None]
+    return RobotsRules(rules), (delays[0] if delays else None), sitemaps
+
+class RobotsCache:
+    """
+    robots.txt of every host met during a crawl, fetched once per host.
+    
+    The first URL of a host fetches its robots.txt (through the politeness
+    schedule); its Crawl-delay goes to set_delay() and its Sitemap lines
+    are kept for seeding. Fetch workers prefetch() the hosts a page links
+    to, so the coordinator normally finds the rules ready. UrlFilter
+    memoizes decisions per URL, so the rules run once per distinct URL.
+    A missing robots.txt allows everything; a 5xx disallows the host, as
+    RFC 9309 asks.
+    """
+    
+    MAX_BYTES = 500 * 1024          # Parse at most this much of a robots.txt
+    
+    def __init__(self, politeness, agent=None):
+        self.politeness = politeness
+        self.agent = CONFIG['robots_agent'] if agent is None else agent
+        self.session = requests.Session()
+        self.session.headers['User-Agent'] = CONFIG['user_agent']
+        self.hosts = {}             # host -> Future of (RobotsRules, sitemap URLs)
+        self.lock = threading.Lock()
+        self.blocked = 0            # Distinct URLs disallowed
+    
+    def _entry(self, scheme, host):
+        """
+        Rules and sitemaps of a host. The first caller fetches them; others
+        for the same host wait on its future, while other hosts go ahead
+        """
+        future = self.hosts.get(host)
+        if future is None:
+            with self.lock:
+                future = self.hosts.get(host)
+                fetching = future is None
+                if fetching:
+                    future = self.hosts[host] = Future()
+            if fetching:
+                try:
+                    future.set_result(self._fetch(scheme, host))
+                except BaseException as e:
+                    with self.lock:
+                        del self.hosts[host]     # The next URL of the host tries again
+                    future.set_exception(e)
+                    raise
+        return future.result()
+    
+    def known(self, host):
+        """Whether the rules of host are in, so allows() will not block on them"""
+        future = self.hosts.get(host)
+        return future is not None and future.done()
+    
+    def prefetch(self, urls):
+        """Fetch, or wait for, the robots.txt of each URL's host"""
+        for url in urls:
+            parts = urlsplit(url)
+            self._entry(parts.scheme, parts.netloc)
+    
+    def allows(self, url):
+        parts = urlsplit(url)
+        if self._entry(parts.scheme, parts.netloc)[0].allows(parts.path or '/'):
+            return True
+        self.blocked += 1
+        if CONFIG['verbose']:
+            print(f"{CONFIG['colors']['dim']}[i] Disallowed by robots.txt: {url}{CONFIG['colors']['reset']}")
+        return False
+    
+    def sitemaps(self, url):
+        """Sitemap URLs listed in the robots.txt of url's host"""
+        parts = urlsplit(url)
+        return self._entry(parts.scheme, parts.netloc)[1]
+    
+    def _fetch(self, scheme, host):
+        url = f"{scheme}://{host}/robots.txt"
+        delay = self.politeness.reserve(host) - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        try:
+            with self.session.get(url, timeout=CONFIG['timeout'], stream=True) as response:
+                if response.status_code >= 500:
+                    print(f"{CONFIG['colors']['warning']}[!] robots.txt of {host} answered {response.status_code}; not crawling the host{CONFIG['colors']['reset']}")
+                    return RobotsRules(disallow_all=True), []
+                if response.status_code != 200:
+                    return RobotsRules(), []
+                body = response.raw.read(self.MAX_BYTES, decode_content=True)
+                text = body.decode(response.encoding or 'utf-8', errors='replace')
+        except (urllib3.exceptions.HTTPError,) + http_errors() as e:
+            if CONFIG['verbose']:
+                print(f"{CONFIG['colors']['warning']}[!] robots.txt of {host} unavailable: {e}{CONFIG['colors']['reset']}")
+            return RobotsRules(), []
+        
+        rules, crawl_delay, sitemaps = parse_robots(text, self.agent)
+        if crawl_delay is not None:
+            self.politeness.set_delay(host, crawl_delay)
+        print(f"{CONFIG['colors']['dim']}[*] robots.txt of {host}: {len(rules)} rules"
+              + (f", Crawl-delay {crawl_delay:g}s" if crawl_delay is not None else '')
+              + (f", {len(sitemaps)} sitemaps" if sitemaps else '') + CONFIG['colors']['reset'])
+        return rules, sitemaps
+
+def iter_sitemap(session, sitemaps, politeness, max_files=None):
+    """
+    Yield the page URLs listed in sitemaps, following sitemap indexes.
+    
+    Files are streamed (gunzipped if needed) through an incremental XML
+    parser and each entry is dropped once read, so memory stays flat no
+    matter how many entries a file holds. Stop iterating to stop downloading.
+    """
+    max_files = CONFIG['sitemap_max_files'] if max_files is None else max_files
+    queue = deque(sitemaps)
+    seen = set(sitemaps)
+    fetched = 0
+    while queue and fetched < max_files:
+        sitemap = queue.popleft()
+        fetched += 1
+        for is_index, loc in _read_sitemap(session, sitemap, politeness):
+            if not is_index:
+                yield loc
+            elif loc not in seen:
+                seen.add(loc)
+                queue.append(loc)
+
+def _sitemap_bytes(response):
+    """Body of a sitemap response in pieces of at most BODY_CHUNK bytes, gunzipped if needed"""
+    gunzip = None
+    for chunk in response.iter_content(BODY_CHUNK):
+        if gunzip is None:
+            # .xml.gz files are gzip bodies, whatever the headers say
+            gunzip = zlib.decompressobj(16 + zlib.MAX_WBITS) if chunk[:2] == b'\x1f\x8b' else False
+        if not gunzip:
+            yield chunk
+            continue
+        # Capped output per call: a small gzip chunk can inflate enormously
+        while chunk:
+            data = gunzip.decompress(chunk, BODY_CHUNK)
+            chunk = gunzip.unconsumed_tail
+            if data:
+                yield data
+            elif not chunk:
+                break
+    if gunzip:
+        rest = gunzip.flush()
+        if rest:
+            yield rest
+
+def _read_sitemap(session, url, politeness):
+    """(is_index, loc) pairs of one sitemap file, read incrementally"""
+    delay = politeness.reserve(urlsplit(url).netloc) - time.time()
+    if delay > 0:
+        time.sleep(delay)
+    try:
+        with session.get(url, timeout=CONFIG['timeout'], stream=True) as response:
+            if response.status_code != 200:
+                if CONFIG['verbose']:
+                    print(f"{CONFIG['colors']['warning']}[!] Sitemap {url}: status {response.status_code}{CONFIG['colors']['reset']}")
+                return
+            parser = ElementTree.XMLPullParser(events=('start', 'end'))
+            root = None
+            for data in _sitemap_bytes(response):
+                parser.feed(data)
+                for event, element in parser.read_events():
+                    tag = element.tag.rsplit('}', 1)[-1]
+                    if event == 'start':
+                        if root is None:
+                            root = element
+                        continue
+                    if tag == 'loc' and element.text:
+                        yield root.tag.endswith('sitemapindex'), element.text.strip()
+                    elif tag in ('url', 'sitemap'):
+                        root.clear()
+    except (ElementTree.ParseError, zlib.error) as e:
+        print(f"{CONFIG['colors']['warning']}[!] Unreadable sitemap {url}: {e}{CONFIG['colors']['reset']}")
+    except http_errors() as e:
+        if CONFIG['verbose']:
+            print(f"{CONFIG['colors']['warning']}[!] Sitemap {url} unavailable: {e}{CONFIG['colors']['reset']}")
+
+# ============================================================================
+# 12. CRAWLER CORE
+# ============================================================================
+
+class PageResult:
+    """Outcome of fetching one page, handed from a worker to the coordinator"""
+    
+    __slots__ = ('url', 'status', 'html', 'links', 'etag', 'last_modified',
+                 'size', 'from_cache', 'fetch_time', 'parse_time', 'hrefs', 'truncated',
+                 'content_type', 'skipped', 'error', 'depth', 'parent')
+    
+    def __init__(self, url):
+        self.url = url
+        self.status = None          # HTTP status, None if the request failed
+        self.html = None            # Body, until links are extracted from it
+        self.links = None           # Extracted links, None if not an HTML page
+        self.etag = None
+        self.last_modified = None
+        self.size = 0               # Downloaded body bytes
+        self.from_cache = False     # Links reused after a 304
+        self.fetch_time = 0.0       # Seconds spent on the request
+        self.parse_time = 0.0       # Seconds spent extracting links (in-thread only)
+        self.hrefs = None           # Raw hrefs, when parsed while streaming the body
+        self.truncated = False      # Body cut off at max_body_bytes
+        self.content_type = None    # From the GET, or a HEAD probe
+        self.skipped = False        # Not fetched: predicted non-HTML
+        self.error = None           # error_class() of a failed request
+        self.depth = None           # Set by the coordinator when the page is recorded
+        self.parent = None          # URL the page was first found on (None for the root)
+
+class RoverCrawler:
+    """
+    Main crawler class
+    
+    Each crawler has its own settings: `config` (a CrawlConfig, or a dict
+    of settings applied over DEFAULT_CONFIG) and/or keyword overrides of
+    the CONFIG in effect, e.g. RoverCrawler(max_pages=50). Without either
+    it shares the CONFIG in effect when it is created. The config is
+    active while the crawler's methods run, so crawlers with different
+    settings can run side by side in one process.
+    """
+    
+    # Failures worth another attempt (the URL is re-queued, not retried inline)
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+    
+    # Print the crawl's settings line and progress every 10 pages
+    announce = True
+    
+    def __init__(self, config=None, **overrides):
+        if overrides or (config is not None and not isinstance(config, CrawlConfig)):
+            config = CrawlConfig(ActiveConfig.current() if config is None else config, **overrides)
+        self.config = ActiveConfig.current() if config is None else config
+        with use_config(self.config):
+            self.session = self._make_session()
+            self.streams = set()        # HTTP/2 connections seen (httpx only)
+            self.politeness = HostPoliteness()
+            self.url_filter = UrlFilter()
+            self.state = None
+            self.cache = None
+            self.page_stream = None
+            self.timings = PhaseTimings()
+            self.prefilter = None
+            self.traps = None
+            self.robots = None
+            self.graph = None
+            self.processed = 0          # Pages handed to _process_page, failures included
+            self.error_classes = {}     # error class -> count (coordinator only)
+            self.host_times = {}        # host -> [fetches, total seconds, max seconds]
+            self.lock = threading.Lock()
+            self.stats = {
+                'pages_crawled': 0,
+                'links_found': 0,
+                'errors': 0,
+                'cache_hits': 0,
+                'cache_misses': 0,
+                'cache_revalidations': 0,
+                'cache_bytes_saved': 0,
+                'retries': 0,
+                'bytes_downloaded': 0,
+                'bodies_truncated': 0,
+                'fetches_avoided': 0,
+                'head_probes': 0,
+                'head_avoided': 0,
+                'mispredictions': 0,
+                'prefilter_revisits': 0,
+                'connections_opened': 0,
+                'connections_reused': 0,
+                'sitemap_urls': 0,
+                'pages_checked': 0,
+                'pages_changed': 0,
+                'pages_new': 0,
+                'start_time': time.time()
+            }
+    
+    def _make_session(self):
+        return make_http_client()
+    
+    def _make_robots(self):
+        return RobotsCache(self.politeness)
+    
+    def _count(self, key, amount=1):
+        """Thread-safe increment of a stats counter"""
+        with self.lock:
+            self.stats[key] += amount
+    
+    def rate_limit(self, url, slot=None):
+        """Enforce per-host rate limiting before a request"""
+        # The slot is normally reserved by the coordinator at dispatch time;
+        # sleeping here (outside any lock) only blocks this worker. A slot
+        # reserved before the host backed off is not honoured: once it comes
+        # up during the pause, a fresh one is taken behind it.
+        host = urlparse(url).netloc
+        if slot is None:
+            slot = self.politeness.reserve(host)
+        waited = 0.0
+        while True:
+            delay = slot - time.time()
+            if delay > 0:
+                time.sleep(delay)
+                waited += delay
+            if not self.politeness.paused(host):
+                break
+            slot = self.politeness.reserve(host)
+        self.timings.record('rate_limit', waited)
+    
+    @staticmethod
+    def conditional_headers(cached):
+        """Revalidation headers for a cached entry"""
+        headers = {}
+        if cached is not None:
+            if cached.etag:
+                headers['If-None-Match'] = cached.etag
+            if cached.last_modified:
+                headers['If-Modified-Since'] = cached.last_modified
+        return headers
+    
+    @configured
+    def fetch_page(self, url, slot=None, cached=None, href_parser=None):
+        """
+        Fetch a URL with error handling, returning a PageResult.
+        
+        The body is streamed: status and Content-Type are checked before
+        anything is downloaded, and at most max_body_bytes are read. With
+        an href_parser, decoded chunks go straight to it and page.hrefs is
+        set instead of page.html.
+        """
+        page = PageResult(url)
+        self.rate_limit(url, slot)
+        
+        # Cheap HEAD first for URLs the prefilter cannot place yet
+        if self.prefilter is not None and cached is None and self.prefilter.should_probe(url):
+            probe = self._probe(url)
+            if probe is not None and 'text/html' not in probe[1]:
+                page.status, page.content_type = probe
+                self._count('head_avoided')
+                return page
+            self.rate_limit(url)
+        
+        if CONFIG['verbose']:
+            print(f"{CONFIG['colors']['info']}[→] Fetching: {url}{CONFIG['colors']['reset']}")
+        
+        headers = self.conditional_headers(cached)
+        if headers:
+            self._count('cache_revalidations')
+        
+        start = time.perf_counter()
+        try:
+            if CONFIG['http2']:
+                request = self.session.stream('GET', url, headers=headers)
+            else:
+                request = self.session.get(
+                    url,
+                    headers=headers,
+                    timeout=CONFIG['timeout'],
+                    allow_redirects=True,
+                    verify=True,  # SSL verification
+                    stream=True
+                )
+            
+            with request as response:
+                headers_at = time.perf_counter()
+                self.timings.record('ttfb', headers_at - start)
+                if CONFIG['http2']:
+                    self._count_stream(response.extensions.get('network_stream'))
+                
+                page.status = response.status_code
+                page.content_type = response.headers.get('Content-Type', '').lower()
+                self.politeness.feedback(urlparse(url).netloc, response.status_code,
+                                         response.headers.get('Retry-After'))
+                
+                # Unchanged since the cached copy: reuse its links
+                if response.status_code == 304 and headers:
+                    self._discard(response)
+                    page.links = cached.links
+                    page.from_cache = True
+                    self._count('pages_crawled')
+                    self._count('cache_hits')
+                    self._count('cache_bytes_saved', cached.size)
+                    return page
+                
+                # Check if it's HTML (before downloading anything)
+                content_type = response.headers.get('Content-Type', '').lower()
+                if 'text/html' not in content_type:
+                    if CONFIG['verbose']:
+                        print(f"{CONFIG['colors']['dim']}[i] Skipping non-HTML: {content_type[:30]}{CONFIG['colors']['reset']}")
+                    self._discard(response)
+                    return page
+                
+                # Check status code
+                if response.status_code != 200:
+                    if CONFIG['verbose']:
+                        print(f"{CONFIG['colors']['warning']}[!] Status {response.status_code}: {url}{CONFIG['colors']['reset']}")
+                    self._discard(response)
+                    return page
+                
+                page.etag = response.headers.get('ETag')
+                page.last_modified = response.headers.get('Last-Modified')
+                reader = BodyReader(response.encoding, href_parser)
+                chunks = (response.iter_bytes(BODY_CHUNK) if CONFIG['http2']
+                          else response.iter_content(BODY_CHUNK))
+                for chunk in chunks:
+                    if not reader.feed(chunk):
+                        break
+                self._finish_body(page, reader, href_parser)
+                self.timings.record('download', time.perf_counter() - headers_at - page.parse_time)
+                return page
+            
+        except http_errors() as e:
+            if CONFIG['verbose']:
+                print(f"{CONFIG['colors']['error']}[!] Request failed: {e}{CONFIG['colors']['reset']}")
+            page.error = error_class(e)
+            return page
+        except Exception as e:
+            if CONFIG['verbose']:
+                print(f"{CONFIG['colors']['error']}[!] Unexpected error: {e}{CONFIG['colors']['reset']}")
+            page.error = 'unexpected'
+            return page
+        finally:
+            page.fetch_time = time.perf_counter() - start
+    
+    def _probe(self, url):
+        """HEAD a URL: (status, Content-Type), or None without a usable answer"""
+        self._count('head_probes')
+        try:
+            if CONFIG['http2']:
+                response = self.session.head(url, follow_redirects=True)
+            else:
+                response = self.session.head(url, timeout=CONFIG['timeout'], allow_redirects=True)
+        except http_errors():
+            return None
+        # Servers that reject HEAD get a normal GET
+        if response.status_code >= 400 or 'Content-Type' not in response.headers:
+            return None
+        return response.status_code, response.headers['Content-Type'].lower()
+    
+    @staticmethod
+    def _discard(response):
+        """Skip an unwanted body, draining small ones so the connection is reused"""
+        length = response.headers.get('Content-Length', '')
+        if response.status_code == 304 or (length.isdigit() and int(length) <= DRAIN_BYTES):
+            if CONFIG['http2']:
+                response.read()
+            else:
+                response.content
+    
+    def _finish_body(self, page, reader, href_parser):
+        """Move a fully streamed (or capped) body into the PageResult"""
+        body = reader.close()
+        if href_parser is None:
+            page.html = body
+        else:
+            page.hrefs = body
+            page.parse_time = reader.parse_time
+            self.timings.record('parse', reader.parse_time)
+        page.size = reader.size
+        page.truncated = reader.truncated
+        self._count('bytes_downloaded', reader.size)
+        self._count('pages_crawled')
+        if reader.truncated:
+            self._count('bodies_truncated')
+            if CONFIG['verbose']:
+                print(f"{CONFIG['colors']['warning']}[!] Body cut at {reader.size} bytes: {page.url}{CONFIG['colors']['reset']}")
+    
+    def _count_stream(self, stream):
+        """Count a response as a new or reused connection (HTTP/2 client)"""
+        with self.lock:
+            if stream in self.streams:
+                self.stats['connections_reused'] += 1
+            else:
+                self.streams.add(stream)
+                self.stats['connections_opened'] += 1
+    
+    def connection_stats(self):
+        """(connections opened, requests that reused a connection)"""
+        for adapter in getattr(self.session, 'adapters', {}).values():
+            if isinstance(adapter, counting_adapter()):
+                opened, sent = adapter.connection_counts()
+                self.stats['connections_opened'] = opened
+                self.stats['connections_reused'] = max(0, sent - opened)
+                break
+        return self.stats['connections_opened'], self.stats['connections_reused']
+    
+    @configured
+    def fetch_url(self, url, slot=None):
+        """Fetch a URL with error handling, returning its HTML or None"""
+        return self.fetch_page(url, slot).html
+    
+    @configured
+    def fetch_links(self, url, slot=None, cached=None, follow=False):
+        """
+        Fetch and parse a page, returning a PageResult with its links.
+        With follow (the page's links will be queued), the robots.txt of
+        hosts they lead to is fetched here rather than on the coordinator.
+        """
+        page = self.fetch_page(url, slot, cached, make_href_parser())
+        self._normalize_hrefs(page)
+        if follow and page.links and self.robots is not None:
+            self.robots.prefetch(self.url_filter.robots_pending(page.links))
+        return page
+    
+    def _normalize_hrefs(self, page):
+        """Turn hrefs collected while streaming into normalized links"""
+        if page.hrefs is not None:
+            start = time.perf_counter()
+            page.links = self.url_filter.normalize_all(page.url, page.hrefs)
+            elapsed = time.perf_counter() - start
+            self.timings.record('normalize', elapsed)
+            page.parse_time += elapsed
+            page.hrefs = None
+    
+    @configured
+    def crawl(self, start_url, max_depth=None):
+        """
+        Main crawl function using BFS for more predictable results
+        Returns tree structure
+        """
+        for _ in self.iter_crawl(start_url, max_depth):
+            pass
+        return self._result_tree()
+    
+    def iter_crawl(self, start_url, max_depth=None):
+        """
+        Crawl like crawl(), yielding each PageResult as it is recorded:
+        in dispatch order, failures and skipped pages included, with its
+        depth and (except in incremental recrawls) parent set. The crawl
+        only moves on when the next page is asked for, so no more than
+        `workers` fetches run ahead of the caller and a slow consumer
+        slows the crawl down instead of buffering pages. Closing the
+        generator early stops the crawl and releases its connections,
+        checkpoint and page stream.
+        """
+        with use_config(self.config):
+            if max_depth is None:
+                max_depth = CONFIG['max_depth']
+            pages = self._iter_crawl(start_url, max_depth)
+        try:
+            while True:
+                with use_config(self.config):
+                    page = next(pages, None)
+                if page is None:
+                    return
+                yield page
+        finally:
+            with use_config(self.config):
+                pages.close()
+    
+    def _result_tree(self):
+        """Tree of the last crawl"""
+        return self._build_tree(self.store)
+    
+    def _recorded(self):
+        """Hand out the pages _process_page recorded since the last call"""
+        while self.recorded:
+            yield self.recorded.popleft()
+    
+    def _iter_crawl(self, start_url, max_depth):
+        """Threaded backend behind iter_crawl()"""
+        workers = max(1, CONFIG['workers'])
+        executor = config_thread_pool(workers) if workers > 1 else None
+        
+        # With a parse stage, workers only download and processes extract
+        # links, so robots.txt of new hosts is left to the coordinator
+        parse_stage = None
+        fetch = self.fetch_links
+        if CONFIG['parse_processes'] > 0:
+            parse_stage = ParseStage(CONFIG['parse_processes'])
+            fetch = lambda url, slot, cached, follow: self.fetch_page(url, slot, cached)
+        
+        self._start_frontier(start_url, max_depth, workers)
+        
+        try:
+            while True:
+                # Dispatch as many queued URLs as the window allows
+                while len(self.pending) < workers:
+                    item = self._next_url()
+                    if item is None:
+                        break
+                    current_url, url_id, slot = item
+                    cached = self._cache_lookup(current_url)
+                    follow = self._follows(url_id)
+                    if executor is None:
+                        job = fetch(current_url, slot, cached, follow)
+                    else:
+                        job = executor.submit(fetch, current_url, slot, cached, follow)
+                    self.pending.append([current_url, url_id, job, None])
+                
+                yield from self._recorded()
+                if not self.pending:
+                    break
+                
+                if parse_stage is not None:
+                    parse_stage.collect(self.pending)
+                    page = parse_stage.result(self.pending[0])
+                    _, url_id, _, _ = self.pending.popleft()
+                else:
+                    _, url_id, job, _ = self.pending.popleft()
+                    page = job if executor is None else job.result()
+                self._process_page(url_id, page)
+                yield from self._recorded()
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+            if parse_stage is not None:
+                parse_stage.shutdown()
+            self._finish_frontier()
+    
+    # ------------------------------------------------------------------------
+    # Frontier bookkeeping shared by every fetch backend.
+    #
+    # Backends keep up to `workers` pages in flight, but hand results back
+    # strictly in dispatch order, so the tree matches a sequential crawl.
+    # Only the coordinator (never a worker) touches the state below.
+    # ------------------------------------------------------------------------
+    
+    def _start_frontier(self, start_url, max_depth, workers):
+        """Reset crawl state for a new start URL, or load it from a checkpoint"""
+        root_id = self._open_frontier(start_url, max_depth, workers)
+        if root_id is not None:
+            self._seed_frontier(start_url, root_id)
+    
+    def _open_frontier(self, start_url, max_depth, workers):
+        """
+        The part of _start_frontier that makes no requests. Returns the
+        root's id for a new crawl, to be passed to _seed_frontier(), or
+        None when resuming from a checkpoint
+        """
+        check_config(CONFIG)
+        self.root_domain = urlparse(start_url).netloc
+        self.robots = self._make_robots() if CONFIG['robots'] else None
+        self.url_filter = UrlFilter(self.root_domain, robots=self.robots)
+        self.max_depth = max_depth
+        self.store = UrlStore()
+        self.order = CrawlOrder(self.store) if CONFIG['crawl_order'] == 'priority' else None
+        self.to_visit = HostFrontier(self.politeness, order=self.order)   # url ids
+        self.pending = deque()                          # [url, url_id, job, parse_job]
+        self.recorded = deque()                         # processed pages iter_crawl has not yielded
+        self.done_ids = []                              # processed since last checkpoint
+        self.attempts = {}                              # url id -> retries so far
+        self.last_checkpoint = time.time()
+        state_dir = self._state_dir()
+        self.state = CrawlState(state_dir) if state_dir else None
+        resuming = self.state is not None and CONFIG['resume'] and self.state.saved_urls > 0
+        if resuming and self.state.start_url() not in (None, start_url):
+            saved_url = self.state.start_url()
+            self.state.close()
+            self.state = None
+            raise ValueError(f"{state_dir} holds a crawl of {saved_url}, not {start_url}; "
+                             f"resume that URL or use another state directory")
+        self.cache = HttpCache(CONFIG['cache_dir']) if CONFIG['cache_dir'] else None
+        self.prefilter = ContentTypePrefilter() if CONFIG['prefilter'] or CONFIG['head_probe'] else None
+        self.explored = set()                           # predicted non-HTML, fetched anyway
+        self.skipped_ids = {}                           # url -> id, predicted non-HTML and not fetched
+        self.revisits = set()                           # skipped ids released for a fetch after all
+        self.traps = TrapDetector() if CONFIG['trap_detect'] else None
+        self.graph = LinkGraph() if CONFIG['link_graph'] else None
+        self.page_stream = None
+        if CONFIG['ndjson_path']:
+            self.page_stream = PageStreamWriter(CONFIG['ndjson_path'], append=resuming)
+        
+        if resuming:
+            queued = self.state.load(self.store)
+            for url_id in queued:
+                self.to_visit.append(url_id, self.url_filter.host(self.store.urls[url_id]))
+            self._restore_stats(self.state.get_meta('stats', {}))
+            print(f"{CONFIG['colors']['info']}[*] Resuming crawl of {start_url}: {self.store.visited_count} pages done, {len(queued)} queued{CONFIG['colors']['reset']}")
+            return None
+        
+        if self.state is not None:
+            self.state.reset(start_url)
+        if self.announce:
+            print(f"{CONFIG['colors']['dim']}[*] Max depth: {max_depth}, Max pages: {CONFIG['max_pages']}, Workers: {workers}{CONFIG['colors']['reset']}")
+        return self.store.add(start_url)
+    
+    def _seed_frontier(self, start_url, root_id):
+        """Queue the root, unless robots.txt disallows it, and the sitemap URLs (this fetches both)"""
+        if self.robots is not None and not self.robots.allows(start_url):
+            print(f"{CONFIG['colors']['warning']}[!] robots.txt disallows {start_url}{CONFIG['colors']['reset']}")
+            return
+        self.to_visit.append(root_id, self.root_domain)
+        if CONFIG['sitemaps'] and self.max_depth > 0:
+            self._seed_sitemaps(start_url, root_id)
+    
+    def _state_dir(self):
+        """Directory checkpoints are kept in (None = no checkpoints)"""
+        return CONFIG['state_dir']
+    
+    def _seed_sitemaps(self, start_url, root_id):
+        """
+        Queue the URLs of the site's sitemaps as children of the root, so
+        deep pages need no chain of fetches to be found. At most max_pages
+        are taken: the crawl could not visit more anyway.
+        """
+        parts = urlsplit(start_url)
+        sitemaps = self.robots.sitemaps(start_url) or [f"{parts.scheme}://{parts.netloc}/sitemap.xml"]
+        seeded = 0
+        for loc in iter_sitemap(self.robots.session, sitemaps, self.politeness):
+            url = self.url_filter.normalize('', loc)
+            if not self.url_filter.allows(url):
+                continue
+            url_id = self.store.add(url, root_id, 1)
+            if url_id is None:
+                continue
+            self.to_visit.append(url_id, self.url_filter.host(url))
+            seeded += 1
+            if seeded >= CONFIG['max_pages']:
+                break
+        self.stats['sitemap_urls'] = seeded
+        print(f"{CONFIG['colors']['dim']}[*] Seeded {seeded} URLs from sitemaps{CONFIG['colors']['reset']}")
+    
+    def _restore_stats(self, saved):
+        """Continue counters (and elapsed time) from a checkpoint"""
+        for key in ('pages_crawled', 'links_found', 'errors'):
+            self.stats[key] = saved.get(key, 0)
+        self.stats['start_time'] = time.time() - saved.get('elapsed', 0)
+    
+    @configured
+    def checkpoint(self):
+        """Persist progress to state_dir (no-op without one)"""
+        if self.state is None:
+            return
+        with self.lock:
+            stats = {key: self.stats[key] for key in ('pages_crawled', 'links_found', 'errors')}
+        stats['elapsed'] = time.time() - self.stats['start_time']
+        if self.page_stream is not None:
+            # Keep the stream at least as far along as the checkpoint
+            self.page_stream.flush()
+        self.state.save(self.store, self.done_ids, stats)
+        self.done_ids = []
+        self.last_checkpoint = time.time()
+    
+    def _finish_frontier(self):
+        """Write a final checkpoint and release the state and cache stores"""
+        if self.state is not None:
+            self.checkpoint()
+            self.state.close()
+            self.state = None
+        if self.cache is not None:
+            self.cache.close()
+            self.cache = None
+        if self.page_stream is not None:
+            self.page_stream.close()
+            self.page_stream = None
+    
+    def _follows(self, url_id):
+        """Whether the links of a page will be queued (it is above max_depth)"""
+        return self.store.depths[url_id] < self.max_depth
+    
+    def _cache_lookup(self, url):
+        """Cached validators and links for a URL about to be fetched"""
+        if self.cache is None:
+            return None
+        cached = self.cache.lookup(url)
+        if cached is None:
+            self._count('cache_misses')
+        return cached
+    
+    def _next_url(self):
+        """Pop the next URL to fetch, mark it visited and reserve its slot"""
+        while self.to_visit and self.store.visited_count < CONFIG['max_pages']:
+            start = time.perf_counter()
+            url_id = self.to_visit.popleft()
+            self.store.mark_visited(url_id)
+            current_url = self.store.urls[url_id]
+            if (self.prefilter is not None and url_id not in self.explored and
+                    self._prefilter_skips(url_id, current_url)):
+                continue
+            slot = self.politeness.reserve(self.url_filter.host(current_url))
+            self.timings.record('dequeue', time.perf_counter() - start)
+            return current_url, url_id, slot
+        return None
+    
+    def _prefilter_skips(self, url_id, url):
+        """
+        Record a URL predicted to be non-HTML without fetching it. It still
+        counts as visited and appears in the tree, as a fetched one would
+        """
+        skip = self.prefilter.skip(url)
+        if skip is None:
+            self.explored.add(url_id)
+            return False
+        if skip:
+            self.skipped_ids[url] = url_id
+            page = PageResult(url)
+            page.skipped = True
+            self._count('fetches_avoided')
+            if CONFIG['verbose']:
+                print(f"{CONFIG['colors']['dim']}[i] Skipping predicted non-HTML: {url}{CONFIG['colors']['reset']}")
+            # No links can come from it, so handling it ahead of pages
+            # still in flight leaves the tree unchanged
+            self._process_page(url_id, page)
+        return skip
+    
+    def _retry_later(self, url_id, page):
+        """
+        Re-queue a transient failure behind a host pause instead of retrying
+        inline, so the worker is free for other hosts meanwhile
+        """
+        if page.skipped or (page.status is not None and page.status not in self.RETRY_STATUSES):
+            return False
+        attempt = self.attempts.get(url_id, 0) + 1
+        if attempt > CONFIG['retries']:
+            return False
+        self.attempts[url_id] = attempt
+        host = self.url_filter.host(page.url)
+        if page.status not in HostPoliteness.BACKOFF_STATUSES:
+            # 429/503 already paused the host in feedback()
+            self.politeness.defer(host, CONFIG['retry_backoff'] * 2 ** (attempt - 1))
+        self.to_visit.append(url_id, host)
+        self._count('retries')
+        if CONFIG['verbose']:
+            print(f"{CONFIG['colors']['warning']}[!] Retry {attempt}/{CONFIG['retries']} queued: {page.url}{CONFIG['colors']['reset']}")
+        return True
+    
+    def _observe(self, page):
+        """Progress and live-metrics bookkeeping for every processed page, failed or not"""
+        self.processed += 1
+        if not page.skipped:
+            host = self.url_filter.host(page.url)
+            timing = self.host_times.get(host)
+            if timing is None:
+                self.host_times[host] = [1, page.fetch_time, page.fetch_time]
+            else:
+                timing[0] += 1
+                timing[1] += page.fetch_time
+                timing[2] = max(timing[2], page.fetch_time)
+        
+        if self.announce and self.processed % 10 == 0:
+            elapsed = time.time() - self.stats['start_time']
+            print(f"{CONFIG['colors']['dim']}[i] Progress: {self.store.visited_count} pages, {len(self.to_visit)} in queue ({elapsed:.1f}s){CONFIG['colors']['reset']}")
+    
+    def _count_failure(self, page):
+        """Count a page that failed for good (not one that will be retried)"""
+        if page.skipped:
+            return
+        if page.error is not None or (page.status is None and page.links is None):
+            failure = page.error or 'failed'
+            self._count('errors')
+        elif page.status is not None and page.status >= 400:
+            failure = f"http_{page.status // 100}xx"
+        else:
+            return
+        self.error_classes[failure] = self.error_classes.get(failure, 0) + 1
+    
+    def _process_page(self, url_id, page):
+        """Record a fetched page and enqueue the links found on it"""
+        self._observe(page)
+        if page.links is None and self._retry_later(url_id, page):
+            return
+        self._count_failure(page)
+        parent_id = self.store.parents[url_id]
+        page.depth = self.store.depths[url_id]
+        page.parent = self.store.urls[parent_id] if parent_id >= 0 else None
+        revisit = url_id in self.revisits
+        if revisit:
+            # Recorded (and counted) when it was skipped; only its links are new
+            self.revisits.discard(url_id)
+        else:
+            self.recorded.append(page)
+        self._record_links(url_id, page, revisit)
+        
+        # Only now are the page's children in the store, so a checkpoint that
+        # marks it done also saves them
+        if self.state is not None:
+            self.done_ids.append(url_id)
+            if (len(self.done_ids) >= CONFIG['checkpoint_pages'] or
+                    time.time() - self.last_checkpoint >= CONFIG['checkpoint_interval']):
+                self.checkpoint()
+    
+    def _record_links(self, url_id, page, revisit=False):
+        """
+        Learn from a recorded page, cache it and enqueue its links. A
+        revisit (a released skip) is not streamed a second time
+        """
+        if self.prefilter is not None and page.content_type is not None and not page.from_cache:
+            is_html = 'text/html' in page.content_type
+            # URLs skipped on a prediction this page just overturned get fetched after all
+            for url in self.prefilter.learn(page.url, is_html):
+                skipped_id = self.skipped_ids.pop(url)
+                self.explored.add(skipped_id)
+                self.revisits.add(skipped_id)
+                self.to_visit.append(skipped_id, self.url_filter.host(url))
+                self._count('prefilter_revisits')
+            if url_id in self.explored:
+                self.explored.discard(url_id)
+                if is_html:
+                    self._count('mispredictions')
+        
+        links = page.links
+        if self.page_stream is not None and not revisit:
+            self.page_stream.write({
+                'id': url_id,
+                'url': self.store.urls[url_id],
+                'parent': page.parent,
+                'depth': page.depth,
+                'status': page.status,
+                'outlinks': len(links) if links is not None else None,
+                'cached': page.from_cache,
+                'skipped': page.skipped,
+                'fetch_ms': round(page.fetch_time * 1000, 1),
+                'parse_ms': round(page.parse_time * 1000, 2),
+                'time': round(time.time() - self.stats['start_time'], 3),
+            })
+        
+        if links is None:
+            return
+        
+        if (self.cache is not None and not page.from_cache and
+                (page.etag or page.last_modified)):
+            self.cache.store(page.url, page.etag, page.last_modified, links, page.size)
+        
+        depth = self.store.depths[url_id]
+        self._count('links_found', len(links))
+        
+        if CONFIG['verbose']:
+            print(f"{CONFIG['colors']['dim']}[i] Found {len(links)} links at depth {depth}{CONFIG['colors']['reset']}")
+        
+        # Process each link (sorted so the tree is reproducible across runs).
+        # Links are deduplicated here, so the first parent to find a URL keeps it
+        if depth < self.max_depth:
+            start = time.perf_counter()
+            # A near-duplicate of a crawled page adds no structure of its own
+            if self.traps is not None and url_id and self.traps.duplicate_of(page.url, links):
+                links = ()
+            for link in sorted(links):
+                if self.url_filter.allows(link):
+                    if self.traps is not None and link not in self.store and not self.traps.admit(link):
+                        continue
+                    child_id = self.store.add(link, url_id, depth + 1)
+                    if child_id is not None:
+                        self.to_visit.append(child_id, self.url_filter.host(link))
+                    elif self.order is not None:
+                        # Another in-link: a still-queued URL moves up
+                        known_id = self.store.index[link]
+                        self.order.linked(known_id)
+                        self.to_visit.update(known_id, self.url_filter.host(link))
+            self.timings.record('filter', time.perf_counter() - start)
+        
+        # Every link to a known URL is an edge, not just the first (tree) one
+        if self.graph is not None:
+            index = self.store.index
+            targets = {index[link] for link in page.links if link in index}
+            targets.discard(url_id)
+            self.graph.add(url_id, sorted(targets))
+    
+    def _build_tree(self, store):
+        """Build tree structure from the parent pointers of visited URLs"""
+        urls = store.urls
+        visited = store.visited_ids()
+        if not visited:
+            return {}
+        
+        # First, find all children for each URL
+        children_map = {}
+        for url_id in visited:
+            parent = store.parents[url_id]
+            if parent >= 0:
+                children_map.setdefault(parent, []).append(url_id)
+        
+        children_by_url = {urls[parent]: [urls[child] for child in children]
+                           for parent, children in children_map.items()}
+        return build_nested_tree(urls[0], children_by_url)
+    
+    def peak_memory_mb(self):
+        """Peak resident set size of this process in MB, or None if unknown"""
+        if resource is None:
+            return None
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in kilobytes on Linux, bytes on macOS
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    
+    @configured
+    def print_stats(self):
+        """Print crawling statistics"""
+        elapsed = time.time() - self.stats['start_time']
+        print(f"\n{CONFIG['colors']['info']}{'='*60}{CONFIG['colors']['reset']}")
+        print(f"{CONFIG['colors']['root']}CRAWL STATISTICS:{CONFIG['colors']['reset']}")
+        print(f"{CONFIG['colors']['dim']}  Pages crawled: {self.stats['pages_crawled']}")
+        print(f"  Links found:  {self.stats['links_found']}")
+        print(f"  Errors:       {self.stats['errors']}")
+        print(f"  Time elapsed: {elapsed:.1f} seconds")
+        if self.stats['cache_hits'] or self.stats['cache_misses'] or self.stats['cache_revalidations']:
+            print(f"  Cache:        {self.stats['cache_hits']} hits, {self.stats['cache_misses']} misses, "
+                  f"{self.stats['cache_revalidations']} revalidations "
+                  f"({self.stats['cache_bytes_saved'] / 1024:.0f} KB not downloaded)")
+        opened, reused = self.connection_stats()
+        if opened:
+            print(f"  Connections:  {opened} opened, {reused} requests reused one "
+                  f"({reused / (opened + reused) * 100:.0f}% reuse)")
+        if self.stats['retries']:
+            print(f"  Retries:      {self.stats['retries']}")
+        if self.prefilter is not None:
+            print(f"  Prefilter:    {self.stats['fetches_avoided']} fetches avoided, "
+                  f"{self.stats['head_probes']} HEAD probes ({self.stats['head_avoided']} GETs avoided), "
+                  f"{self.stats['mispredictions']} mispredictions, "
+                  f"{self.stats['prefilter_revisits']} skipped URLs revisited")
+        if self.graph is not None:
+            print(f"  Link graph:   {len(self.store)} nodes, {len(self.graph)} edges")
+        if self.robots is not None:
+            print(f"  Robots:       {len(self.robots.hosts)} hosts, {self.robots.blocked} URLs disallowed"
+                  + (f", {self.stats['sitemap_urls']} URLs seeded from sitemaps" if CONFIG['sitemaps'] else ''))
+        if self.traps is not None:
+            counts = self.traps.counts()
+            print(f"  Traps:        {len(self.traps.pruned)} URLs pruned ({counts['pattern_cap']} over a pattern cap, "
+                  f"{counts['repeated_segments']} repeated segments, {counts['long_path']} long paths), "
+                  f"{len(self.traps.duplicates)} near-duplicate pages not descended")
+        if self.stats['pages_checked']:
+            print(f"  Incremental:  {self.stats['pages_checked']} pages checked, "
+                  f"{self.stats['pages_changed']} changed, {self.stats['pages_new']} new")
+        if self.stats['bytes_downloaded']:
+            print(f"  Downloaded:   {self.stats['bytes_downloaded'] / 1024:.0f} KB"
+                  + (f" ({self.stats['bodies_truncated']} bodies cut at {CONFIG['max_body_bytes']} bytes)"
+                     if self.stats['bodies_truncated'] else ''))
+        peak = self.peak_memory_mb()
+        if peak is not None:
+            self.stats['peak_rss_mb'] = peak
+            print(f"  Peak memory:  {peak:.1f} MB")
+        if elapsed > 0:
+            print(f"  Avg speed:    {self.stats['pages_crawled']/elapsed:.1f} pages/sec{CONFIG['colors']['reset']}")
+        phases = self.timings.ordered()
+        if phases:
+            print(f"{CONFIG['colors']['dim']}  Time by phase:       count   total s   mean ms    p50 ms    p95 ms    max ms")
+            for name, h in phases:
+                print(f"    {name:<14} {h.count:>9} {h.total:>9.2f} {h.total / h.count * 1000:>9.2f} "
+                      f"{h.percentile(50) * 1000:>9.2f} {h.percentile(95) * 1000:>9.2f} {h.max * 1000:>9.2f}")
+            print(CONFIG['colors']['reset'], end='')
+        print(f"{CONFIG['colors']['info']}{'='*60}{CONFIG['colors']['reset']}")
+    
+    @configured
+    def stats_report(self):
+        """Counters and phase timings as a JSON-serializable dict"""
+        self.connection_stats()
+        with self.lock:
+            stats = {key: value for key, value in self.stats.items() if key != 'start_time'}
+        stats['elapsed'] = round(time.time() - self.stats['start_time'], 3)
+        report = {'stats': stats, 'timings': self.timings.to_dict()}
+        if self.traps is not None:
+            report['traps'] = self.traps.report()
+        return report
+
+class AsyncRoverCrawler(RoverCrawler):
+    """
+    asyncio/aiohttp crawler with the same crawl() contract as RoverCrawler.
+    
+    All fetches share one event loop, so `workers` here is the number of
+    requests kept in flight rather than a thread count.
+    """
+    
+    def __init__(self, config=None, **overrides):
+        if not AIOHTTP_AVAILABLE:
+            raise RuntimeError("Async mode requires aiohttp: pip install aiohttp")
+        super().__init__(config, **overrides)
+    
+    def _make_session(self):
+        # Sessions are bound to the event loop, so one is opened per crawl
+        return None
+    
+    def connection_stats(self):
+        return self.stats['connections_opened'], self.stats['connections_reused']
+    
+    async def rate_limit_async(self, url, slot=None):
+        """Non-blocking version of rate_limit"""
+        host = urlparse(url).netloc
+        if slot is None:
+            slot = self.politeness.reserve(host)
+        waited = 0.0
+        while True:
+            delay = slot - time.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                waited += delay
+            if not self.politeness.paused(host):
+                break
+            slot = self.politeness.reserve(host)
+        self.timings.record('rate_limit', waited)
+    
+    def _trace_config(self):
+        """aiohttp hooks timing DNS lookups and new connections"""
+        trace = aiohttp.TraceConfig()
+        
+        def started(phase):
+            async def hook(session, ctx, params):
+                setattr(ctx, phase, time.perf_counter())
+            return hook
+        
+        def ended(phase):
+            async def hook(session, ctx, params):
+                self.timings.record(phase, time.perf_counter() - getattr(ctx, phase))
+            return hook
+        
+        trace.on_dns_resolvehost_start.append(started('dns'))
+        trace.on_dns_resolvehost_end.append(ended('dns'))
+        trace.on_connection_create_start.append(started('connect'))
+        trace.on_connection_create_end.append(ended('connect'))
+        
+        async def opened(session, ctx, params):
+            self._count('connections_opened')
+        
+        async def reused(session, ctx, params):
+            self._count('connections_reused')
+        
+        trace.on_connection_create_end.append(opened)
+        trace.on_connection_reuseconn.append(reused)
+        return trace
+    
+    async def fetch_page_async(self, session, url, slot=None, cached=None, href_parser=None):
+        """
+        Streaming fetch_page that does not block the event loop: with an
+        href_parser, each chunk is parsed in a thread as it arrives
+        """
+        page = PageResult(url)
+        await self.rate_limit_async(url, slot)
+        
+        if self.prefilter is not None and cached is None and self.prefilter.should_probe(url):
+            probe = await self._probe_async(session, url)
+            if probe is not None and 'text/html' not in probe[1]:
+                page.status, page.content_type = probe
+                self._count('head_avoided')
+                return page
+            await self.rate_limit_async(url)
+        
+        if CONFIG['verbose']:
+            print(f"{CONFIG['colors']['info']}[→] Fetching: {url}{CONFIG['colors']['reset']}")
+        
+        headers = self.conditional_headers(cached)
+        if headers:
+            self._count('cache_revalidations')
+        
+        start = time.perf_counter()
+        try:
+            async with session.get(url, headers=headers, allow_redirects=True) as response:
+                headers_at = time.perf_counter()
+                self.timings.record('ttfb', headers_at - start)
+                page.status = response.status
+                page.content_type = response.headers.get('Content-Type', '').lower()
+                self.politeness.feedback(urlparse(url).netloc, response.status,
+                                         response.headers.get('Retry-After'))
+                
+                # Unchanged since the cached copy: reuse its links
+                if response.status == 304 and headers:
+                    await self._discard_async(response)
+                    page.links = cached.links
+                    page.from_cache = True
+                    self._count('pages_crawled')
+                    self._count('cache_hits')
+                    self._count('cache_bytes_saved', cached.size)
+                    return page
+                
+                # Check if it's HTML
+                content_type = response.headers.get('Content-Type', '').lower()
+                if 'text/html' not in content_type:
+                    if CONFIG['verbose']:
+                        print(f"{CONFIG['colors']['dim']}[i] Skipping non-HTML: {content_type[:30]}{CONFIG['colors']['reset']}")
+                    await self._discard_async(response)
+                    return page
+                
+                # Check status code
+                if response.status != 200:
+                    if CONFIG['verbose']:
+                        print(f"{CONFIG['colors']['warning']}[!] Status {response.status}: {url}{CONFIG['colors']['reset']}")
+                    await self._discard_async(response)
+                    return page
+                
+                page.etag = response.headers.get('ETag')
+                page.last_modified = response.headers.get('Last-Modified')
+                # aiohttp's own fallback for a missing charset is UTF-8
+                reader = BodyReader(response.charset or 'utf-8', href_parser)
+                async for chunk in response.content.iter_chunked(BODY_CHUNK):
+                    more = reader.feed(chunk) if href_parser is None else await asyncio.to_thread(reader.feed, chunk)
+                    if not more:
+                        break
+                if href_parser is None:
+                    self._finish_body(page, reader, href_parser)
+                else:
+                    await asyncio.to_thread(self._finish_body, page, reader, href_parser)
+                self.timings.record('download', time.perf_counter() - headers_at - page.parse_time)
+                return page
+        
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            if CONFIG['verbose']:
+                print(f"{CONFIG['colors']['error']}[!] Request failed: {e!r}{CONFIG['colors']['reset']}")
+            page.error = error_class(e)
+            return page
+        except Exception as e:
+            if CONFIG['verbose']:
+                print(f"{CONFIG['colors']['error']}[!] Unexpected error: {e}{CONFIG['colors']['reset']}")
+            page.error = 'unexpected'
+            return page
+        finally:
+            page.fetch_time = time.perf_counter() - start
+    
+    async def _probe_async(self, session, url):
+        """Non-blocking _probe"""
+        self._count('head_probes')
+        try:
+            async with session.head(url, allow_redirects=True) as response:
+                if response.status >= 400 or 'Content-Type' not in response.headers:
+                    return None
+                return response.status, response.headers['Content-Type'].lower()
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            return None
+    
+    @staticmethod
+    async def _discard_async(response):
+        """Skip an unwanted body, draining small ones so the connection is reused"""
+        if response.status == 304 or (response.content_length is not None and
+                                      response.content_length <= DRAIN_BYTES):
+            await response.read()
+    
+    async def fetch_links_async(self, session, url, slot=None, cached=None, follow=False):
+        """
+        Fetch and parse a page, returning a PageResult with its links.
+        The body is parsed chunk by chunk as it streams in, within
+        max_body_bytes, in threads rather than on the event loop, so a
+        large page does not stall the other fetches in flight. With follow,
+        robots.txt of new hosts it links to is fetched in a thread too.
+        """
+        page = await self.fetch_page_async(session, url, slot, cached, make_href_parser())
+        if page.hrefs is not None:
+            await asyncio.to_thread(self._normalize_hrefs, page)
+        if follow and page.links and self.robots is not None:
+            pending = self.url_filter.robots_pending(page.links)
+            if pending:
+                await asyncio.to_thread(self.robots.prefetch, pending)
+        return page
+    
+    @configured
+    def crawl(self, start_url, max_depth=None):
+        """
+        Main crawl function using BFS for more predictable results
+        Returns tree structure
+        """
+        if max_depth is None:
+            max_depth = CONFIG['max_depth']
+        
+        # Nothing consumes pages one by one here, so the loop runs in this
+        # thread; Ctrl-C cancels the main task, which cancels in-flight fetches
+        asyncio.run(self._crawl_async(start_url, max_depth))
+        return self._result_tree()
+    
+    def _iter_crawl(self, start_url, max_depth):
+        """
+        Run the event loop in a thread of its own, taking pages from the
+        coordinator one handoff at a time. In-flight fetches (and their
+        timeouts) carry on while the caller holds a page, but nothing new
+        is dispatched until it asks for the next one.
+        """
+        loop = asyncio.new_event_loop()
+        outbox = asyncio.Queue()
+        crawl = loop.create_task(self._crawl_async(start_url, max_depth, outbox))
+        thread = threading.Thread(target=loop.run_forever, daemon=True)
+        thread.start()
+        waiting = None
+        try:
+            while True:
+                waiting = asyncio.run_coroutine_threadsafe(outbox.get(), loop)
+                page = waiting.result()
+                if page is None:
+                    break
+                yield page
+                loop.call_soon_threadsafe(outbox.task_done)
+        finally:
+            # Ctrl-C or an early close: cancelling the coordinator cancels
+            # in-flight fetches and closes the frontier
+            if waiting is not None:
+                waiting.cancel()
+            loop.call_soon_threadsafe(crawl.cancel)
+            asyncio.run_coroutine_threadsafe(asyncio.wait([crawl]), loop).result()
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+            loop.close()
+        crawl.result()
+    
+    async def _crawl_async(self, start_url, max_depth, outbox=None):
+        """Coordinator loop running on the event loop; an outbox gets each recorded page, then None"""
+        try:
+            await self._coordinate(start_url, max_depth, outbox)
+        finally:
+            if outbox is not None:
+                outbox.put_nowait(None)
+    
+    async def _hand_over(self, outbox):
+        """Queue the pages recorded since the last call and wait until the caller took them all"""
+        if outbox is None:
+            self.recorded.clear()
+            return
+        for page in self._recorded():
+            outbox.put_nowait(page)
+        await outbox.join()
+    
+    async def _coordinate(self, start_url, max_depth, outbox):
+        window = max(1, CONFIG['workers'])
+        root_id = self._open_frontier(start_url, max_depth, window)
+        if root_id is not None:
+            # robots.txt and sitemaps are fetched off the event loop
+            await asyncio.to_thread(self._seed_frontier, start_url, root_id)
+        
+        per_host, total = pool_limits(window)
+        connector = aiohttp.TCPConnector(limit=total, limit_per_host=per_host,
+                                         keepalive_timeout=CONFIG['keepalive_timeout'] if CONFIG['keep_alive'] else None,
+                                         force_close=not CONFIG['keep_alive'])
+        timeout = aiohttp.ClientTimeout(total=CONFIG['timeout'])
+        headers = {'User-Agent': CONFIG['user_agent']}
+        
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers=headers,
+                                         trace_configs=[self._trace_config()]) as session:
+            try:
+                while True:
+                    while len(self.pending) < window:
+                        item = self._next_url()
+                        if item is None:
+                            break
+                        current_url, url_id, slot = item
+                        cached = self._cache_lookup(current_url)
+                        task = asyncio.ensure_future(self.fetch_links_async(
+                            session, current_url, slot, cached, self._follows(url_id)))
+                        self.pending.append([current_url, url_id, task, None])
+                    
+                    await self._hand_over(outbox)
+                    if not self.pending:
+                        break
+                    
+                    _, url_id, task, _ = self.pending.popleft()
+                    self._process_page(url_id, await task)
+                    await self._hand_over(outbox)
+            finally:
+                for _, _, task, _ in self.pending:
+                    task.cancel()
+                await asyncio.gather(*(task for _, _, task, _ in self.pending),
+                                     return_exceptions=True)
+                self._finish_frontier()
+
+# ============================================================================
+# 13. DISTRIBUTED CRAWLING
+# ============================================================================
+
+class SharedFrontier:
+    """
+    Work queue shared by a coordinator and its workers, kept in
+    `shared_dir/frontier.sqlite` (next to the coordinator's crawl.sqlite
+    checkpoint, which holds the visited set and parent edges).
+    
+    The coordinator submits URLs as jobs and collects results. Jobs are
+    grouped into buckets by host hash; a worker leases whole buckets and
+    then batches of jobs from them, so each host is fetched by one worker
+    at a time and politeness still holds across processes. Leases expire,
+    so the jobs of a worker that dies are handed out again.
+    """
+    
+    FILENAME = 'frontier.sqlite'
+    BUCKETS = 64
+    
+    def __init__(self, shared_dir):
+        os.makedirs(shared_dir, exist_ok=True)
+        self.path = os.path.join(shared_dir, self.FILENAME)
+        # Autocommit mode: lease() needs explicit BEGIN IMMEDIATE transactions
+        self.db = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS jobs ("
+                        "id INTEGER PRIMARY KEY, url TEXT NOT NULL, bucket INTEGER NOT NULL, "
+                        "not_before REAL NOT NULL, state INTEGER NOT NULL DEFAULT 0, "
+                        "owner TEXT, leased_until REAL)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS jobs_bucket ON jobs (bucket, state)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS buckets ("
+                        "bucket INTEGER PRIMARY KEY, owner TEXT NOT NULL, leased_until REAL NOT NULL)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS results ("
+                        "id INTEGER PRIMARY KEY, url TEXT, status INTEGER, content_type TEXT, "
+                        "links TEXT, etag TEXT, last_modified TEXT, size INTEGER, truncated INTEGER, "
+                        "fetch_time REAL, parse_time REAL, error TEXT)")
+        if 'error' not in {row[1] for row in self.db.execute("PRAGMA table_info(results)")}:
+            # Store created before failures carried their error class
+            try:
+                self.db.execute("ALTER TABLE results ADD COLUMN error TEXT")
+            except sqlite3.OperationalError:
+                pass    # Another process added it first
+    
+    @classmethod
+    def bucket(cls, host):
+        """Stable host -> bucket mapping (the same in every process)"""
+        digest = hashlib.blake2b(host.encode('utf-8', 'surrogatepass'), digest_size=8).digest()
+        return int.from_bytes(digest, 'little') % cls.BUCKETS
+    
+    def _transaction(self, func, *args):
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            result = func(*args)
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+        self.db.execute("COMMIT")
+        return result
+    
+    # Coordinator side -------------------------------------------------------
+    
+    def reset(self):
+        """Drop jobs and results of a previous run (unfinished URLs come back from the checkpoint)"""
+        def clear():
+            for table in ('jobs', 'buckets', 'results'):
+                self.db.execute(f"DELETE FROM {table}")
+            self.db.execute("INSERT OR REPLACE INTO meta VALUES ('finished', '0')")
+        self._transaction(clear)
+    
+    def submit(self, jobs):
+        """Queue (id, url, host, not_before) jobs; resubmitting an id retries it"""
+        if not jobs:
+            return
+        def insert():
+            self.db.executemany("DELETE FROM results WHERE id = ?", ((job[0],) for job in jobs))
+            self.db.executemany(
+                "INSERT OR REPLACE INTO jobs (id, url, bucket, not_before) VALUES (?, ?, ?, ?)",
+                ((url_id, url, self.bucket(host), not_before) for url_id, url, host, not_before in jobs))
+        self._transaction(insert)
+    
+    def collect(self, ids):
+        """PageResults reported for any of `ids`, keyed by id (and removed from the store)"""
+        if not ids:
+            return {}
+        marks = ','.join('?' * len(ids))
+        rows = self.db.execute(
+            f"SELECT id, url, status, content_type, links, etag, last_modified, size, "
+            f"truncated, fetch_time, parse_time, error FROM results WHERE id IN ({marks})", ids).fetchall()
+        if not rows:
+            return {}
+        done = [row[0] for row in rows]
+        marks = ','.join('?' * len(done))
+        def remove():
+            self.db.execute(f"DELETE FROM results WHERE id IN ({marks})", done)
+            self.db.execute(f"DELETE FROM jobs WHERE id IN ({marks})", done)
+        self._transaction(remove)
+        
+        pages = {}
+        for (url_id, url, status, content_type, links, etag, last_modified,
+             size, truncated, fetch_time, parse_time, error) in rows:
+            page = PageResult(url)
+            page.status = status
+            page.content_type = content_type
+            page.links = json.loads(links) if links is not None else None
+            page.etag = etag
+            page.last_modified = last_modified
+            page.size = size or 0
+            page.truncated = bool(truncated)
+            page.fetch_time = fetch_time or 0.0
+            page.parse_time = parse_time or 0.0
+            page.error = error
+            pages[url_id] = page
+        return pages
+    
+    def set_finished(self, finished=True):
+        self.db.execute("INSERT OR REPLACE INTO meta VALUES ('finished', ?)", ('1' if finished else '0',))
+    
+    # Worker side ------------------------------------------------------------
+    
+    def finished(self):
+        row = self.db.execute("SELECT value FROM meta WHERE key = 'finished'").fetchone()
+        return row is not None and row[0] == '1'
+    
+    def lease(self, owner, limit=None, seconds=None):
+        """Lease up to `limit` jobs for `owner`: (id, url, not_before) tuples"""
+        limit = CONFIG['lease_batch'] if limit is None else limit
+        seconds = CONFIG['lease_seconds'] if seconds is None else seconds
+        return self._transaction(self._lease, owner, limit, seconds)
+    
+    def _lease(self, owner, limit, seconds):
+        now = time.time()
+        until = now + seconds
+        open_job = "(jobs.state = 0 OR (jobs.state = 1 AND jobs.leased_until < :now))"
+        params = {'me': owner, 'now': now, 'until': until, 'limit': limit}
+        
+        # Keep buckets that still have work, give the others back
+        self.db.execute("UPDATE buckets SET leased_until = :until WHERE owner = :me", params)
+        self.db.execute(f"DELETE FROM buckets WHERE owner = :me AND NOT EXISTS ("
+                        f"SELECT 1 FROM jobs WHERE jobs.bucket = buckets.bucket AND {open_job})", params)
+        
+        # Take over one more bucket (free or abandoned) if ours are short of work
+        available = self.db.execute(
+            f"SELECT COUNT(*) FROM jobs JOIN buckets ON buckets.bucket = jobs.bucket "
+            f"WHERE buckets.owner = :me AND {open_job}", params).fetchone()[0]
+        if available < limit:
+            row = self.db.execute(
+                f"SELECT jobs.bucket FROM jobs LEFT JOIN buckets ON buckets.bucket = jobs.bucket "
+                f"WHERE {open_job} AND (buckets.bucket IS NULL OR buckets.leased_until < :now) "
+                f"ORDER BY jobs.id LIMIT 1", params).fetchone()
+            if row is not None:
+                self.db.execute("INSERT OR REPLACE INTO buckets VALUES (?, ?, ?)", (row[0], owner, until))
+        
+        jobs = self.db.execute(
+            f"SELECT id, url, not_before FROM jobs WHERE {open_job} AND bucket IN ("
+            f"SELECT bucket FROM buckets WHERE owner = :me) ORDER BY id LIMIT :limit", params).fetchall()
+        self.db.executemany("UPDATE jobs SET state = 1, owner = ?, leased_until = ? WHERE id = ?",
+                            ((owner, until, url_id) for url_id, _, _ in jobs))
+        return jobs
+    
+    def renew(self, owner, seconds=None):
+        """Extend every bucket and job lease held by `owner`"""
+        until = time.time() + (CONFIG['lease_seconds'] if seconds is None else seconds)
+        def extend():
+            self.db.execute("UPDATE buckets SET leased_until = ? WHERE owner = ?", (until, owner))
+            self.db.execute("UPDATE jobs SET leased_until = ? WHERE owner = ? AND state = 1",
+                            (until, owner))
+        self._transaction(extend)
+    
+    def report(self, owner, results):
+        """Store (id, PageResult) pairs fetched by a worker"""
+        def insert():
+            self.db.executemany(
+                "INSERT OR REPLACE INTO results (id, url, status, content_type, links, etag, last_modified, "
+                "size, truncated, fetch_time, parse_time, error) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                ((url_id, page.url, page.status, page.content_type,
+                  json.dumps(sorted(page.links)) if page.links is not None else None,
+                  page.etag, page.last_modified, page.size, int(page.truncated),
+                  page.fetch_time, page.parse_time, page.error) for url_id, page in results))
+            self.db.executemany("UPDATE jobs SET state = 2 WHERE id = ? AND owner = ?",
+                                ((url_id, owner) for url_id, _ in results))
+        self._transaction(insert)
+    
+    def close(self):
+        self.db.close()
+
+class DistributedRoverCrawler(RoverCrawler):
+    """
+    Coordinator of a multi-process crawl.
+    
+    It owns the frontier exactly like RoverCrawler does - same dispatch
+    order, same dedup, results applied in dispatch order - but instead of
+    fetching, it hands URLs to workers through a SharedFrontier. The tree
+    is therefore the one a single-node crawl produces. The visited set and
+    parent edges are checkpointed to shared_dir, so the crawl can be
+    resumed with --resume like a local one.
+    """
+    
+    # Longest wait for results between looks at the shared store; local
+    # workers wake the coordinator as soon as they report
+    MAX_RESULT_WAIT = 1.0
+    
+    def _state_dir(self):
+        """The checkpoint lives next to the shared frontier"""
+        return CONFIG['shared_dir']
+    
+    def _iter_crawl(self, start_url, max_depth):
+        window = max(1, CONFIG['shared_window'])
+        shared = SharedFrontier(CONFIG['shared_dir'])
+        shared.reset()
+        self._start_frontier(start_url, max_depth, window)
+        reported = multiprocessing.Event()
+        workers = spawn_workers(CONFIG['local_workers'], CONFIG['shared_dir'], reported)
+        results = {}
+        wait = 0.01
+        
+        try:
+            while True:
+                batch = []
+                while len(self.pending) < window:
+                    item = self._next_url()
+                    if item is None:
+                        break
+                    current_url, url_id, slot = item
+                    batch.append((url_id, current_url, self.url_filter.host(current_url), slot))
+                    self.pending.append([current_url, url_id, None, None])
+                shared.submit(batch)
+                
+                yield from self._recorded()
+                if not self.pending:
+                    break
+                
+                url_id = self.pending[0][1]
+                if url_id not in results:
+                    reported.clear()
+                    results.update(shared.collect([entry[1] for entry in self.pending
+                                                   if entry[1] not in results]))
+                    if url_id not in results:
+                        # Remote workers cannot signal, so the wait backs off
+                        # while nothing arrives
+                        reported.wait(wait)
+                        wait = min(wait * 2, self.MAX_RESULT_WAIT)
+                        continue
+                    wait = 0.01
+                
+                self.pending.popleft()
+                page = results.pop(url_id)
+                self._count_remote(page)
+                self._process_page(url_id, page)
+                yield from self._recorded()
+        finally:
+            shared.set_finished()
+            shared.close()
+            for process in workers:
+                process.join(timeout=5)
+            self._finish_frontier()
+    
+    def _count_remote(self, page):
+        """Stats a worker's fetch would have counted locally"""
+        if page.links is not None:
+            self._count('pages_crawled')
+            self._count('bytes_downloaded', page.size)
+        if page.truncated:
+            self._count('bodies_truncated')
+        if page.status is not None:
+            self.politeness.feedback(self.url_filter.host(page.url), page.status)
+
+def run_worker(shared_dir, overrides=None, worker_id=None, idle_exit=None, reported=None):
+    """
+    Fetch URLs leased from a coordinator until it finishes.
+    
+    Each leased batch is fetched with -w threads using the normal
+    fetch_links path, at the per-host times the coordinator scheduled.
+    A heartbeat thread renews the worker's leases while it is alive, so
+    only a dead worker's URLs are handed to another one. A worker waits
+    through any stall until the coordinator finishes, gives up after
+    `idle_exit` seconds without work if set, and stops if the coordinator
+    process that spawned it has died. `reported` (an Event) is set after
+    each batch of results. Returns the number of pages fetched.
+    """
+    if overrides:
+        CONFIG.update(overrides)
+    worker_id = worker_id or f"{platform.node()}:{os.getpid()}"
+    shared = SharedFrontier(shared_dir)
+    crawler = RoverCrawler()
+    executor = config_thread_pool(max(1, CONFIG['workers']))
+    fetched = 0
+    idle_since = time.time()
+    parent = multiprocessing.parent_process()
+    stop = threading.Event()
+    
+    def heartbeat():
+        # sqlite3 connections stay in the thread that opened them
+        leases = SharedFrontier(shared_dir)
+        try:
+            while not stop.wait(CONFIG['lease_seconds'] / 3):
+                leases.renew(worker_id)
+        finally:
+            leases.close()
+    
+    threading.Thread(target=contextvars.copy_context().run, args=(heartbeat,), daemon=True).start()
+    
+    def fetch(job):
+        url_id, url, not_before = job
+        return url_id, crawler.fetch_links(url, not_before)
+    
+    print(f"{CONFIG['colors']['info']}[*] Worker {worker_id} polling {shared.path}{CONFIG['colors']['reset']}")
+    try:
+        while not shared.finished():
+            jobs = shared.lease(worker_id)
+            if not jobs:
+                if idle_exit is not None and time.time() - idle_since > idle_exit:
+                    break
+                if parent is not None and not parent.is_alive():
+                    break
+                time.sleep(0.1)
+                continue
+            shared.report(worker_id, list(executor.map(fetch, jobs)))
+            if reported is not None:
+                reported.set()
+            fetched += len(jobs)
+            idle_since = time.time()
+    finally:
+        stop.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+        shared.close()
+    print(f"{CONFIG['colors']['info']}[✓] Worker {worker_id} done: {fetched} URLs fetched{CONFIG['colors']['reset']}")
+    return fetched
+
+def spawn_workers(count, shared_dir, reported=None):
+    """Start `count` local worker processes for a coordinator"""
+    overrides = {key: value for key, value in CONFIG.items() if key != 'colors'}
+    processes = []
+    for index in range(count):
+        process = multiprocessing.Process(target=_worker_main, args=(shared_dir, overrides, reported),
+                                          daemon=True)
+        process.start()
+        processes.append(process)
+    return processes
+
+def _worker_main(shared_dir, overrides, reported):
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        try:
+            run_worker(shared_dir, overrides, reported=reported)
+        except KeyboardInterrupt:
+            pass    # The coordinator handles Ctrl-C
+
+# ============================================================================
+# 14. INCREMENTAL RECRAWL
+# ============================================================================
+
+class SnapshotPage:
+    """What the last crawl recorded about one page"""
+    
+    __slots__ = ('links', 'etag', 'last_modified', 'size', 'checks', 'changes')
+    
+    def __init__(self, links, etag=None, last_modified=None, size=0, checks=0, changes=0):
+        self.links = links          # Sorted in-scope links, None if not an HTML page
+        self.etag = etag
+        self.last_modified = last_modified
+        self.size = size
+        self.checks = checks        # Times the page was fetched or revalidated
+        self.changes = changes      # Checks that found a different link set
+    
+    def change_rate(self):
+        """Smoothed share of checks that found the link set changed"""
+        return (self.changes + 1) / (self.checks + 2)
+
+class SiteSnapshot:
+    """
+    Link map of a site as of its last crawl, kept in `dir/snapshot.sqlite`.
+    
+    Each page is stored with its in-scope links, its validators and how
+    often it was checked and found changed. The tree itself is not stored:
+    map_site() rebuilds it from the link sets, so a page moves to another
+    parent when the links above it change.
+    """
+    
+    FILENAME = 'snapshot.sqlite'
+    
+    def __init__(self, snapshot_dir):
+        os.makedirs(snapshot_dir, exist_ok=True)
+        self.path = os.path.join(snapshot_dir, self.FILENAME)
+        self.db = sqlite3.connect(self.path)
+        self.db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS pages ("
+                        "url TEXT PRIMARY KEY, links TEXT, etag TEXT, last_modified TEXT, "
+                        "size INTEGER NOT NULL, checks INTEGER NOT NULL, changes INTEGER NOT NULL)")
+        self.db.commit()
+    
+    def load(self, start_url):
+        """Pages recorded for start_url ({} if the snapshot is empty or for another site)"""
+        row = self.db.execute("SELECT value FROM meta WHERE key = 'start_url'").fetchone()
+        if row is None or row[0] != start_url:
+            return {}
+        pages = {}
+        for url, links, etag, last_modified, size, checks, changes in self.db.execute(
+                "SELECT url, links, etag, last_modified, size, checks, changes FROM pages"):
+            pages[url] = SnapshotPage(json.loads(links) if links is not None else None,
+                                      etag, last_modified, size, checks, changes)
+        return pages
+    
+    def save(self, start_url, pages):
+        """Replace the snapshot with `pages` ({url: SnapshotPage})"""
+        with self.db:
+            self.db.execute("DELETE FROM pages")
+            self.db.execute("DELETE FROM meta")
+            self.db.execute("INSERT INTO meta VALUES ('start_url', ?)", (start_url,))
+            self.db.executemany(
+                "INSERT INTO pages VALUES (?, ?, ?, ?, ?, ?, ?)",
+                ((url, json.dumps(page.links) if page.links is not None else None,
+                  page.etag, page.last_modified, page.size, page.checks, page.changes)
+                 for url, page in pages.items()))
+    
+    def close(self):
+        self.db.close()
+
+def map_site(start_url, pages, max_depth):
+    """
+    Rebuild the crawl tree from recorded link sets: breadth-first from
+    start_url over sorted links, the first page to link a URL being its
+    parent, as RoverCrawler does. Only recorded pages take part.
+    Returns ({url: depth}, {parent: [children]})
+    """
+    if start_url not in pages:
+        return {}, {}
+    depths = {start_url: 0}
+    children = {}
+    queue = deque([start_url])
+    while queue:
+        url = queue.popleft()
+        links = pages[url].links
+        if links is None or depths[url] >= max_depth:
+            continue
+        for link in links:
+            if link in pages and link not in depths:
+                depths[link] = depths[url] + 1
+                children.setdefault(url, []).append(link)
+                queue.append(link)
+    return depths, children
+
+def site_diff(old_pages, old_depths, new_pages, new_depths):
+    """URLs and link edges added and removed between two site maps"""
+    def edges(pages, depths):
+        return {(url, link) for url in depths
+                for link in pages[url].links or () if link in depths}
+    
+    old_edges = edges(old_pages, old_depths)
+    new_edges = edges(new_pages, new_depths)
+    return {
+        'added_urls': sorted(new_depths.keys() - old_depths.keys()),
+        'removed_urls': sorted(old_depths.keys() - new_depths.keys()),
+        'added_edges': [list(edge) for edge in sorted(new_edges - old_edges)],
+        'removed_edges': [list(edge) for edge in sorted(old_edges - new_edges)],
+    }
+
+class IncrementalRoverCrawler(RoverCrawler):
+    """
+    Recrawl against the SiteSnapshot left by the previous run.
+    
+    Rather than walking the whole site, it checks the root and every page
+    that changed before - most volatile first - revalidating with the
+    stored ETag/Last-Modified so unchanged pages cost a 304. It descends
+    only into the links of pages whose link set changed; URLs it has never
+    seen are fetched as in a normal crawl. The first run, against an empty
+    snapshot, therefore maps the whole site.
+    
+    Recrawl cost follows the churn, not the site size. The trade-off: a
+    change below an unchanged page that never changed before is only
+    found once something above it changes. robots.txt is obeyed as in a
+    full crawl. A recrawl stopped early saves only the pages whose
+    descent it finished, so the rest are looked at again next time.
+    """
+    
+    def _iter_crawl(self, start_url, max_depth):
+        check_config(CONFIG)
+        self.root_domain = urlparse(start_url).netloc
+        self.robots = self._make_robots() if CONFIG['robots'] else None
+        self.url_filter = UrlFilter(self.root_domain, robots=self.robots)
+        snapshot = SiteSnapshot(CONFIG['incremental_dir'])
+        try:
+            yield from self._recrawl(snapshot, start_url, max_depth)
+        finally:
+            snapshot.close()
+    
+    def _recrawl(self, snapshot, start_url, max_depth):
+        """Check pages against the snapshot, then save it with the new link sets"""
+        previous = snapshot.load(start_url)
+        old_depths, _ = map_site(start_url, previous, max_depth)
+        pages = dict(previous)
+        
+        # (-priority, order, url, depth): the root, then pages that changed
+        # before by change rate; unseen URLs rank above any known page
+        queue = []
+        order = itertools.count()
+        queued = {start_url}
+        heapq.heappush(queue, (-2.0, next(order), start_url, 0))
+        for url, depth in old_depths.items():
+            if previous[url].changes and url not in queued:
+                queued.add(url)
+                heapq.heappush(queue, (-previous[url].change_rate(), next(order), url, depth))
+        
+        workers = max(1, CONFIG['workers'])
+        executor = config_thread_pool(workers) if workers > 1 else None
+        pending = deque()
+        checked = 0
+        recorded = set()            # URLs whose check is in `pages`
+        descent = {}                # url -> links its check queued
+        print(f"{CONFIG['colors']['dim']}[*] Incremental recrawl: {len(old_depths)} pages known, "
+              f"{len(queue) - 1} changed before, Max checks: {CONFIG['max_pages']}{CONFIG['colors']['reset']}")
+        
+        finished = False
+        try:
+            while True:
+                while len(pending) < workers and queue and checked < CONFIG['max_pages']:
+                    _, _, url, depth = heapq.heappop(queue)
+                    if not self.url_filter.allows(url):
+                        if url == start_url:
+                            print(f"{CONFIG['colors']['warning']}[!] robots.txt disallows {start_url}{CONFIG['colors']['reset']}")
+                        continue
+                    checked += 1
+                    record = previous.get(url)
+                    cached = None
+                    if record is not None and record.links is not None:
+                        cached = CacheEntry(record.etag, record.last_modified, record.links, record.size)
+                    slot = self.politeness.reserve(self.url_filter.host(url))
+                    follow = depth < max_depth
+                    if executor is None:
+                        job = self.fetch_links(url, slot, cached, follow)
+                    else:
+                        job = executor.submit(self.fetch_links, url, slot, cached, follow)
+                    pending.append((url, depth, job))
+                
+                if not pending:
+                    break
+                
+                url, depth, job = pending.popleft()
+                page = job if executor is None else job.result()
+                page.depth = depth
+                changed = self._check_page(url, page, pages)
+                recorded.add(url)
+                if changed and depth < max_depth:
+                    for link in pages[url].links or ():
+                        if link not in queued:
+                            queued.add(link)
+                            descent.setdefault(url, []).append(link)
+                            known = previous.get(link)
+                            priority = 1.0 if known is None else known.change_rate()
+                            heapq.heappush(queue, (-priority, next(order), link, depth + 1))
+                yield page
+            finished = True
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+            if not finished:
+                self._save_settled(snapshot, start_url, previous, pages, recorded, descent)
+        
+        # Pages no longer reachable drop out of the snapshot
+        depths, children = map_site(start_url, pages, max_depth)
+        self.diff = site_diff(previous, old_depths, pages, depths)
+        snapshot.save(start_url, {url: pages[url] for url in depths})
+        self.tree = build_nested_tree(start_url, children) if depths else {}
+    
+    @staticmethod
+    def _save_settled(snapshot, start_url, previous, pages, recorded, descent):
+        """
+        Save a recrawl stopped early. A page keeps its new record only if
+        every link its check queued was checked in turn (and so on down);
+        otherwise its old record stays, so the next run sees the change
+        again and descends into it.
+        """
+        settled = {}
+        
+        def is_settled(url):
+            if url not in settled:
+                settled[url] = url in recorded and all(is_settled(link) for link in descent.get(url, ()))
+            return settled[url]
+        
+        saved = dict(previous)
+        saved.update((url, pages[url]) for url in recorded if is_settled(url))
+        snapshot.save(start_url, saved)
+    
+    def _result_tree(self):
+        return self.tree
+    
+    def _check_page(self, url, page, pages):
+        """Record a checked page in `pages`; True if its links need visiting"""
+        old = pages.get(url)
+        # A failed or transient answer says nothing about the links
+        if old is not None and (page.status is None or page.status in self.RETRY_STATUSES):
+            return False
+        
+        links = None
+        if page.links is not None:
+            links = sorted({link for link in page.links if self.url_filter.allows(link)})
+            self._count('links_found', len(links))
+        record = SnapshotPage(links, page.etag, page.last_modified, page.size, checks=1)
+        if page.from_cache:
+            record.etag, record.last_modified, record.size = old.etag, old.last_modified, old.size
+        
+        self._count('pages_checked')
+        if old is None:
+            self._count('pages_new')
+            if page.status is None or page.status in self.RETRY_STATUSES:
+                # Counted as a change, so the next run looks at it again
+                record.changes = 1
+            pages[url] = record
+            return True
+        
+        changed = old.links != links
+        record.checks = old.checks + 1
+        record.changes = old.changes + changed
+        pages[url] = record
+        if changed:
+            self._count('pages_changed')
+            if CONFIG['verbose']:
+                print(f"{CONFIG['colors']['warning']}[~] Links changed: {url}{CONFIG['colors']['reset']}")
+        return changed
+
+# ============================================================================
+# 15. BATCH CRAWLING
+# ============================================================================
+
+# Per-site budgets a seeds file line may set, and the settings they override
+SEED_BUDGETS = {'depth': 'max_depth', 'pages': 'max_pages'}
+
+def read_seeds(filename):
+    """
+    Seeds for a batch crawl: one URL per line, optionally followed by
+    depth=N and/or pages=N budgets for that site. Blank lines and lines
+    starting with # are skipped. Returns [(url, overrides)] and raises
+    ValueError naming the first bad line.
+    """
+    seeds = []
+    with open(filename, encoding='utf-8') as f:
+        for number, line in enumerate(f, 1):
+            fields = line.split()
+            if not fields or fields[0].startswith('#'):
+                continue
+            url, overrides = fields[0], {}
+            if not url.startswith(('http://', 'https://')):
+                raise ValueError(f"line {number}: URL must start with http:// or https://")
+            for field in fields[1:]:
+                name, _, value = field.partition('=')
+                if name not in SEED_BUDGETS or not value.isdigit():
+                    raise ValueError(f"line {number}: expected depth=N or pages=N, not {field!r}")
+                overrides[SEED_BUDGETS[name]] = int(value)
+            seeds.append((url, overrides))
+    return seeds
+
+def site_slug(url):
+    """File-name-safe name for a site: the host and path of its seed URL"""
+    parts = urlsplit(url)
+    slug = re.sub(r'[^A-Za-z0-9._-]+', '_', parts.netloc + parts.path).strip('_.')
+    return slug[:100] or 'site'
+
+class SiteCrawler(RoverCrawler):
+    """
+    One site of a BatchCrawler: its own frontier, dedup and budgets (so
+    its tree is the one a lone crawl of the site produces), but the
+    batch's HTTP client, host schedule and robots.txt cache. It crawls
+    quietly; the batch reports each site as it finishes.
+    """
+    
+    announce = False
+    
+    def __init__(self, batch, url, overrides):
+        self.batch = batch
+        self.url = url
+        self.last_dispatch = 0      # Batch dispatch count at this site's latest dispatch
+        super().__init__(CrawlConfig(batch.config, **overrides))
+        self.politeness = batch.politeness
+    
+    def _make_session(self):
+        return self.batch.session
+    
+    def _make_robots(self):
+        return self.batch.robots
+    
+    @configured
+    def open(self, workers):
+        """Set up the site's frontier, without requests; returns the root's id"""
+        return self._open_frontier(self.url, CONFIG['max_depth'], workers)
+    
+    @configured
+    def seed(self, root_id):
+        """Queue the root and sitemap URLs; fetches robots.txt and sitemaps, so it runs on a batch worker"""
+        self._seed_frontier(self.url, root_id)
+    
+    def dispatchable(self):
+        """Whether a URL is queued and the page budget is not spent"""
+        return bool(self.to_visit) and self.store.visited_count < self.config['max_pages']
+
+class BatchCrawler:
+    """
+    Crawl the sites of a seed list concurrently in one process.
+    
+    Sites are opened `batch_sites` at a time as SiteCrawlers. They share
+    one pool of `workers` fetch threads (the global concurrency limit),
+    one HTTP client pooling connections for every open site, one host
+    schedule, one robots.txt cache and, with --parse-procs, one parse
+    stage. A free worker goes to the open site that may fetch soonest,
+    ties going to the site with the fewest pages in flight and then to
+    the one served longest ago, so big sites cannot starve small ones.
+    
+    A seed's robots.txt and sitemaps are fetched on a worker like any
+    page, and the site opens once its frontier is seeded. Each site's
+    pages are recorded in its own dispatch order. When a site is done, its
+    tree is written to out_dir/<site>.json and a summary line is appended
+    to out_dir/batch.jsonl; the site's memory is freed before the next
+    seed is opened.
+    """
+    
+    def __init__(self, seeds, out_dir):
+        self.config = ActiveConfig.current()
+        self.seeds = deque(seeds)
+        self.total = len(self.seeds)
+        self.out_dir = out_dir
+        self.workers = max(1, CONFIG['workers'])
+        self.max_sites = max(1, CONFIG['batch_sites'] or 2 * self.workers)
+        self.session = make_http_client(self.workers, hosts=self.max_sites)
+        self.politeness = HostPoliteness()
+        self.robots = RobotsCache(self.politeness) if CONFIG['robots'] else None
+        self.active = []            # Open SiteCrawlers
+        self.starting = []          # [SiteCrawler, future of its seed()]
+        self.names = set()          # Output file names taken
+        self.dispatches = 0
+        self.in_flight = 0          # Site starts and pages dispatched, not yet recorded
+        self.summary = None
+        self.stats = {
+            'sites_done': 0,
+            'sites_failed': 0,
+            'pages_crawled': 0,
+            'links_found': 0,
+            'errors': 0,
+            'start_time': time.time()
+        }
+    
+    @configured
+    def run(self):
+        """Crawl every seed, writing each site's results as it finishes"""
+        os.makedirs(self.out_dir, exist_ok=True)
+        executor = config_thread_pool(self.workers)
+        parse_stage = ParseStage(CONFIG['parse_processes']) if CONFIG['parse_processes'] > 0 else None
+        self.summary = open(os.path.join(self.out_dir, 'batch.jsonl'), 'w', encoding='utf-8')
+        print(f"{CONFIG['colors']['dim']}[*] Batch of {self.total} sites: {self.max_sites} at a time, "
+              f"Workers: {self.workers}, Output: {self.out_dir}{CONFIG['colors']['reset']}")
+        
+        try:
+            while self.seeds or self.active or self.starting:
+                self._open_sites(executor)
+                
+                while self.in_flight < self.workers:
+                    site = self._next_site()
+                    if site is None:
+                        break
+                    self._dispatch(site, executor, parse_stage)
+                
+                recorded = 0
+                for site in list(self.active):
+                    try:
+                        recorded += self._record(site, parse_stage)
+                        if not site.pending and not site.dispatchable():
+                            self._finish(site)
+                    except Exception as e:
+                        self._fail(site, e)
+                
+                if not recorded:
+                    # Nothing to record yet: wait for the oldest page of any
+                    # site, or for a site to finish starting
+                    heads = [site.pending[0] for site in self.active if site.pending]
+                    waits = [entry[2] if entry[3] is None else entry[3] for entry in heads]
+                    waits += [future for _, future in self.starting]
+                    if waits:
+                        if parse_stage is not None and heads:
+                            parse_stage.flush()
+                        concurrent.futures.wait(waits, return_when=concurrent.futures.FIRST_COMPLETED)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+            if parse_stage is not None:
+                parse_stage.shutdown()
+            for site, future in self.starting:
+                if not future.cancel():
+                    # Seeding still uses the site's store
+                    concurrent.futures.wait([future])
+                self.active.append(site)
+            for site in self.active:
+                with use_config(site.config):
+                    site._finish_frontier()
+            self.summary.close()
+    
+    def _open_sites(self, executor):
+        """
+        Open the sites whose seeding finished, and open seeds (seeding
+        them on the workers) until batch_sites sites are open or starting
+        """
+        for entry in list(self.starting):
+            site, future = entry
+            if not future.done():
+                continue
+            self.starting.remove(entry)
+            self.in_flight -= 1
+            error = future.exception()
+            if error is not None:
+                self._fail(site, error)
+            else:
+                self.active.append(site)
+        
+        while (self.seeds and len(self.active) + len(self.starting) < self.max_sites
+               and self.in_flight < self.workers):
+            url, overrides = self.seeds.popleft()
+            try:
+                site = SiteCrawler(self, url, overrides)
+                root_id = site.open(self.workers)
+            except Exception as e:
+                self._report(url, None, error=e)
+                continue
+            # Seeding takes a worker like a fetch does
+            self.starting.append((site, executor.submit(site.seed, root_id)))
+            self.in_flight += 1
+    
+    def _next_site(self):
+        """The open site a free worker should go to, or None if no site has a URL to fetch"""
+        now = time.time()
+        best, best_key = None, None
+        for site in self.active:
+            if site.dispatchable():
+                key = (max(site.to_visit.next_ready(), now), len(site.pending), site.last_dispatch)
+                if best_key is None or key < best_key:
+                    best, best_key = site, key
+        return best
+    
+    def _dispatch(self, site, executor, parse_stage):
+        """Hand the site's next URL to a worker"""
+        try:
+            with use_config(site.config):
+                item = site._next_url()
+        except Exception as e:
+            self._fail(site, e)
+            return
+        if item is None:
+            return
+        url, url_id, slot = item
+        if parse_stage is None:
+            job = executor.submit(site.fetch_links, url, slot, follow=site._follows(url_id))
+        else:
+            job = executor.submit(site.fetch_page, url, slot)
+        site.pending.append([url, url_id, job, None])
+        self.dispatches += 1
+        site.last_dispatch = self.dispatches
+        self.in_flight += 1
+    
+    def _record(self, site, parse_stage):
+        """Record the site's finished pages, in dispatch order; returns how many"""
+        count = 0
+        with use_config(site.config):
+            if parse_stage is not None:
+                parse_stage.collect(site.pending)
+            while site.pending:
+                _, url_id, job, parse_job = site.pending[0]
+                done = job if parse_stage is None else parse_job
+                if done is None or not done.done():
+                    break
+                site.pending.popleft()
+                self.in_flight -= 1
+                count += 1
+                site._process_page(url_id, done.result())
+            site.recorded.clear()
+        return count
+    
+    def _finish(self, site):
+        """Write a finished site's tree and summary line, and close it"""
+        self.active.remove(site)
+        with use_config(site.config):
+            site._finish_frontier()
+            tree = site._result_tree()
+        name = site_slug(site.url)
+        if name in self.names:
+            name = f"{name}-{next(n for n in itertools.count(2) if f'{name}-{n}' not in self.names)}"
+        self.names.add(name)
+        with open(os.path.join(self.out_dir, name + '.json'), 'w') as f:
+            write_tree_json(tree, f)
+        self._report(site.url, site, file=name + '.json')
+    
+    def _fail(self, site, error):
+        """Drop a site whose crawl raised, keeping the rest of the batch going"""
+        if site in self.active:
+            self.active.remove(site)
+        for entry in site.pending:
+            entry[2].cancel()
+        self.in_flight -= len(site.pending)
+        site.pending.clear()
+        try:
+            with use_config(site.config):
+                site._finish_frontier()
+        except Exception:
+            pass
+        self._report(site.url, site, error=error)
+    
+    def _report(self, url, site, file=None, error=None):
+        """Append a site's line to batch.jsonl, add it to the totals and print it"""
+        record = {'url': url}
+        if file is not None:
+            record['file'] = file
+        if site is not None:
+            for key in ('pages_crawled', 'links_found', 'errors'):
+                record[key] = site.stats[key]
+                self.stats[key] += site.stats[key]
+            record['seconds'] = round(time.time() - site.stats['start_time'], 3)
+        if error is not None:
+            record['error'] = str(error)
+            self.stats['sites_failed'] += 1
+        else:
+            self.stats['sites_done'] += 1
+        self.summary.write(json.dumps(record) + '\n')
+        self.summary.flush()
+        
+        finished = self.stats['sites_done'] + self.stats['sites_failed']
+        if error is not None:
+            print(f"{CONFIG['colors']['error']}[!] ({finished}/{self.total}) {url}: {error}{CONFIG['colors']['reset']}")
+        else:
+            print(f"{CONFIG['colors']['info']}[✓] ({finished}/{self.total}) {url}: {record['pages_crawled']} pages, "
+                  f"{record['errors']} errors, {record['seconds']:.1f}s -> {file}{CONFIG['colors']['reset']}")
+    
+    def connection_stats(self):
+        """(connections opened, requests that reused a connection) across all sites"""
+        for adapter in getattr(self.session, 'adapters', {}).values():
+            if isinstance(adapter, counting_adapter()):
+                opened, sent = adapter.connection_counts()
+                return opened, max(0, sent - opened)
+        return 0, 0
+    
+    @configured
+    def print_stats(self):
+        """Print batch totals"""
+        elapsed = time.time() - self.stats['start_time']
+        print(f"\n{CONFIG['colors']['info']}{'='*60}{CONFIG['colors']['reset']}")
+        print(f"{CONFIG['colors']['root']}BATCH STATISTICS:{CONFIG['colors']['reset']}")
+        print(f"{CONFIG['colors']['dim']}  Sites:        {self.stats['sites_done']} done, "
+              f"{self.stats['sites_failed']} failed, {self.total} seeds")
+        print(f"  Pages crawled: {self.stats['pages_crawled']}")
+        print(f"  Links found:  {self.stats['links_found']}")
+        print(f"  Errors:       {self.stats['errors']}")
+        print(f"  Time elapsed: {elapsed:.1f} seconds")
+        opened, reused = self.connection_stats()
+        if opened:
+            print(f"  Connections:  {opened} opened, {reused} requests reused one "
+                  f"({reused / (opened + reused) * 100:.0f}% reuse)")
+        if elapsed > 0:
+            print(f"  Avg speed:    {self.stats['pages_crawled']/elapsed:.1f} pages/sec{CONFIG['colors']['reset']}")
+        print(f"{CONFIG['colors']['info']}{'='*60}{CONFIG['colors']['reset']}")
+    
+    def stats_report(self):
+        """Batch totals as a JSON-serializable dict"""
+        stats = {key: value for key, value in self.stats.items() if key != 'start_time'}
+        stats['elapsed'] = round(time.time() - self.stats['start_time'], 3)
+        stats['connections_opened'], stats['connections_reused'] = self.connection_stats()
+        return {'stats': stats}
+
+# ============================================================================
+# 16. TREE RENDERING
+# ============================================================================
+
+def build_nested_tree(root, children_map):
+    """
+    Build the nested-dict tree from a children map using an explicit stack,
+    so arbitrarily deep sites never hit the recursion limit
+    """
+    root_subtree = {}
+    stack = [(root, root_subtree)]
+    while stack:
+        node, subtree = stack.pop()
+        for child in children_map.get(node, ()):
+            child_subtree = subtree[child] = {}
+            stack.append((child, child_subtree))
+    return {root: root_subtree}
+
+def iter_tree(tree):
+    """Yield (url, children, depth) for every node in display order, without recursion"""
+    stack = [(iter(tree.items()), 0)]
+    while stack:
+        items, depth = stack[-1]
+        for url, children in items:
+            yield url, children, depth
+            if children:
+                stack.append((iter(children.items()), depth + 1))
+            break
+        else:
+            stack.pop()
+
+def render_tree(tree, out=None, colors=None):
+    """
+    Write the tree structure to a stream with colors and formatting.
+    
+    Iterative, computes the root domain once and writes each line straight
+    to `out` (stdout by default) instead of building the output in memory.
+    """
+    if not tree:
+        return
+    out = out or sys.stdout
+    colors = CONFIG['colors'] if colors is None else colors
+    link_color, external_color, reset = colors['link'], colors['external'], colors['reset']
+    root_domain = urlparse(next(iter(tree))).netloc
+    write = out.write
+    
+    # Each frame: (items, index of next item, prefix, top level?)
+    stack = [(list(tree.items()), 0, "", True)]
+    while stack:
+        items, i, prefix, is_root = stack.pop()
+        if i >= len(items):
+            continue
+        stack.append((items, i + 1, prefix, is_root))
+        url, children = items[i]
+        is_last_item = (i == len(items) - 1)
+        
+        # Determine branch characters
+        if is_root and i == 0:
+            branch = ""
+            new_prefix = ""
+        else:
+            branch = "└── " if is_last_item else "├── "
+            new_prefix = prefix + ("    " if is_last_item else "│   ")
+        
+        # Color coding
+        parsed = urlparse(url)
+        if parsed.netloc != root_domain:
+            color = external_color
+            suffix = " (external)"
+        else:
+            color = link_color
+            suffix = ""
+        
+        write(f"{prefix}{branch}{color}{parsed.path or '/'}{suffix}{reset}\n")
+        
+        if children:
+            stack.append((list(children.items()), 0, new_prefix, False))
+
+def print_tree(tree):
+    """
+    Print tree structure with colors and formatting
+    """
+    render_tree(tree, sys.stdout)
+
+# ============================================================================
+# 17. INTERACTIVE MODE
+# ============================================================================
+
+def interactive_setup():
+    """Interactive configuration setup"""
+    print(f"{CONFIG['colors']['root']}INTERACTIVE MODE{CONFIG['colors']['reset']}")
+    print(f"{CONFIG['colors']['dim']}Configure the crawler (press Enter for defaults):{CONFIG['colors']['reset']}")
+    print()
+    
+    # Get target URL
+    while True:
+        url = input(f"{CONFIG['colors']['info']}Target URL (include http:// or https://): {CONFIG['colors']['reset']}").strip()
         if url:
             if not url.startswith(('http://', 'https://')):
                 print(f"{CONFIG['colors']['warning']}[!] Please include http:// or https://{CONFIG['colors']['reset']}")
@@ -396,89 +4569,729 @@ def interactive_setup():
         else:
             print(f"{CONFIG['colors']['error']}[!] URL is required{CONFIG['colors']['reset']}")
     
-    # Get max depth
-    depth_input = input(f"{CONFIG['colors']['info']}Max crawl depth [{CONFIG['max_depth']}]: {CONFIG['colors']['reset']}").strip()
-    if depth_input.isdigit():
-        depth = int(depth_input)
-        if 1 <= depth <= 10:
-            CONFIG['max_depth'] = depth
-        else:
-            print(f"{CONFIG['colors']['warning']}[!] Depth must be between 1-10, using default{CONFIG['colors']['reset']}")
+    # Get max depth
+    depth_input = input(f"{CONFIG['colors']['info']}Max crawl depth [{CONFIG['max_depth']}]: {CONFIG['colors']['reset']}").strip()
+    if depth_input.isdigit():
+        depth = int(depth_input)
+        if 1 <= depth <= 10:
+            CONFIG['max_depth'] = depth
+        else:
+            print(f"{CONFIG['colors']['warning']}[!] Depth must be between 1-10, using default{CONFIG['colors']['reset']}")
+    
+    # Get max pages
+    pages_input = input(f"{CONFIG['colors']['info']}Max pages to crawl [{CONFIG['max_pages']}]: {CONFIG['colors']['reset']}").strip()
+    if pages_input.isdigit():
+        pages = int(pages_input)
+        if 10 <= pages <= 1000:
+            CONFIG['max_pages'] = pages
+        else:
+            print(f"{CONFIG['colors']['warning']}[!] Pages must be between 10-1000, using default{CONFIG['colors']['reset']}")
+    
+    # Get verbose mode
+    verbose_input = input(f"{CONFIG['colors']['info']}Verbose mode? [y/N]: {CONFIG['colors']['reset']}").strip().lower()
+    CONFIG['verbose'] = verbose_input in ('y', 'yes')
+    
+    # Get external links
+    external_input = input(f"{CONFIG['colors']['info']}Follow external links? [y/N]: {CONFIG['colors']['reset']}").strip().lower()
+    CONFIG['follow_external'] = external_input in ('y', 'yes')
+    
+    print()
+    return url
+
+# ============================================================================
+# 18. BENCHMARKS
+# ============================================================================
+
+def synthetic_page(index, links=200, size=50000, seed=0):
+    """Generate a deterministic HTML page with `links` anchors, padded to ~size bytes"""
+    rng = random.Random(seed * 1000003 + index)
+    parts = [f"<html><head><title>Page {index}</title>",
+             '<link rel="stylesheet" href="/static/site.css"></head><body>']
+    for i in range(links):
+        target = rng.randrange(links * 10)
+        parts.append(f'<div class="item"><a href="/section/{target % 17}/page-{target}?ref={i}#top">'
+                     f'Item {i}</a><span>{rng.random():.6f}</span></div>')
+    body = ''.join(parts)
+    filler = '<p>Lorem ipsum dolor sit amet, consectetur adipiscing elit.</p>'
+    if len(body) < size:
+        body += filler * ((size - len(body)) // len(filler))
+    return body + "</body></html>"
+
+def benchmark_parse(pages=400, max_processes=None, parser=None):
+    """
+    Measure link extraction throughput in-thread and through ParseStage
+    with 1..N worker processes on a synthetic corpus
+    """
+    max_processes = max_processes or os.cpu_count() or 1
+    corpus = [(synthetic_page(i), f"https://bench.local/page-{i}") for i in range(pages)]
+    results = []
+    
+    start = time.perf_counter()
+    for html, url in corpus:
+        extract_links(html, url, parser)
+    elapsed = time.perf_counter() - start
+    results.append({'processes': 0, 'seconds': elapsed, 'pages_per_sec': pages / elapsed})
+    
+    counts = sorted({max_processes} | {2 ** i for i in range(max_processes.bit_length()) if 2 ** i <= max_processes})
+    for processes in counts:
+        stage = ParseStage(processes, parser=parser)
+        try:
+            # Warm up the pool so process start-up is not measured
+            stage.submit(*corpus[0])
+            stage.flush()
+            start = time.perf_counter()
+            futures = [stage.submit(html, url) for html, url in corpus]
+            stage.flush()
+            for future in futures:
+                future.result()
+            elapsed = time.perf_counter() - start
+        finally:
+            stage.shutdown()
+        results.append({'processes': processes, 'seconds': elapsed, 'pages_per_sec': pages / elapsed})
+    
+    return results
+
+def benchmark_urls(pages=300, links=200, repeats=3):
+    """
+    Compare normalize_url + should_crawl_url against a UrlFilter on the hrefs
+    of synthetic navigation-heavy pages
+    """
+    corpus = []
+    for i in range(pages):
+        parser = FastHrefParser()
+        parser.feed(synthetic_page(i, links=links, size=0))
+        corpus.append((f"https://bench.local/section/{i % 17}/page-{i}", parser.close()))
+    total = sum(len(hrefs) for _, hrefs in corpus) * repeats
+    results = []
+    
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for base_url, hrefs in corpus:
+            for href in hrefs:
+                url = normalize_url(base_url, href)
+                if url:
+                    should_crawl_url(url, 'bench.local', ())
+    elapsed = time.perf_counter() - start
+    results.append({'method': 'functions', 'seconds': elapsed, 'hrefs_per_sec': total / elapsed})
+    
+    url_filter = UrlFilter('bench.local')
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for base_url, hrefs in corpus:
+            for url in url_filter.normalize_all(base_url, hrefs):
+                url_filter.allows(url)
+    elapsed = time.perf_counter() - start
+    results.append({'method': 'UrlFilter', 'seconds': elapsed, 'hrefs_per_sec': total / elapsed})
+    
+    return results
+
+def benchmark_tree(nodes=100000, chain=2000, seed=0):
+    """
+    Time tree construction, counting, rendering and JSON export on a
+    synthetic tree: a random wide tree plus a long pagination chain
+    """
+    rng = random.Random(seed)
+    root = "https://bench.local/"
+    urls = [root]
+    children_map = {}
+    for i in range(1, nodes - chain):
+        parent = urls[rng.randrange(len(urls))]
+        url = f"https://bench.local/section/{i % 97}/page-{i}"
+        urls.append(url)
+        children_map.setdefault(parent, []).append(url)
+    parent = root
+    for i in range(chain):
+        url = f"https://bench.local/archive/page/{i + 2}"
+        children_map.setdefault(parent, []).append(url)
+        parent = url
+    
+    results = []
+    
+    def timed(name, func):
+        start = time.perf_counter()
+        value = func()
+        results.append({'step': name, 'seconds': time.perf_counter() - start})
+        return value
+    
+    tree = timed('build', lambda: build_nested_tree(root, children_map))
+    timed('count', lambda: count_urls(tree))
+    with open(os.devnull, 'w') as devnull:
+        timed('render', lambda: render_tree(tree, devnull))
+        timed('json', lambda: write_tree_json(tree, devnull))
+    return results
+
+class SyntheticSite:
+    """
+    Generated website served from a local HTTP server, for benchmarks
+    that must run without network access.
+    
+    Pages form a complete tree with `fanout` children per page down to
+    `depth`. Each page also repeats `duplication * fanout` links to random
+    existing pages (like navigation menus), is padded to `page_size` bytes,
+    and is served after `latency` seconds. A deterministic `error_rate`
+    fraction of pages answer 500. Pages carry an ETag and answer a
+    matching If-None-Match with 304.
+    """
+    
+    DEFAULTS = {
+        'fanout': 8,
+        'depth': 3,
+        'page_size': 20000,
+        'duplication': 0.5,
+        'latency': 0.01,
+        'error_rate': 0.0,
+        'seed': 0,
+    }
+    
+    def __init__(self, **options):
+        unknown = set(options) - set(self.DEFAULTS)
+        if unknown:
+            raise ValueError(f"Unknown site option(s): {', '.join(sorted(unknown))}")
+        self.options = dict(self.DEFAULTS, **options)
+        self.fanout = max(1, int(self.options['fanout']))
+        self.depth = max(0, int(self.options['depth']))
+        self.pages = sum(self.fanout ** level for level in range(self.depth + 1))
+        self.server = None
+    
+    def render(self, node):
+        """(status, html) for a page id"""
+        rng = random.Random(self.options['seed'] * 1000003 + node)
+        if node and rng.random() < self.options['error_rate']:
+            return 500, "<html><body>Internal error</body></html>"
+        
+        parts = [f"<html><head><title>Page {node}</title>",
+                 '<link rel="stylesheet" href="/static/site.css"></head><body>',
+                 '<nav><a href="/">Home</a></nav><ul>']
+        first_child = node * self.fanout + 1
+        for child in range(first_child, min(first_child + self.fanout, self.pages)):
+            parts.append(f'<li><a href="/n/{child}">Page {child}</a></li>')
+        for _ in range(int(self.fanout * self.options['duplication'])):
+            target = rng.randrange(self.pages)
+            parts.append(f'<li><a href="/n/{target}?from={node}">Related {target}</a></li>')
+        parts.append("</ul>")
+        body = ''.join(parts)
+        filler = '<p>Lorem ipsum dolor sit amet, consectetur adipiscing elit.</p>'
+        size = int(self.options['page_size'])
+        if len(body) < size:
+            body += filler * ((size - len(body)) // len(filler))
+        return 200, body + "</body></html>"
+    
+    def start(self):
+        """Serve the site on a free localhost port and return its root URL"""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        site = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True  # Headers and body go out as separate writes
+            
+            def log_message(self, *args):
+                pass
+            
+            def do_GET(self):
+                path = self.path.split('?', 1)[0].rstrip('/')
+                node = None
+                if path == '':
+                    node = 0
+                elif path.startswith('/n/') and path[3:].isdigit():
+                    node = int(path[3:])
+                if site.options['latency']:
+                    time.sleep(site.options['latency'])
+                etag = None
+                if node is None or node >= site.pages:
+                    status, body, content_type = 404, b"not found", 'text/plain'
+                else:
+                    status, html = site.render(node)
+                    body, content_type = html.encode('utf-8'), 'text/html; charset=utf-8'
+                    if status == 200:
+                        etag = f'"{zlib.crc32(body):08x}"'
+                        if self.headers.get('If-None-Match') == etag:
+                            status, body = 304, b''
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                if etag is not None:
+                    self.send_header('ETag', etag)
+                self.end_headers()
+                self.wfile.write(body)
+        
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.server.handle_error = lambda request, client_address: None  # Clients hanging up
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+    
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+def parse_site_spec(spec):
+    """Parse 'fanout=8,depth=3,latency=0.02' into SyntheticSite options"""
+    options = {}
+    for part in (spec or '').split(','):
+        if not part.strip():
+            continue
+        key, _, value = part.partition('=')
+        options[key.strip()] = float(value) if '.' in value else int(value)
+    return options
+
+def percentile(values, q):
+    """Nearest-rank percentile of a list of numbers (None if empty)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+def _benchmark_crawl_run(start_url, backend, workers, overrides):
+    """
+    Crawl the synthetic site once and summarize it.
+    Runs in a fresh child process so peak memory is per run.
+    """
+    CONFIG.update(overrides)
+    CONFIG['workers'] = workers
+    with tempfile.TemporaryDirectory() as tmp:
+        CONFIG['ndjson_path'] = os.path.join(tmp, 'pages.jsonl')
+        crawler = AsyncRoverCrawler() if backend == 'async' else RoverCrawler()
+        with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+            start = time.perf_counter()
+            crawler.crawl(start_url)
+            elapsed = time.perf_counter() - start
+        records = list(read_ndjson(CONFIG['ndjson_path']))
+    
+    fetch_ms = [r['fetch_ms'] for r in records if r['status'] is not None]
+    # Process-pool parsing is not timed per page
+    parse_ms = [] if CONFIG['parse_processes'] else [r['parse_ms'] for r in records if r['outlinks'] is not None]
+    return {
+        'backend': backend,
+        'workers': workers,
+        'pages': crawler.stats['pages_crawled'],
+        'errors': crawler.stats['errors'],
+        'seconds': round(elapsed, 3),
+        'pages_per_sec': round(crawler.stats['pages_crawled'] / elapsed, 2) if elapsed else None,
+        'fetch_p50_ms': percentile(fetch_ms, 50),
+        'fetch_p95_ms': percentile(fetch_ms, 95),
+        'parse_ms_per_page': round(sum(parse_ms) / len(parse_ms), 3) if parse_ms else None,
+        'peak_rss_mb': crawler.peak_memory_mb(),
+    }
+
+def benchmark_crawl(site_options=None, workers=None):
+    """
+    Crawl a local synthetic site with each backend (sequential, threaded
+    and, if aiohttp is installed, async) and report throughput, latency,
+    parse cost and peak memory per run
+    """
+    site = SyntheticSite(**(site_options or {}))
+    workers = workers if workers and workers > 1 else 8
+    start_url = site.start()
+    overrides = {
+        'rate_limit': 0,
+        'max_depth': site.depth,
+        'max_pages': site.pages,
+        'follow_external': False,
+        'verbose': False,
+        'link_parser': CONFIG['link_parser'],
+        'parse_processes': CONFIG['parse_processes'],
+        'bloom_capacity': CONFIG['bloom_capacity'],
+    }
+    runs = [('threads', 1), ('threads', workers)]
+    if AIOHTTP_AVAILABLE and not CONFIG['parse_processes']:
+        runs.append(('async', workers))
+    
+    results = []
+    try:
+        for backend, count in runs:
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                row = pool.submit(_benchmark_crawl_run, start_url, backend, count, overrides).result()
+            row['site'] = dict(site.options, pages=site.pages)
+            results.append(row)
+    finally:
+        site.stop()
+    return results
+
+BENCHMARKS = ('crawl', 'parse', 'tree', 'urls')
+
+def run_benchmark(name, site_spec=None, json_file=None):
+    """Run a named benchmark, print its results and optionally save them as JSON"""
+    if name == 'crawl':
+        options = parse_site_spec(site_spec)
+        print(f"{CONFIG['colors']['info']}[*] Crawl of a local synthetic site ({site_spec or 'default site'}){CONFIG['colors']['reset']}")
+        results = benchmark_crawl(options, CONFIG['workers'])
+        for row in results:
+            label = f"{row['backend']} x{row['workers']}"
+            print(f"  {label:<12} {row['pages_per_sec']:>8.1f} pages/sec  "
+                  f"p50 {row['fetch_p50_ms']} ms  p95 {row['fetch_p95_ms']} ms  "
+                  f"parse {row['parse_ms_per_page']} ms/page  peak {row['peak_rss_mb']:.0f} MB")
+    elif name == 'parse':
+        print(f"{CONFIG['colors']['info']}[*] Link extraction ({CONFIG['link_parser']} parser, batch {CONFIG['parse_batch']}){CONFIG['colors']['reset']}")
+        results = benchmark_parse(max_processes=CONFIG['parse_processes'] or None)
+        for row in results:
+            label = "in-thread" if row['processes'] == 0 else f"{row['processes']} process(es)"
+            print(f"  {label:<16} {row['pages_per_sec']:>8.1f} pages/sec  ({row['seconds']:.2f}s)")
+    elif name == 'tree':
+        print(f"{CONFIG['colors']['info']}[*] Tree build/render on a synthetic 100k-node tree{CONFIG['colors']['reset']}")
+        results = benchmark_tree()
+        for row in results:
+            print(f"  {row['step']:<16} {row['seconds']:>8.3f}s")
+    elif name == 'urls':
+        print(f"{CONFIG['colors']['info']}[*] URL normalization and filtering{CONFIG['colors']['reset']}")
+        results = benchmark_urls()
+        for row in results:
+            print(f"  {row['method']:<16} {row['hrefs_per_sec']:>10.0f} hrefs/sec  ({row['seconds']:.2f}s)")
+    else:
+        raise ValueError(f"Unknown benchmark: {name}")
+    
+    if json_file:
+        report = {
+            'benchmark': name,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'config': {key: CONFIG[key] for key in ('link_parser', 'workers', 'parse_processes', 'parse_batch')},
+            'results': results,
+        }
+        with open(json_file, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"{CONFIG['colors']['info']}[✓] Benchmark results written to {json_file}{CONFIG['colors']['reset']}")
+    return results
+
+# ============================================================================
+# 19. CLI PARSER
+# ============================================================================
+
+def parse_cli():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(
+        description='RoverCrawler v2.1 - Web crawler for site structure mapping',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python rovercrawler.py https://example.com
+  python rovercrawler.py https://example.com -d 4 -v --external
+  python rovercrawler.py --export-json results.json
+
+Note: External libraries required:
+  pip install requests beautifulsoup4 colorama
+"""
+    )
+    
+    parser.add_argument(
+        'url',
+        nargs='?',
+        help='Target URL to crawl (e.g., https://example.com)'
+    )
+    
+    parser.add_argument(
+        '-d', '--depth',
+        type=int,
+        help=f'Maximum crawl depth (default: {CONFIG["max_depth"]})'
+    )
+    
+    parser.add_argument(
+        '-p', '--pages',
+        type=int,
+        help=f'Maximum pages to crawl (default: {CONFIG["max_pages"]})'
+    )
+    
+    parser.add_argument(
+        '-v', '--verbose',
+        action='store_true',
+        help='Enable verbose output'
+    )
+    
+    parser.add_argument(
+        '-e', '--external',
+        action='store_true',
+        help='Follow external links (outside domain)'
+    )
+    
+    parser.add_argument(
+        '-t', '--timeout',
+        type=int,
+        help=f'Request timeout in seconds (default: {CONFIG["timeout"]})'
+    )
+    
+    parser.add_argument(
+        '-w', '--workers',
+        type=int,
+        help=f'Concurrent fetch/parse workers (default: {CONFIG["workers"]})'
+    )
+    
+    parser.add_argument(
+        '--parser',
+        choices=('soup', 'fast', 'lxml'),
+        help=f'Link extractor: soup (full tree), fast (streaming html.parser) or lxml (default: {CONFIG["link_parser"]})'
+    )
+    
+    parser.add_argument(
+        '--parse-procs',
+        type=int,
+        metavar='N',
+        help='Extract links in N worker processes (default: in the fetch threads)'
+    )
+    
+    parser.add_argument(
+        '--bloom',
+        type=int,
+        metavar='N',
+        help='Deduplicate with a Bloom filter sized for N URLs instead of the exact url->id index (URL strings are still kept; may skip a few URLs)'
+    )
+    
+    parser.add_argument(
+        '--graph',
+        action='store_true',
+        help='Record every link as an edge and report in/out-degrees'
+    )
+    
+    parser.add_argument(
+        '--pagerank',
+        action='store_true',
+        help='Rank pages by PageRank over the link graph (implies --graph; faster with numpy)'
+    )
+    
+    parser.add_argument(
+        '--export-graph',
+        metavar='FILE',
+        help='Export the link graph: FILE.npz for CSR arrays (numpy), else a TSV edge list plus a .nodes.tsv table'
+    )
+    
+    parser.add_argument(
+        '--robots',
+        action='store_true',
+        help='Obey robots.txt (rules and Crawl-delay), fetched once per host'
+    )
+    
+    parser.add_argument(
+        '--sitemaps',
+        action='store_true',
+        help='Seed the crawl with the URLs of the site\'s sitemaps (implies --robots)'
+    )
+    
+    parser.add_argument(
+        '--traps',
+        action='store_true',
+        help='Detect crawler traps (per-pattern caps, repeated segments, long paths) and near-duplicate pages'
+    )
+    
+    parser.add_argument(
+        '--trap-cap',
+        type=int,
+        metavar='N',
+        help='URLs admitted per path template such as /page/# (default: 100, implies --traps)'
+    )
+    
+    parser.add_argument(
+        '--trap-report',
+        metavar='FILE',
+        help='Write what trap detection pruned to FILE as JSON (implies --traps)'
+    )
+    
+    parser.add_argument(
+        '--order',
+        choices=('bfs', 'priority'),
+        help='Frontier order: bfs (default) or priority (scored, see --score)'
+    )
+    
+    parser.add_argument(
+        '--score',
+        metavar='SPEC',
+        help='Priority feature weights, e.g. depth=1,novelty=2,inlinks=0.5 (implies --order priority)'
+    )
+    
+    parser.add_argument(
+        '--dir-cap',
+        type=int,
+        metavar='N',
+        help='Crawl other directories before a directory\'s (N+1)th page (implies --order priority)'
+    )
+    
+    parser.add_argument(
+        '--state-dir',
+        metavar='DIR',
+        help='Checkpoint crawl progress to DIR (SQLite) so it can be resumed'
+    )
+    
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='Continue the crawl saved in --state-dir without refetching finished pages'
+    )
     
-    # Get max pages
-    pages_input = input(f"{CONFIG['colors']['info']}Max pages to crawl [{CONFIG['max_pages']}]: {CONFIG['colors']['reset']}").strip()
-    if pages_input.isdigit():
-        pages = int(pages_input)
-        if 10 <= pages <= 1000:
-            CONFIG['max_pages'] = pages
-        else:
-            print(f"{CONFIG['colors']['warning']}[!] Pages must be between 10-1000, using default{CONFIG['colors']['reset']}")
+    parser.add_argument(
+        '--cache-dir',
+        metavar='DIR',
+        help='Keep an ETag/Last-Modified cache in DIR and revalidate pages on recrawls'
+    )
     
-    # Get verbose mode
-    verbose_input = input(f"{CONFIG['colors']['info']}Verbose mode? [y/N]: {CONFIG['colors']['reset']}").strip().lower()
-    CONFIG['verbose'] = verbose_input in ('y', 'yes')
+    parser.add_argument(
+        '--cache-max-mb',
+        type=float,
+        metavar='MB',
+        help=f'Size limit for the HTTP cache (default: {CONFIG["cache_max_mb"]})'
+    )
     
-    # Get external links
-    external_input = input(f"{CONFIG['colors']['info']}Follow external links? [y/N]: {CONFIG['colors']['reset']}").strip().lower()
-    CONFIG['follow_external'] = external_input in ('y', 'yes')
+    parser.add_argument(
+        '--pool-per-host',
+        type=int,
+        metavar='N',
+        help='Pooled connections per host (default: max(workers, 10))'
+    )
     
-    print()
-    return url
-
-# ============================================================================
-# 8. CLI PARSER
-# ============================================================================
-
-def parse_cli():
-    """Parse command line arguments"""
-    parser = argparse.ArgumentParser(
-        description='RoverCrawler v2.1 - Web crawler for site structure mapping',
-        formatter_class=argparse.RawDescriptionHelpFormatter,
-        epilog="""
-Examples:
-  python rovercrawler.py https://example.com
-  python rovercrawler.py https://example.com -d 4 -v --external
-  python rovercrawler.py --export-json results.json
-
-Note: External libraries required:
-  pip install requests beautifulsoup4 colorama
-"""
+    parser.add_argument(
+        '--pool-total',
+        type=int,
+        metavar='N',
+        help=f'Pooled connections across all hosts (default: {CONFIG["pool_total"]})'
     )
     
     parser.add_argument(
-        'url',
-        nargs='?',
-        help='Target URL to crawl (e.g., https://example.com)'
+        '--no-keep-alive',
+        action='store_true',
+        help='Open a new connection for every request'
     )
     
     parser.add_argument(
-        '-d', '--depth',
+        '--http2',
+        action='store_true',
+        help="Use a multiplexed HTTP/2 client (requires httpx[http2])"
+    )
+    
+    parser.add_argument(
+        '--retries',
         type=int,
-        help=f'Maximum crawl depth (default: {CONFIG["max_depth"]})'
+        metavar='N',
+        help=f'Re-queue failed or 429/5xx pages up to N times (default: {CONFIG["retries"]})'
     )
     
     parser.add_argument(
-        '-p', '--pages',
+        '--max-body-bytes',
         type=int,
-        help=f'Maximum pages to crawl (default: {CONFIG["max_pages"]})'
+        metavar='N',
+        help=f'Stop reading a page after N bytes, 0 = no cap (default: {CONFIG["max_body_bytes"]})'
     )
     
     parser.add_argument(
-        '-v', '--verbose',
+        '--prefilter',
         action='store_true',
-        help='Enable verbose output'
+        help='Learn which URL patterns are not HTML and stop fetching them'
     )
     
     parser.add_argument(
-        '-e', '--external',
+        '--head-probe',
         action='store_true',
-        help='Follow external links (outside domain)'
+        help='HEAD-check unfamiliar file extensions before a GET (implies --prefilter)'
     )
     
     parser.add_argument(
-        '-t', '--timeout',
+        '--shared-dir',
+        metavar='DIR',
+        help='Coordinate a distributed crawl through DIR (workers join with --worker DIR)'
+    )
+    
+    parser.add_argument(
+        '--spawn-workers',
         type=int,
-        help=f'Request timeout in seconds (default: {CONFIG["timeout"]})'
+        metavar='N',
+        help='Start N local worker processes for --shared-dir'
+    )
+    
+    parser.add_argument(
+        '--worker',
+        metavar='DIR',
+        help='Run as a distributed worker for the coordinator using DIR'
+    )
+    
+    parser.add_argument(
+        '--incremental',
+        metavar='DIR',
+        help='Recrawl against the site snapshot in DIR, revisiting only changed pages'
+    )
+    
+    parser.add_argument(
+        '--diff-json',
+        metavar='FILE',
+        help='Write the URLs and links added/removed by --incremental to FILE'
+    )
+    
+    parser.add_argument(
+        '--seeds',
+        metavar='FILE',
+        help='Batch mode: crawl every URL in FILE (one per line, optionally with depth=N pages=N) in one process'
+    )
+    
+    parser.add_argument(
+        '--batch-dir',
+        metavar='DIR',
+        default='rover-batch',
+        help='Where --seeds writes one JSON tree per site and batch.jsonl (default: rover-batch)'
+    )
+    
+    parser.add_argument(
+        '--batch-sites',
+        type=int,
+        metavar='N',
+        help='Sites crawled at once with --seeds; -w caps fetches across all of them (default: 2 x workers)'
+    )
+    
+    parser.add_argument(
+        '--async',
+        dest='use_async',
+        action='store_true',
+        help='Use the asyncio/aiohttp backend (-w sets requests in flight)'
+    )
+    
+    parser.add_argument(
+        '--benchmark',
+        choices=BENCHMARKS,
+        help='Run a local benchmark instead of crawling'
+    )
+    
+    parser.add_argument(
+        '--bench-site',
+        metavar='SPEC',
+        help='Synthetic site for --benchmark crawl, e.g. fanout=8,depth=3,page_size=20000,'
+             'duplication=0.5,latency=0.01,error_rate=0.05'
+    )
+    
+    parser.add_argument(
+        '--bench-json',
+        metavar='FILE',
+        help='Write machine-readable benchmark results to FILE'
+    )
+    
+    parser.add_argument(
+        '--profile',
+        metavar='FILE',
+        help='Profile the crawl (cProfile + tracemalloc) and write the report to FILE'
+    )
+    
+    parser.add_argument(
+        '--stats-json',
+        metavar='FILE',
+        help='Export crawl statistics and per-phase timings as JSON'
+    )
+    
+    parser.add_argument(
+        '--metrics-port',
+        type=int,
+        metavar='PORT',
+        help='Serve live metrics on 127.0.0.1:PORT (/metrics for Prometheus, /status as JSON)'
+    )
+    
+    parser.add_argument(
+        '--status-file',
+        metavar='FILE',
+        help='Keep a JSON status file updated while crawling'
+    )
+    
+    parser.add_argument(
+        '--status-interval',
+        type=float,
+        metavar='SEC',
+        help='Seconds between status updates (default: 5)'
     )
     
     parser.add_argument(
@@ -493,6 +5306,18 @@ Note: External libraries required:
         help='Export results as plain text'
     )
     
+    parser.add_argument(
+        '--export-ndjson',
+        metavar='FILE',
+        help='Stream one JSON record per page to FILE while crawling'
+    )
+    
+    parser.add_argument(
+        '--rebuild-tree',
+        metavar='FILE',
+        help='Rebuild the tree from an NDJSON stream instead of crawling'
+    )
+    
     parser.add_argument(
         '--no-banner',
         action='store_true',
@@ -508,14 +5333,105 @@ Note: External libraries required:
     return parser.parse_args()
 
 # ============================================================================
-# 9. EXPORT FUNCTIONS
+# 20. EXPORT FUNCTIONS
 # ============================================================================
 
+class PageStreamWriter:
+    """
+    NDJSON (JSON Lines) stream with one record per finished page.
+    
+    Records are written while the crawl runs, in batches, so a crash loses
+    at most one batch; tree_from_ndjson() rebuilds the tree from the file.
+    """
+    
+    def __init__(self, filename, batch_size=None, append=False):
+        self.file = open(filename, 'a' if append else 'w', encoding='utf-8')
+        self.batch_size = max(1, batch_size or CONFIG['ndjson_batch'])
+        self.buffer = []
+    
+    def write(self, record):
+        self.buffer.append(json.dumps(record, separators=(',', ':')))
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+    
+    def flush(self):
+        if self.buffer:
+            self.file.write('\n'.join(self.buffer) + '\n')
+            self.buffer = []
+        self.file.flush()
+    
+    def close(self):
+        self.flush()
+        self.file.close()
+
+def read_ndjson(filename):
+    """Yield the page records of an NDJSON stream, skipping a torn last line"""
+    with open(filename, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+def tree_from_ndjson(filename):
+    """Rebuild the crawl tree from an NDJSON page stream"""
+    records = {}
+    for record in read_ndjson(filename):
+        # A resumed crawl may repeat pages that were in flight; keep the last
+        records[record['url']] = record
+    if not records:
+        return {}
+    
+    children_map = {}
+    root = None
+    for record in sorted(records.values(), key=lambda r: r['id']):
+        if record['parent'] is None:
+            root = root or record['url']
+        else:
+            children_map.setdefault(record['parent'], []).append(record['url'])
+    if root is None:
+        return {}
+    
+    return build_nested_tree(root, children_map)
+
+def write_tree_json(tree, out, indent=2):
+    """
+    Write a nested tree as JSON, byte-for-byte like json.dump(tree, out,
+    indent=indent), but without recursion so very deep trees still export
+    """
+    write = out.write
+    if not tree:
+        write("{}")
+        return
+    write("{")
+    # Each frame is an iterator over one dict level
+    stack = [iter(tree.items())]
+    first = True
+    while stack:
+        pad = "\n" + " " * (indent * len(stack))
+        for url, children in stack[-1]:
+            write(("" if first else ",") + pad + json.dumps(url) + ": ")
+            if children:
+                write("{")
+                stack.append(iter(children.items()))
+                first = True
+            else:
+                write("{}")
+                first = False
+            break
+        else:
+            stack.pop()
+            write("\n" + " " * (indent * len(stack)) + "}")
+            first = False
+
 def export_json(tree, filename):
     """Export tree structure to JSON file"""
     try:
         with open(filename, 'w') as f:
-            json.dump(tree, f, indent=2)
+            write_tree_json(tree, f)
         print(f"{CONFIG['colors']['info']}[✓] Results exported to {filename}{CONFIG['colors']['reset']}")
     except Exception as e:
         print(f"{CONFIG['colors']['error']}[!] Failed to export JSON: {e}{CONFIG['colors']['reset']}")
@@ -523,57 +5439,276 @@ def export_json(tree, filename):
 def export_txt(tree, filename):
     """Export tree structure to plain text file"""
     try:
-        original_colors = CONFIG['colors'].copy()
-        
-        # Temporarily disable colors for export
-        for key in CONFIG['colors']:
-            CONFIG['colors'][key] = ""
+        # Colors are disabled for export
+        plain = {key: "" for key in CONFIG['colors']}
         
         with open(filename, 'w') as f:
-            # Redirect print to file
-            import io
-            from contextlib import redirect_stdout
-            
-            output = io.StringIO()
-            with redirect_stdout(output):
-                print("=" * 60)
-                print("ROVERCRAWLER EXPORT")
-                print(f"Generated: {time.strftime('%Y-%m-%d %H:%M:%S')}")
-                print("=" * 60)
-                print()
-                root_url = list(tree.keys())[0]
-                print(f"Root URL: {root_url}")
-                print(f"Crawl depth: {CONFIG['max_depth']}")
-                print(f"Pages crawled: {len(get_all_urls(tree))}")
-                print()
-                print("SITE STRUCTURE:")
-                print()
-                print_tree(tree)
-            
-            f.write(output.getvalue())
-        
-        # Restore colors
-        CONFIG['colors'] = original_colors
+            f.write("=" * 60 + "\n")
+            f.write("ROVERCRAWLER EXPORT\n")
+            f.write(f"Generated: {time.strftime('%Y-%m-%d %H:%M:%S')}\n")
+            f.write("=" * 60 + "\n\n")
+            root_url = list(tree.keys())[0]
+            f.write(f"Root URL: {root_url}\n")
+            f.write(f"Crawl depth: {CONFIG['max_depth']}\n")
+            f.write(f"Pages crawled: {count_urls(tree)}\n\n")
+            f.write("SITE STRUCTURE:\n\n")
+            render_tree(tree, f, plain)
         
         print(f"{CONFIG['colors']['info']}[✓] Results exported to {filename}{CONFIG['colors']['reset']}")
     except Exception as e:
         print(f"{CONFIG['colors']['error']}[!] Failed to export text: {e}{CONFIG['colors']['reset']}")
 
+def export_diff(diff, filename):
+    """Export the changes found by an incremental recrawl to JSON"""
+    try:
+        with open(filename, 'w') as f:
+            json.dump(diff, f, indent=2)
+        print(f"{CONFIG['colors']['info']}[✓] Diff exported to {filename}{CONFIG['colors']['reset']}")
+    except Exception as e:
+        print(f"{CONFIG['colors']['error']}[!] Failed to export diff: {e}{CONFIG['colors']['reset']}")
+
+def analyze_graph(graph, nodes):
+    """In/out-degree, and PageRank when enabled, of every URL id"""
+    in_degree, out_degree = graph.degrees(nodes)
+    pagerank = graph.pagerank(nodes) if CONFIG['pagerank'] else None
+    return {'in_degree': in_degree, 'out_degree': out_degree, 'pagerank': pagerank}
+
+def export_graph(store, graph, metrics, filename):
+    """
+    Export the link graph. A '.npz' file holds CSR arrays (indptr,
+    indices), per-node metrics and the URLs as one UTF-8 blob with
+    offsets. Any other name gets a tab-separated edge list in CSR order,
+    with the node table written next to it as <name>.nodes.tsv
+    """
+    nodes = len(store)
+    try:
+        indptr, indices = graph.csr(nodes)
+        if filename.endswith('.npz'):
+            encoded = [url.encode('utf-8', 'surrogatepass') for url in store.urls]
+            url_offsets = np.zeros(nodes + 1, dtype=np.int64)
+            np.cumsum([len(url) for url in encoded], out=url_offsets[1:])
+            arrays = {
+                'indptr': indptr, 'indices': indices,
+                'in_degree': metrics['in_degree'], 'out_degree': metrics['out_degree'],
+                'visited': np.frombuffer(bytes(store.visited), dtype=np.uint8),
+                'url_data': np.frombuffer(b''.join(encoded), dtype=np.uint8),
+                'url_offsets': url_offsets,
+            }
+            if metrics['pagerank'] is not None:
+                arrays['pagerank'] = np.asarray(metrics['pagerank'])
+            np.savez_compressed(filename, **arrays)
+            print(f"{CONFIG['colors']['info']}[✓] Link graph exported to {filename}{CONFIG['colors']['reset']}")
+            return
+        
+        if NUMPY_AVAILABLE:
+            indptr, indices = indptr.tolist(), indices.tolist()
+        with open(filename, 'w') as f:
+            f.write("source\ttarget\n")
+            for source in range(nodes):
+                f.writelines(f"{source}\t{target}\n" for target in indices[indptr[source]:indptr[source + 1]])
+        
+        nodes_file = os.path.splitext(filename)[0] + '.nodes.tsv'
+        pagerank = metrics['pagerank']
+        with open(nodes_file, 'w', encoding='utf-8') as f:
+            f.write("id\turl\tvisited\tin_degree\tout_degree" + ("\tpagerank" if pagerank is not None else "") + "\n")
+            for node, url in enumerate(store.urls):
+                f.write(f"{node}\t{url}\t{store.visited[node]}\t{metrics['in_degree'][node]}\t{metrics['out_degree'][node]}"
+                        + (f"\t{pagerank[node]:.6g}" if pagerank is not None else "") + "\n")
+        print(f"{CONFIG['colors']['info']}[✓] Link graph exported to {filename} and {nodes_file}{CONFIG['colors']['reset']}")
+    except Exception as e:
+        print(f"{CONFIG['colors']['error']}[!] Failed to export link graph: {e}{CONFIG['colors']['reset']}")
+
+def export_trap_report(traps, filename):
+    """Export the URLs and pages pruned by trap detection to JSON"""
+    try:
+        with open(filename, 'w') as f:
+            json.dump(traps.report(), f, indent=2)
+        print(f"{CONFIG['colors']['info']}[✓] Trap report exported to {filename}{CONFIG['colors']['reset']}")
+    except Exception as e:
+        print(f"{CONFIG['colors']['error']}[!] Failed to export trap report: {e}{CONFIG['colors']['reset']}")
+
+def export_stats(crawler, filename):
+    """Export crawl counters and phase timing histograms to JSON"""
+    try:
+        with open(filename, 'w') as f:
+            json.dump(crawler.stats_report(), f, indent=2)
+        print(f"{CONFIG['colors']['info']}[✓] Stats exported to {filename}{CONFIG['colors']['reset']}")
+    except Exception as e:
+        print(f"{CONFIG['colors']['error']}[!] Failed to export stats: {e}{CONFIG['colors']['reset']}")
+
 def get_all_urls(tree):
     """Extract all URLs from tree structure"""
-    urls = []
-    for url, children in tree.items():
-        urls.append(url)
-        urls.extend(get_all_urls(children))
-    return urls
+    return [url for url, _, _ in iter_tree(tree)]
+
+def count_urls(tree):
+    """Count the URLs in a tree structure without building a list"""
+    return sum(1 for _ in iter_tree(tree))
 
 # ============================================================================
-# 10. MAIN ENTRY POINT
+# 21. MAIN ENTRY POINT
 # ============================================================================
 
+def show_tree(tree):
+    """Print the site structure section"""
+    if tree:
+        root_url = list(tree.keys())[0]
+        print(f"\n{CONFIG['colors']['root']}SITE STRUCTURE:{CONFIG['colors']['reset']}")
+        print(f"{CONFIG['colors']['dim']}Root: {root_url}{CONFIG['colors']['reset']}")
+        print()
+        print_tree(tree)
+    else:
+        print(f"{CONFIG['colors']['warning']}[!] No pages were crawled. Check URL and network connection.{CONFIG['colors']['reset']}")
+
+def show_link_graph(store, metrics, top=10):
+    """Print the best-linked pages (by PageRank when computed, else in-degree)"""
+    ranking = metrics['pagerank'] if metrics['pagerank'] is not None else metrics['in_degree']
+    label = 'PageRank' if metrics['pagerank'] is not None else 'in-links'
+    best = heapq.nlargest(top, range(len(store)), key=ranking.__getitem__)
+    print(f"\n{CONFIG['colors']['root']}TOP PAGES BY {label.upper()}:{CONFIG['colors']['reset']}")
+    for node in best:
+        value = f"{ranking[node]:.4f}" if metrics['pagerank'] is not None else str(ranking[node])
+        print(f"  {CONFIG['colors']['dim']}{value:>8}  in {metrics['in_degree'][node]:<5} out {metrics['out_degree'][node]:<5}"
+              f"{CONFIG['colors']['reset']}{CONFIG['colors']['link']}{store.urls[node]}{CONFIG['colors']['reset']}")
+
+def show_diff(diff, limit=20):
+    """Print the URLs and links added/removed since the previous crawl"""
+    print(f"\n{CONFIG['colors']['root']}CHANGES SINCE LAST CRAWL:{CONFIG['colors']['reset']}")
+    print(f"{CONFIG['colors']['dim']}  URLs:  +{len(diff['added_urls'])} -{len(diff['removed_urls'])}   "
+          f"Links: +{len(diff['added_edges'])} -{len(diff['removed_edges'])}{CONFIG['colors']['reset']}")
+    for sign, color, urls in (('+', 'link', diff['added_urls']), ('-', 'error', diff['removed_urls'])):
+        shown = urls if CONFIG['verbose'] else urls[:limit]
+        for url in shown:
+            print(f"  {CONFIG['colors'][color]}{sign} {url}{CONFIG['colors']['reset']}")
+        if len(urls) > len(shown):
+            print(f"  {CONFIG['colors']['dim']}... {len(urls) - len(shown)} more (-v to list all){CONFIG['colors']['reset']}")
+
+def apply_cli_args(args):
+    """Update config from CLI arguments"""
+    if args.depth:
+        CONFIG['max_depth'] = args.depth
+    if args.pages:
+        CONFIG['max_pages'] = args.pages
+    if args.verbose:
+        CONFIG['verbose'] = True
+    if args.external:
+        CONFIG['follow_external'] = True
+    if args.timeout:
+        CONFIG['timeout'] = args.timeout
+    if args.workers:
+        CONFIG['workers'] = args.workers
+    if args.parser:
+        CONFIG['link_parser'] = args.parser
+    if args.parse_procs is not None:
+        CONFIG['parse_processes'] = max(0, args.parse_procs)
+    if args.bloom:
+        CONFIG['bloom_capacity'] = args.bloom
+    if args.metrics_port:
+        CONFIG['metrics_port'] = args.metrics_port
+    if args.status_file:
+        CONFIG['status_file'] = args.status_file
+    if args.status_interval:
+        CONFIG['status_interval'] = max(0.1, args.status_interval)
+    if args.graph or args.pagerank or args.export_graph:
+        if args.export_graph and args.export_graph.endswith('.npz') and not NUMPY_AVAILABLE:
+            print(f"{CONFIG['colors']['error']}[!] .npz graph export requires numpy: pip install numpy{CONFIG['colors']['reset']}")
+            sys.exit(1)
+        CONFIG['link_graph'] = True
+        CONFIG['pagerank'] = args.pagerank
+    if args.robots:
+        CONFIG['robots'] = True
+    if args.sitemaps:
+        CONFIG['sitemaps'] = True
+        CONFIG['robots'] = True
+    if args.traps or args.trap_report:
+        CONFIG['trap_detect'] = True
+    if args.trap_cap is not None:
+        CONFIG['trap_pattern_cap'] = max(0, args.trap_cap)
+        CONFIG['trap_detect'] = True
+    if args.order:
+        CONFIG['crawl_order'] = args.order
+    if args.score:
+        try:
+            CONFIG['score_weights'] = parse_score_weights(args.score)
+        except ValueError as e:
+            print(f"{CONFIG['colors']['error']}[!] Invalid --score: {e}{CONFIG['colors']['reset']}")
+            sys.exit(1)
+        CONFIG['crawl_order'] = 'priority'
+    if args.dir_cap:
+        CONFIG['dir_cap'] = max(0, args.dir_cap)
+        CONFIG['crawl_order'] = 'priority'
+    if args.state_dir:
+        CONFIG['state_dir'] = args.state_dir
+    if args.export_ndjson:
+        CONFIG['ndjson_path'] = args.export_ndjson
+    if args.cache_dir:
+        CONFIG['cache_dir'] = args.cache_dir
+    if args.cache_max_mb:
+        CONFIG['cache_max_mb'] = args.cache_max_mb
+    if args.pool_per_host:
+        CONFIG['pool_per_host'] = args.pool_per_host
+    if args.pool_total:
+        CONFIG['pool_total'] = args.pool_total
+    if args.no_keep_alive:
+        CONFIG['keep_alive'] = False
+    if args.prefilter:
+        CONFIG['prefilter'] = True
+    if args.head_probe:
+        CONFIG['head_probe'] = True
+    if args.max_body_bytes is not None:
+        CONFIG['max_body_bytes'] = max(0, args.max_body_bytes)
+    if args.retries is not None:
+        CONFIG['retries'] = max(0, args.retries)
+    if args.http2:
+        CONFIG['http2'] = True
+    if args.shared_dir:
+        CONFIG['shared_dir'] = args.shared_dir
+    if args.spawn_workers:
+        CONFIG['local_workers'] = args.spawn_workers
+    if args.incremental:
+        # The snapshot replaces the checkpoint, cache and page stream
+        if args.use_async:
+            print(f"{CONFIG['colors']['error']}[!] --async is not supported with --incremental{CONFIG['colors']['reset']}")
+            sys.exit(1)
+        CONFIG['incremental_dir'] = args.incremental
+    elif args.diff_json:
+        print(f"{CONFIG['colors']['error']}[!] --diff-json requires --incremental{CONFIG['colors']['reset']}")
+        sys.exit(1)
+    if args.seeds:
+        # Sites share the fetch pool, so per-site stores, streams and exports are out
+        for flag, value in (('a URL argument', args.url), ('--shared-dir', args.shared_dir),
+                            ('--worker', args.worker), ('--incremental', args.incremental),
+                            ('--state-dir', args.state_dir), ('--cache-dir', args.cache_dir),
+                            ('--export-ndjson', args.export_ndjson), ('--async', args.use_async),
+                            ('--graph', CONFIG['link_graph']), ('--export-json', args.export_json),
+                            ('--export-txt', args.export_txt), ('--trap-report', args.trap_report),
+                            ('--metrics-port', args.metrics_port), ('--status-file', args.status_file)):
+            if value:
+                print(f"{CONFIG['colors']['error']}[!] {flag} is not supported with --seeds{CONFIG['colors']['reset']}")
+                sys.exit(1)
+    if args.batch_sites:
+        CONFIG['batch_sites'] = max(0, args.batch_sites)
+    if args.resume:
+        CONFIG['resume'] = True
+    
+    # Conflicts between settings are checked where library crawls check them
+    try:
+        check_config(CONFIG)
+    except ValueError as e:
+        print(f"{CONFIG['colors']['error']}[!] {e}{CONFIG['colors']['reset']}")
+        sys.exit(1)
+
+def stop_on_sigterm():
+    """Make SIGTERM stop a crawl the way Ctrl+C does, checkpoint included"""
+    def interrupt(signum, frame):
+        raise KeyboardInterrupt
+    signal.signal(signal.SIGTERM, interrupt)
+
 def main():
     """Main entry point"""
+    # Initialize colorama for cross-platform colors
+    init(autoreset=True)
     args = parse_cli()
+    stop_on_sigterm()
     
     # Handle color disabling
     if args.no_colors:
@@ -584,6 +5719,56 @@ def main():
     if not args.no_banner:
         print_banner()
     
+    if args.benchmark:
+        apply_cli_args(args)
+        run_benchmark(args.benchmark, args.bench_site, args.bench_json)
+        return
+    
+    # Offline mode: rebuild the tree from a previous page stream
+    if args.rebuild_tree:
+        apply_cli_args(args)
+        tree = tree_from_ndjson(args.rebuild_tree)
+        show_tree(tree)
+        if args.export_json:
+            export_json(tree, args.export_json)
+        if args.export_txt:
+            export_txt(tree, args.export_txt)
+        return
+    
+    # Worker mode: fetch for a coordinator until it finishes
+    if args.worker:
+        apply_cli_args(args)
+        try:
+            run_worker(args.worker)
+        except KeyboardInterrupt:
+            print(f"\n{CONFIG['colors']['warning']}[!] Worker stopped; its leases will be reassigned{CONFIG['colors']['reset']}")
+        return
+    
+    # Batch mode: many sites, one process
+    if args.seeds:
+        apply_cli_args(args)
+        try:
+            seeds = read_seeds(args.seeds)
+        except (OSError, ValueError) as e:
+            print(f"{CONFIG['colors']['error']}[!] Cannot read seeds from {args.seeds}: {e}{CONFIG['colors']['reset']}")
+            sys.exit(1)
+        batch = BatchCrawler(seeds, args.batch_dir)
+        try:
+            if args.profile:
+                run_profiled(batch.run, args.profile)
+            else:
+                batch.run()
+        except KeyboardInterrupt:
+            print(f"\n{CONFIG['colors']['warning']}[!] Batch interrupted; finished sites are in {args.batch_dir}{CONFIG['colors']['reset']}")
+        batch.print_stats()
+        if args.stats_json:
+            export_stats(batch, args.stats_json)
+        return
+    
+    # A resumed crawl can take its URL from the saved state
+    if not args.url and args.resume and (args.state_dir or args.shared_dir):
+        args.url = CrawlState.saved_start_url(args.state_dir or args.shared_dir)
+    
     # Determine mode: if no URL provided, use interactive mode
     if not args.url:
         # No URL provided, run interactive mode
@@ -594,59 +5779,100 @@ def main():
             print(f"{CONFIG['colors']['error']}[!] URL must start with http:// or https://{CONFIG['colors']['reset']}")
             sys.exit(1)
     
-    # Update config from CLI arguments
-    if args.depth:
-        CONFIG['max_depth'] = args.depth
-    if args.pages:
-        CONFIG['max_pages'] = args.pages
-    if args.verbose:
-        CONFIG['verbose'] = True
-    if args.external:
-        CONFIG['follow_external'] = True
-    if args.timeout:
-        CONFIG['timeout'] = args.timeout
+    apply_cli_args(args)
     
     # Create and run crawler
-    crawler = RoverCrawler()
+    if args.use_async:
+        if not AIOHTTP_AVAILABLE:
+            print(f"{CONFIG['colors']['error']}[!] --async requires aiohttp: pip install aiohttp{CONFIG['colors']['reset']}")
+            sys.exit(1)
+        if CONFIG['parse_processes']:
+            print(f"{CONFIG['colors']['error']}[!] --parse-procs is only supported by the threaded backend{CONFIG['colors']['reset']}")
+            sys.exit(1)
+        if CONFIG['http2']:
+            print(f"{CONFIG['colors']['error']}[!] --http2 is only supported by the threaded backend{CONFIG['colors']['reset']}")
+            sys.exit(1)
+        crawler = AsyncRoverCrawler()
+    elif CONFIG['shared_dir']:
+        crawler = DistributedRoverCrawler()
+    elif CONFIG['incremental_dir']:
+        crawler = IncrementalRoverCrawler()
+    else:
+        crawler = RoverCrawler()
+    
+    reporter = None
+    if CONFIG['metrics_port'] or CONFIG['status_file']:
+        try:
+            reporter = MetricsReporter(crawler).start()
+        except OSError as e:
+            print(f"{CONFIG['colors']['error']}[!] Cannot serve metrics on port {CONFIG['metrics_port']}: {e}{CONFIG['colors']['reset']}")
+            sys.exit(1)
     
     try:
         # Perform crawl
-        tree = crawler.crawl(url)
+        if args.profile:
+            tree = run_profiled(lambda: crawler.crawl(url), args.profile)
+        else:
+            tree = crawler.crawl(url)
         
         # Print results
-        if tree:
-            root_url = list(tree.keys())[0]
-            print(f"\n{CONFIG['colors']['root']}SITE STRUCTURE:{CONFIG['colors']['reset']}")
-            print(f"{CONFIG['colors']['dim']}Root: {root_url}{CONFIG['colors']['reset']}")
-            print()
-            print_tree(tree)
-        else:
-            print(f"{CONFIG['colors']['warning']}[!] No pages were crawled. Check URL and network connection.{CONFIG['colors']['reset']}")
+        show_tree(tree)
         
         # Print statistics
         crawler.print_stats()
         
+        if crawler.graph is not None:
+            metrics = analyze_graph(crawler.graph, len(crawler.store))
+            show_link_graph(crawler.store, metrics)
+            if args.export_graph:
+                export_graph(crawler.store, crawler.graph, metrics, args.export_graph)
+        
+        if CONFIG['incremental_dir']:
+            show_diff(crawler.diff)
+            if args.diff_json:
+                export_diff(crawler.diff, args.diff_json)
+        
         # Export if requested
         if args.export_json:
-            export_json(tree, args.export_json)
+            # With a page stream, the tree JSON is derived from the stream
+            if CONFIG['ndjson_path']:
+                export_json(tree_from_ndjson(CONFIG['ndjson_path']), args.export_json)
+            else:
+                export_json(tree, args.export_json)
         
         if args.export_txt:
             export_txt(tree, args.export_txt)
         
+        if args.stats_json:
+            export_stats(crawler, args.stats_json)
+        
+        if args.trap_report and crawler.traps is not None:
+            export_trap_report(crawler.traps, args.trap_report)
+        
         # Show summary
-        all_urls = get_all_urls(tree)
-        print(f"\n{CONFIG['colors']['info']}[✓] Crawl complete! Found {len(all_urls)} unique URLs.{CONFIG['colors']['reset']}")
+        print(f"\n{CONFIG['colors']['info']}[✓] Crawl complete! Found {count_urls(tree)} unique URLs.{CONFIG['colors']['reset']}")
         
     except KeyboardInterrupt:
+        if reporter is not None:
+            reporter.state = 'interrupted'
         print(f"\n{CONFIG['colors']['warning']}[!] Crawl interrupted by user{CONFIG['colors']['reset']}")
         crawler.print_stats()
+        if CONFIG['shared_dir']:
+            print(f"{CONFIG['colors']['info']}[i] Progress saved. Continue with: --shared-dir {CONFIG['shared_dir']} --resume{CONFIG['colors']['reset']}")
+        elif CONFIG['state_dir']:
+            print(f"{CONFIG['colors']['info']}[i] Progress saved. Continue with: --state-dir {CONFIG['state_dir']} --resume{CONFIG['colors']['reset']}")
         sys.exit(0)
     except Exception as e:
+        if reporter is not None:
+            reporter.state = 'failed'
         print(f"\n{CONFIG['colors']['error']}[!] Fatal error: {e}{CONFIG['colors']['reset']}")
         import traceback
         if CONFIG['verbose']:
             traceback.print_exc()
         sys.exit(1)
+    finally:
+        if reporter is not None:
+            reporter.stop()
 
 # ============================================================================
 # ENTRY POINT
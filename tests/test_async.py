@@ -0,0 +1,25 @@
+"""The asyncio backend maps the same tree as the threaded one"""
+
+import pytest
+
+import rovercrawler
+
+QUIET = {'max_pages': 500, 'rate_limit': 0, 'retries': 0, 'workers': 4}
+
+
+@pytest.fixture(scope='module')
+def site():
+    site = rovercrawler.SyntheticSite(fanout=4, depth=3, page_size=3000, latency=0.005)
+    url = site.start()
+    yield url
+    site.stop()
+
+
+@pytest.mark.parametrize('settings', [{}, {'link_parser': 'fast'}, {'max_body_bytes': 400}])
+def test_async_tree_matches_threaded(site, settings):
+    expected = rovercrawler.RoverCrawler(QUIET, **settings).crawl(site)
+    crawler = rovercrawler.AsyncRoverCrawler(QUIET, **settings)
+    assert crawler.crawl(site) == expected
+    if settings.get('max_body_bytes'):
+        # Bodies are cut while streaming, as in the threaded backend
+        assert crawler.stats['bodies_truncated'] == crawler.stats['pages_crawled']
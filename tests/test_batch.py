@@ -0,0 +1,47 @@
+"""A batch crawl writes each site's tree as a lone crawl of it would"""
+
+import io
+import json
+
+import rovercrawler
+
+QUIET = {'max_pages': 200, 'rate_limit': 0, 'retries': 0, 'workers': 2, 'batch_sites': 2}
+
+
+def tree_json(tree):
+    out = io.StringIO()
+    rovercrawler.write_tree_json(tree, out)
+    return json.loads(out.getvalue())
+
+
+def test_batch_sites_match_lone_crawls(tmp_path):
+    sites = [rovercrawler.SyntheticSite(fanout=3, depth=2, page_size=500, latency=0.005) for _ in range(3)]
+    urls = [site.start() for site in sites]
+    try:
+        with rovercrawler.use_config(rovercrawler.CrawlConfig(QUIET)):
+            rovercrawler.BatchCrawler([(url, {}) for url in urls], str(tmp_path)).run()
+        with open(tmp_path / 'batch.jsonl') as f:
+            records = {record['url']: record for record in map(json.loads, f)}
+        assert sorted(records) == sorted(urls)
+        for url in urls:
+            expected = tree_json(rovercrawler.RoverCrawler(QUIET).crawl(url))
+            with open(tmp_path / records[url]['file']) as f:
+                assert json.load(f) == expected
+    finally:
+        for site in sites:
+            site.stop()
+
+
+def test_site_that_fails_to_start_is_reported(tmp_path):
+    site = rovercrawler.SyntheticSite(fanout=2, depth=1, page_size=500, latency=0)
+    url = site.start()
+    try:
+        seeds = [(url, {'link_graph': True, 'bloom_capacity': 1000}), (url, {})]
+        with rovercrawler.use_config(rovercrawler.CrawlConfig(QUIET)):
+            rovercrawler.BatchCrawler(seeds, str(tmp_path)).run()
+        with open(tmp_path / 'batch.jsonl') as f:
+            records = [json.loads(line) for line in f]
+        assert 'exact URL ids' in records[0]['error']
+        assert 'file' in records[1]
+    finally:
+        site.stop()
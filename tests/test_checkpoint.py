@@ -0,0 +1,101 @@
+"""Checkpointed crawls survive being killed and resume to the same tree"""
+
+import os
+import signal
+import sqlite3
+import subprocess
+import sys
+import textwrap
+import time
+
+import pytest
+
+import rovercrawler
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(ROOT, 'rovercrawler.py')
+QUIET = {'max_pages': 500, 'rate_limit': 0, 'retries': 0}
+
+
+@pytest.fixture(scope='module')
+def site():
+    # 85 pages; the crawl covers all of them, so a lost child shows in the tree
+    site = rovercrawler.SyntheticSite(fanout=4, depth=3, page_size=2000, duplication=0, latency=0.01)
+    url = site.start()
+    yield url
+    site.stop()
+
+
+def done_pages(state_dir):
+    path = os.path.join(state_dir, rovercrawler.CrawlState.FILENAME)
+    if not os.path.exists(path):
+        return 0
+    db = sqlite3.connect(path)
+    try:
+        return db.execute("SELECT COUNT(*) FROM urls WHERE done = 1").fetchone()[0]
+    except sqlite3.Error:
+        return 0
+    finally:
+        db.close()
+
+
+def wait_for(condition, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def crawl(url, **options):
+    return rovercrawler.RoverCrawler(rovercrawler.CrawlConfig(QUIET, **options)).crawl(url)
+
+
+def test_sigkill_then_resume_gives_same_tree(site, tmp_path):
+    expected = crawl(site)
+    state_dir = str(tmp_path / 'state')
+    code = textwrap.dedent(f"""
+        import rovercrawler
+        config = rovercrawler.CrawlConfig({QUIET!r}, state_dir={state_dir!r},
+                                          checkpoint_pages=5, rate_limit=0.05)
+        rovercrawler.RoverCrawler(config).crawl({site!r})
+    """)
+    process = subprocess.Popen([sys.executable, '-c', code], cwd=ROOT,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        assert wait_for(lambda: done_pages(state_dir) >= 20)
+    finally:
+        process.kill()
+        process.wait()
+    assert done_pages(state_dir) < 85
+    
+    assert crawl(site, state_dir=state_dir, resume=True) == expected
+
+
+def test_resume_rejects_another_start_url(site, tmp_path):
+    state_dir = str(tmp_path / 'state')
+    crawl(site, state_dir=state_dir, max_pages=5)
+    with pytest.raises(ValueError, match='holds a crawl of'):
+        crawl(site + '/n/1', state_dir=state_dir, resume=True)
+    # The saved crawl is left untouched
+    assert rovercrawler.CrawlState.saved_start_url(state_dir) == site
+    assert done_pages(state_dir) == 5
+
+
+def test_sigterm_writes_a_final_checkpoint(site, tmp_path):
+    state_dir = str(tmp_path / 'state')
+    process = subprocess.Popen([sys.executable, SCRIPT, site, '--state-dir', state_dir,
+                                '--no-banner', '--no-colors', '-p', '60'],
+                               cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    try:
+        # Let a few pages through; the periodic checkpoint has not run yet
+        assert wait_for(lambda: os.path.exists(os.path.join(state_dir, rovercrawler.CrawlState.FILENAME)))
+        time.sleep(1.5)
+        process.send_signal(signal.SIGTERM)
+        output, _ = process.communicate(timeout=30)
+    finally:
+        process.kill()
+    assert process.returncode == 0
+    assert '--resume' in output
+    assert 0 < done_pages(state_dir) < 60
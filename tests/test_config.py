@@ -0,0 +1,51 @@
+"""Conflicting settings are refused the same way by the library and the CLI"""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+import rovercrawler
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CONFLICTS = [
+    ({'bloom_capacity': 1000, 'link_graph': True}, 'exact URL ids'),
+    ({'bloom_capacity': 1000, 'crawl_order': 'priority'}, 'exact URL ids'),
+    ({'link_graph': True, 'resume': True, 'state_dir': 'state'}, 'cannot be resumed'),
+    ({'resume': True}, 'state directory'),
+    ({'incremental_dir': 'snap', 'cache_dir': 'cache'}, 'HTTP cache'),
+    ({'incremental_dir': 'snap', 'sitemaps': True, 'robots': True}, 'sitemap seeding'),
+    ({'incremental_dir': 'snap', 'crawl_order': 'priority'}, 'priority order'),
+]
+
+
+@pytest.mark.parametrize('settings, message', CONFLICTS)
+def test_check_config_rejects(settings, message):
+    with pytest.raises(ValueError, match=message):
+        rovercrawler.check_config(rovercrawler.CrawlConfig(settings))
+
+
+def test_defaults_pass():
+    rovercrawler.check_config(rovercrawler.CrawlConfig())
+
+
+def test_crawler_checks_before_fetching():
+    crawler = rovercrawler.RoverCrawler(bloom_capacity=1000, crawl_order='priority')
+    with pytest.raises(ValueError, match='exact URL ids'):
+        crawler.crawl('http://127.0.0.1:9/')
+
+
+def test_cli_reports_the_same_conflict():
+    result = subprocess.run([sys.executable, os.path.join(ROOT, 'rovercrawler.py'), 'http://127.0.0.1:9/',
+                             '--bloom', '1000', '--order', 'priority', '--no-banner', '--no-colors'],
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 1
+    assert 'exact URL ids' in result.stdout
+
+
+def test_import_does_not_load_requests():
+    code = "import sys, rovercrawler; print('requests' in sys.modules)"
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, timeout=60)
+    assert result.stdout.strip() == 'False'
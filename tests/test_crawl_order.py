@@ -0,0 +1,53 @@
+"""The priority frontier serves new URL shapes, linked pages and open directories first"""
+
+import rovercrawler
+
+HOST = 'example.com'
+
+
+def frontier(paths, **order_options):
+    store = rovercrawler.UrlStore(bloom_capacity=0)
+    root = store.add(f'https://{HOST}/')
+    order = rovercrawler.CrawlOrder(store, **order_options)
+    queue = rovercrawler.HostFrontier(rovercrawler.HostPoliteness(delay=0), order=order)
+    ids = {}
+    for path in paths:
+        ids[path] = store.add(f'https://{HOST}{path}', root, 1)
+        queue.append(ids[path], HOST)
+    return store, order, queue, ids
+
+
+def drain(store, queue):
+    paths = []
+    while queue:
+        paths.append(store.urls[queue.popleft()].split(HOST, 1)[1])
+    return paths
+
+
+def test_unseen_shapes_come_before_repeats():
+    store, _, queue, _ = frontier(['/page/1', '/page/2', '/page/3', '/about', '/blog/post'])
+    assert drain(store, queue) == ['/page/1', '/about', '/blog/post', '/page/2', '/page/3']
+
+
+def test_often_linked_pages_move_up():
+    store, order, queue, ids = frontier(['/a', '/b', '/c'], weights={'inlinks': 1.0})
+    for _ in range(3):
+        order.linked(ids['/c'])
+    queue.update(ids['/c'], HOST)
+    assert drain(store, queue) == ['/c', '/a', '/b']
+
+
+def test_capped_directory_waits():
+    store, _, queue, _ = frontier(['/docs/a', '/docs/b', '/x/c'], dir_cap=1)
+    assert drain(store, queue) == ['/docs/a', '/x/c', '/docs/b']
+
+
+def test_priority_crawl_maps_the_same_tree():
+    site = rovercrawler.SyntheticSite(fanout=3, depth=3, page_size=1000, duplication=0, latency=0)
+    url = site.start()
+    try:
+        settings = {'max_pages': 500, 'rate_limit': 0, 'retries': 0}
+        expected = rovercrawler.RoverCrawler(settings).crawl(url)
+        assert rovercrawler.RoverCrawler(settings, crawl_order='priority').crawl(url) == expected
+    finally:
+        site.stop()
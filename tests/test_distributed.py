@@ -0,0 +1,31 @@
+"""A distributed crawl with several local workers maps the same tree"""
+
+import rovercrawler
+
+QUIET = {'max_pages': 500, 'rate_limit': 0, 'retries': 0}
+
+
+def test_local_workers_give_the_same_tree(tmp_path):
+    site = rovercrawler.SyntheticSite(fanout=4, depth=3, page_size=2000, latency=0.005)
+    url = site.start()
+    try:
+        expected = rovercrawler.RoverCrawler(QUIET).crawl(url)
+        config = rovercrawler.CrawlConfig(QUIET, shared_dir=str(tmp_path / 'shared'), local_workers=3)
+        crawler = rovercrawler.DistributedRoverCrawler(config)
+        assert crawler.crawl(url) == expected
+        # The shared directory is derived per crawl, not written into the config
+        assert config['state_dir'] is None
+    finally:
+        site.stop()
+
+
+def test_failures_keep_their_error_class(tmp_path):
+    shared = rovercrawler.SharedFrontier(str(tmp_path))
+    try:
+        shared.submit([(1, 'http://example.com/a', 'example.com', 0.0)])
+        failed = rovercrawler.PageResult('http://example.com/a')
+        failed.error = 'timeout'
+        shared.report('worker', [(1, failed)])
+        assert shared.collect([1])[1].error == 'timeout'
+    finally:
+        shared.close()
@@ -0,0 +1,25 @@
+"""A recrawl with the HTTP cache revalidates pages and reuses their links"""
+
+import rovercrawler
+
+QUIET = {'max_pages': 500, 'rate_limit': 0, 'retries': 0}
+
+
+def test_revalidated_pages_reuse_cached_links(tmp_path):
+    site = rovercrawler.SyntheticSite(fanout=3, depth=2, page_size=2000, duplication=0, latency=0)
+    url = site.start()
+    try:
+        first = rovercrawler.RoverCrawler(QUIET, cache_dir=str(tmp_path))
+        tree = first.crawl(url)
+        # Every URL was looked up: the pages and the stylesheet they link
+        assert first.stats['cache_misses'] == site.pages + 1
+        
+        second = rovercrawler.RoverCrawler(QUIET, cache_dir=str(tmp_path))
+        assert second.crawl(url) == tree
+    finally:
+        site.stop()
+    # Every page answered 304: nothing was downloaded or parsed again
+    assert second.stats['cache_revalidations'] == site.pages
+    assert second.stats['cache_hits'] == site.pages
+    assert second.stats['bytes_downloaded'] == 0
+    assert second.stats['cache_bytes_saved'] == first.stats['bytes_downloaded']
@@ -0,0 +1,121 @@
+"""Incremental recrawls fetch only what may have changed and diff the site"""
+
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import rovercrawler
+
+
+class MutableSite:
+    """Local site whose links can change between runs; pages carry an ETag"""
+    
+    def __init__(self, links, robots=''):
+        self.links = links          # path -> [paths it links to]
+        self.robots = robots
+        self.fetched = []           # Paths answered with a body (not 304)
+        site = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+            
+            def do_GET(self):
+                if self.path == '/robots.txt':
+                    self.reply(200, 'text/plain', site.robots.encode())
+                    return
+                if self.path not in site.links:
+                    self.reply(404, 'text/plain', b'')
+                    return
+                body = ''.join(f'<a href="{link}">{link}</a>' for link in site.links[self.path]).encode()
+                etag = '"%s"' % hashlib.md5(body).hexdigest()
+                if self.headers.get('If-None-Match') == etag:
+                    self.reply(304, 'text/html', b'', etag)
+                    return
+                site.fetched.append(self.path)
+                self.reply(200, 'text/html', body, etag)
+            
+            def reply(self, status, content_type, body, etag=None):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                if etag:
+                    self.send_header('ETag', etag)
+                self.end_headers()
+                self.wfile.write(body)
+        
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+    
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def site():
+    site = MutableSite({'/': ['/a', '/b'], '/a': ['/a1'], '/b': ['/b1'], '/a1': [], '/b1': []})
+    yield site
+    site.stop()
+
+
+def recrawl(site, snapshot_dir, **settings):
+    crawler = rovercrawler.IncrementalRoverCrawler(incremental_dir=str(snapshot_dir), rate_limit=0, **settings)
+    site.fetched.clear()
+    crawler.crawl(site.url + '/')
+    return crawler
+
+
+def test_recrawl_follows_the_churn(site, tmp_path):
+    url = site.url
+    first = recrawl(site, tmp_path)
+    assert sorted(site.fetched) == ['/', '/a', '/a1', '/b', '/b1']
+    assert first.diff['added_urls'] == [url + path for path in ('/', '/a', '/a1', '/b', '/b1')]
+    
+    # Nothing changed: only the root is checked, and it answers 304
+    second = recrawl(site, tmp_path)
+    assert site.fetched == []
+    assert second.stats['pages_checked'] == 1
+    assert second.diff == {'added_urls': [], 'removed_urls': [], 'added_edges': [], 'removed_edges': []}
+    
+    # The root drops /b (and so /b1) and links a new page
+    site.links['/'] = ['/a', '/new']
+    site.links['/new'] = []
+    third = recrawl(site, tmp_path)
+    assert sorted(site.fetched) == ['/', '/new']      # /a is revalidated with a 304
+    assert third.diff == {
+        'added_urls': [url + '/new'],
+        'removed_urls': [url + '/b', url + '/b1'],
+        'added_edges': [[url + '/', url + '/new']],
+        'removed_edges': [[url + '/', url + '/b'], [url + '/b', url + '/b1']],
+    }
+    assert set(third.tree[url + '/']) == {url + '/a', url + '/new'}
+
+
+def test_recrawl_obeys_robots(site, tmp_path):
+    site.robots = "User-agent: *\nDisallow: /b\n"
+    crawler = recrawl(site, tmp_path, robots=True)
+    assert sorted(site.fetched) == ['/', '/a', '/a1']
+    assert site.url + '/b' not in crawler.tree[site.url + '/']
+
+
+def test_early_close_saves_a_consistent_snapshot(site, tmp_path, monkeypatch):
+    recrawl(site, tmp_path)
+    closed = []
+    close = rovercrawler.SiteSnapshot.close
+    monkeypatch.setattr(rovercrawler.SiteSnapshot, 'close', lambda self: closed.append(close(self)))
+    
+    site.links['/'] = ['/a', '/b', '/new']
+    site.links['/new'] = []
+    crawler = rovercrawler.IncrementalRoverCrawler(incremental_dir=str(tmp_path), rate_limit=0)
+    pages = crawler.iter_crawl(site.url + '/')
+    next(pages)                 # The root, whose new link is not checked yet
+    pages.close()
+    assert len(closed) == 1
+    
+    # The unfinished descent is not lost: the next run finds the new page
+    assert site.url + '/new' in recrawl(site, tmp_path).diff['added_urls']
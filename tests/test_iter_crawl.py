@@ -0,0 +1,72 @@
+"""iter_crawl() hands pages over one at a time and can be closed early"""
+
+import functools
+import json
+import time
+
+import pytest
+
+import rovercrawler
+
+WORKERS = 4
+QUIET = {'max_pages': 500, 'rate_limit': 0, 'retries': 0, 'workers': WORKERS}
+BACKENDS = {'threaded': (rovercrawler.RoverCrawler, 'fetch_links'),
+            'async': (rovercrawler.AsyncRoverCrawler, 'fetch_links_async')}
+
+
+@pytest.fixture(scope='module')
+def site():
+    site = rovercrawler.SyntheticSite(fanout=4, depth=3, page_size=1000, latency=0)
+    url = site.start()
+    yield url
+    site.stop()
+
+
+def counting_crawler(backend, **options):
+    """A crawler of the backend and a list growing with every fetch it starts"""
+    crawler_class, method = BACKENDS[backend]
+    crawler = crawler_class(QUIET, **options)
+    fetches = []
+    fetch = getattr(crawler, method)
+    
+    @functools.wraps(fetch)
+    def counted(*args, **kwargs):
+        fetches.append(args)
+        return fetch(*args, **kwargs)
+    
+    setattr(crawler, method, counted)
+    return crawler, fetches
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_slow_consumer_holds_the_crawl_back(site, backend):
+    crawler, fetches = counting_crawler(backend)
+    taken = 0
+    for page in crawler.iter_crawl(site):
+        taken += 1
+        # No more than `workers` fetches run ahead of the caller, however long it takes
+        assert len(fetches) <= taken + WORKERS
+        if taken <= 5:
+            time.sleep(0.05)
+            assert len(fetches) <= taken + WORKERS
+    assert taken == crawler.store.visited_count
+    assert crawler._result_tree() == rovercrawler.RoverCrawler(QUIET).crawl(site)
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_early_close_stops_the_crawl(site, backend, tmp_path):
+    path = tmp_path / 'pages.ndjson'
+    crawler, fetches = counting_crawler(backend, ndjson_path=str(path), ndjson_batch=1000)
+    pages = crawler.iter_crawl(site)
+    taken = [next(pages).url for _ in range(5)]
+    pages.close()
+    started = len(fetches)
+    assert started <= len(taken) + WORKERS
+    time.sleep(0.1)
+    assert len(fetches) == started
+    # The page stream was flushed and closed with the crawl
+    assert crawler.page_stream is None
+    with open(path) as f:
+        streamed = [json.loads(line)['url'] for line in f]
+    assert set(taken) <= set(streamed)
+    assert len(streamed) <= started
@@ -0,0 +1,29 @@
+"""Link-graph mode records every edge, and refuses inexact URL ids"""
+
+import pytest
+
+import rovercrawler
+
+
+@pytest.fixture(scope='module')
+def site():
+    site = rovercrawler.SyntheticSite(fanout=3, depth=2, page_size=500, duplication=0, latency=0)
+    url = site.start()
+    yield url
+    site.stop()
+
+
+def test_graph_has_an_edge_per_link(site):
+    crawler = rovercrawler.RoverCrawler(link_graph=True, rate_limit=0)
+    crawler.crawl(site)
+    index = crawler.store.index
+    # Every page links its children, home and the stylesheet; the root's
+    # link home is a self-loop and is dropped
+    assert len(crawler.graph) == (3 + 1) + 3 * (3 + 2) + 9 * 2
+    assert index[site + '/n/1'] in crawler.graph.targets
+
+
+def test_graph_with_bloom_filter_is_rejected(site):
+    crawler = rovercrawler.RoverCrawler(link_graph=True, bloom_capacity=1000, rate_limit=0)
+    with pytest.raises(ValueError, match='exact URL ids'):
+        crawler.crawl(site)
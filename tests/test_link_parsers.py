@@ -0,0 +1,59 @@
+"""The soup, fast and lxml link parsers must find the same links"""
+
+import glob
+import os
+
+import pytest
+
+import rovercrawler
+
+FIXTURES = sorted(glob.glob(os.path.join(os.path.dirname(__file__), 'fixtures', '*.html')))
+BASE_URL = 'https://example.com/shop/index.html'
+PARSERS = ['soup', 'fast', 'lxml']
+
+
+def read_fixture(path):
+    with open(path, encoding='utf-8') as f:
+        return f.read()
+
+
+def hrefs(kind, html, chunk_size=None):
+    parser = rovercrawler.make_href_parser(kind)
+    step = chunk_size or len(html)
+    for i in range(0, len(html), step):
+        parser.feed(html[i:i + step])
+    return parser.close()
+
+
+@pytest.mark.parametrize('path', FIXTURES, ids=os.path.basename)
+@pytest.mark.parametrize('kind', ['fast', 'lxml'])
+def test_links_match_soup(kind, path):
+    html = read_fixture(path)
+    expected = rovercrawler.extract_links(html, BASE_URL, parser='soup')
+    assert expected
+    assert rovercrawler.extract_links(html, BASE_URL, parser=kind) == expected
+
+
+@pytest.mark.parametrize('path', FIXTURES, ids=os.path.basename)
+@pytest.mark.parametrize('kind', PARSERS)
+def test_chunked_feed_matches_single_feed(kind, path):
+    html = read_fixture(path)
+    assert sorted(hrefs(kind, html, chunk_size=7)) == sorted(hrefs(kind, html))
+
+
+@pytest.mark.parametrize('kind', PARSERS)
+def test_last_duplicate_href_wins(kind):
+    html = read_fixture(os.path.join(os.path.dirname(__file__), 'fixtures', 'duplicates.html'))
+    found = set(hrefs(kind, html))
+    assert {'/second', '/two', '/upper-second', '/multiline-second', '/feed.xml', '/real'} <= found
+    assert not found & {'/first', '/one', '/upper-first', '/multiline-first', '/feed-old.xml'}
+
+
+@pytest.mark.parametrize('kind', PARSERS)
+def test_duplicate_split_across_chunks(kind):
+    html = '<p>text</p><a href="/first" href="/second">x</a>'
+    split = html.index('href="/second"')
+    parser = rovercrawler.make_href_parser(kind)
+    parser.feed(html[:split])
+    parser.feed(html[split:])
+    assert parser.close() == ['/second']
@@ -0,0 +1,64 @@
+"""MetricsReporter serves the crawl's counters in the Prometheus text format"""
+
+import json
+import socket
+import urllib.request
+
+import rovercrawler
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def samples(text):
+    """{'name{labels}': value} for every sample line, checking each family is declared first"""
+    declared, values = set(), {}
+    for line in text.splitlines():
+        if line.startswith('# TYPE '):
+            declared.add(line.split()[2])
+        elif not line.startswith('#'):
+            sample, value = line.rsplit(' ', 1)
+            family = sample.split('{')[0]
+            assert family in declared or family.rsplit('_', 1)[0] in declared, line
+            values[sample] = float(value)
+    return values
+
+
+def test_prometheus_output_matches_the_crawl():
+    site = rovercrawler.SyntheticSite(fanout=4, depth=3, page_size=1000, duplication=0, latency=0, error_rate=0.2)
+    url = site.start()
+    try:
+        crawler = rovercrawler.RoverCrawler(max_pages=500, rate_limit=0, retries=0)
+        crawler.crawl(url)
+        reporter = rovercrawler.MetricsReporter(crawler, port=free_port(), interval=60).start()
+        try:
+            base = f"http://127.0.0.1:{reporter.port}"
+            with urllib.request.urlopen(base + '/metrics') as response:
+                assert response.headers['Content-Type'].startswith('text/plain; version=0.0.4')
+                metrics = samples(response.read().decode('utf-8'))
+            with urllib.request.urlopen(base + '/status') as response:
+                status = json.load(response)
+        finally:
+            reporter.stop()
+    finally:
+        site.stop()
+    
+    host = f"127.0.0.1:{url.rsplit(':', 1)[1].rstrip('/')}"
+    assert metrics['rovercrawler_up'] == 1
+    assert metrics['rovercrawler_pages_crawled_total'] == crawler.stats['pages_crawled']
+    assert metrics['rovercrawler_pages_processed_total'] == crawler.processed
+    assert metrics['rovercrawler_bytes_downloaded_total'] == crawler.stats['bytes_downloaded']
+    assert crawler.error_classes['http_5xx'] > 0
+    assert metrics['rovercrawler_errors_total{class="http_5xx"}'] == crawler.error_classes['http_5xx']
+    assert metrics[f'rovercrawler_fetch_seconds_count{{host="{host}"}}'] == crawler.host_times[host][0]
+    assert status['pages_crawled'] == crawler.stats['pages_crawled']
+    assert status['errors'] == crawler.error_classes
+    # Once stopped the crawl reports itself finished
+    assert samples(reporter.prometheus())['rovercrawler_up'] == 0
+
+
+def test_label_values_are_escaped():
+    assert rovercrawler.prometheus_escape('a"b\\c\nd') == 'a\\"b\\\\c\\nd'
@@ -0,0 +1,30 @@
+"""The NDJSON page stream rebuilds the tree the crawl returned"""
+
+import json
+
+import rovercrawler
+
+QUIET = {'max_pages': 500, 'rate_limit': 0, 'retries': 0, 'workers': 4}
+
+
+def test_stream_round_trips_to_the_tree(tmp_path):
+    path = tmp_path / 'pages.ndjson'
+    site = rovercrawler.SyntheticSite(fanout=4, depth=3, page_size=1000, latency=0)
+    url = site.start()
+    try:
+        crawler = rovercrawler.RoverCrawler(QUIET, ndjson_path=str(path), ndjson_batch=7)
+        tree = crawler.crawl(url)
+    finally:
+        site.stop()
+    with open(path) as f:
+        records = [json.loads(line) for line in f]
+    assert len(records) == crawler.store.visited_count
+    assert rovercrawler.tree_from_ndjson(str(path)) == tree
+
+
+def test_torn_last_line_is_skipped(tmp_path):
+    path = tmp_path / 'pages.ndjson'
+    path.write_text('{"id":0,"url":"http://a/","parent":null}\n'
+                    '{"id":1,"url":"http://a/x","parent":"http://a/"}\n'
+                    '{"id":2,"url":"http://a/y","par')
+    assert rovercrawler.tree_from_ndjson(str(path)) == {'http://a/': {'http://a/x': {}}}
@@ -0,0 +1,87 @@
+"""ContentTypePrefilter predictions and the revisiting of wrong skips"""
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import rovercrawler
+
+
+def make_prefilter():
+    return rovercrawler.ContentTypePrefilter(min_samples=5, explore=0, head_probe=False)
+
+
+def test_extensionless_urls_use_their_path_prefix():
+    prefilter = make_prefilter()
+    for i in range(10):
+        prefilter.learn(f"https://example.com/page/{i}", True)
+        prefilter.learn(f"https://example.com/api/v1/item{i}", False)
+    assert prefilter.skip("https://example.com/api/v1/item99")
+    assert not prefilter.skip("https://example.com/page/99")
+    assert not prefilter.skip("https://example.com/about")
+
+
+def test_prefix_is_consulted_before_extension():
+    prefilter = make_prefilter()
+    for i in range(10):
+        prefilter.learn(f"https://example.com/files/{i}.php", False)
+        prefilter.learn(f"https://example.com/forum/{i}.php", True)
+    assert prefilter.skip("https://example.com/files/99.php")
+    assert not prefilter.skip("https://example.com/forum/99.php")
+
+
+def test_overturned_prediction_releases_skipped_urls():
+    prefilter = make_prefilter()
+    for i in range(5):
+        prefilter.learn(f"https://example.com/docs/{i}", False)
+    skipped = [f"https://example.com/docs/s{i}" for i in range(3)]
+    assert all(prefilter.skip(url) for url in skipped)
+    released = []
+    for i in range(5):
+        released += prefilter.learn(f"https://example.com/docs/html{i}", True)
+    assert released == skipped
+    assert not prefilter.skip("https://example.com/docs/next")
+
+
+def serve(pages):
+    """A host serving {path: (content type, body)}"""
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+        
+        def do_GET(self):
+            content_type, body = pages.get(self.path, ('text/plain', ''))
+            data = body.encode()
+            self.send_response(200 if self.path in pages else 404)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+    
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def test_released_skip_is_fetched_but_recorded_once():
+    # /docs/f* are not HTML, so /docs predicts non-HTML and /docs/p0 is
+    # skipped; the exploration fetch of /docs/p1 overturns that
+    binary = ('application/octet-stream', 'x')
+    pages = {f'/docs/f{i}': binary for i in range(5)}
+    pages['/'] = ('text/html', ''.join(f'<a href="{path}">x</a>' for path in sorted(pages)) +
+                  '<a href="/docs/p0">p0</a><a href="/docs/p1">p1</a>')
+    pages['/docs/p0'] = ('text/html', '<a href="/child">child</a>')
+    pages['/docs/p1'] = ('text/html', 'p1')
+    pages['/child'] = ('text/html', 'child')
+    server, url = serve(pages)
+    try:
+        crawler = rovercrawler.RoverCrawler(prefilter=True, prefilter_min_samples=3, prefilter_explore=2,
+                                            head_probe=False, workers=1, rate_limit=0, max_pages=20)
+        urls = [page.url for page in crawler.iter_crawl(url)]
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert len(urls) == len(set(urls))
+    assert url + '/child' in urls
+    assert crawler.store.visited_count == len(urls)
+    assert crawler.stats['prefilter_revisits'] == 2     # /docs/f3 and /docs/p0
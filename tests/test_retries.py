@@ -0,0 +1,24 @@
+"""Retried requests count as one error, and only once retries run out"""
+
+import socket
+
+import rovercrawler
+
+
+def closed_port_url():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    return f"http://127.0.0.1:{port}/"
+
+
+def test_retries_default_to_off():
+    assert rovercrawler.DEFAULT_CONFIG['retries'] == 0
+
+
+def test_failure_counted_once_after_retries():
+    crawler = rovercrawler.RoverCrawler(retries=2, rate_limit=0, retry_backoff=0.01)
+    crawler.crawl(closed_port_url())
+    assert crawler.stats['retries'] == 2
+    assert crawler.stats['errors'] == 1
+    assert crawler.error_classes == {'connection': 1}
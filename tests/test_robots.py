@@ -0,0 +1,153 @@
+"""robots.txt fetches for one host do not hold up other hosts or the coordinator"""
+
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import rovercrawler
+
+
+def serve(delay, body):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+        
+        def do_GET(self):
+            time.sleep(delay)
+            data = body.encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+    
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+@pytest.fixture
+def hosts():
+    slow, slow_url = serve(1.0, "User-agent: *\nDisallow: /private\n")
+    fast, fast_url = serve(0, "User-agent: *\nDisallow: /admin\n")
+    yield slow_url, fast_url
+    for server in (slow, fast):
+        server.shutdown()
+        server.server_close()
+
+
+def test_slow_host_does_not_block_others(hosts):
+    slow_url, fast_url = hosts
+    robots = rovercrawler.RobotsCache(rovercrawler.HostPoliteness(delay=0))
+    results = {}
+    
+    def check(name, url):
+        results[name] = robots.allows(url)
+    
+    threads = [threading.Thread(target=check, args=('slow', slow_url + '/private/x'))]
+    threads[0].start()
+    time.sleep(0.1)      # The slow host's fetch is under way
+    start = time.time()
+    check('fast', fast_url + '/admin/x')
+    assert time.time() - start < 0.5
+    # A second URL of the slow host waits for the fetch already running
+    threads.append(threading.Thread(target=check, args=('slow_again', slow_url + '/public')))
+    threads[1].start()
+    for thread in threads:
+        thread.join()
+    assert results == {'slow': False, 'fast': False, 'slow_again': True}
+
+
+def test_broken_robots_body_allows_the_host():
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+        
+        def do_GET(self):
+            # Claims gzip but is not, so reading the body fails in urllib3
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain')
+            self.send_header('Content-Encoding', 'gzip')
+            self.send_header('Content-Length', '20')
+            self.end_headers()
+            self.wfile.write(b'User-agent: *\nDisall')
+    
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        robots = rovercrawler.RobotsCache(rovercrawler.HostPoliteness(delay=0))
+        assert robots.allows(f"http://127.0.0.1:{server.server_address[1]}/private")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def serve_pages(pages, robots_delay=0):
+    """A host serving {path: (content type, body)}, with a slow robots.txt"""
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+        
+        def do_GET(self):
+            if self.path == '/robots.txt':
+                time.sleep(robots_delay)
+            content_type, body = pages.get(self.path, ('text/plain', ''))
+            data = body.encode()
+            self.send_response(200 if self.path in pages else 404)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+    
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+@pytest.mark.parametrize('backend', ['threaded', 'async'])
+def test_linked_hosts_robots_fetched_off_the_coordinator(backend, monkeypatch):
+    html = 'text/html'
+    other, other_url = serve_pages({
+        '/robots.txt': ('text/plain', "User-agent: *\nDisallow: /private\n"),
+        '/public': (html, '<p>public</p>'),
+        '/private': (html, '<p>private</p>'),
+    }, robots_delay=0.3)
+    main, main_url = serve_pages({
+        '/': (html, f'<a href="/a">a</a><a href="{other_url}/public">p</a><a href="{other_url}/private">x</a>'),
+        '/a': (html, '<p>a</p>'),
+    })
+    coordinator = threading.current_thread()
+    fetched = {}
+    fetch = rovercrawler.RobotsCache._fetch
+    
+    def spy(self, scheme, host):
+        try:
+            asyncio.get_running_loop()
+            on_loop = True
+        except RuntimeError:
+            on_loop = False
+        fetched[host] = threading.current_thread() is coordinator or on_loop
+        return fetch(self, scheme, host)
+    
+    monkeypatch.setattr(rovercrawler.RobotsCache, '_fetch', spy)
+    crawler_class = rovercrawler.AsyncRoverCrawler if backend == 'async' else rovercrawler.RoverCrawler
+    crawler = crawler_class(robots=True, follow_external=True, rate_limit=0, workers=2, max_depth=2)
+    try:
+        urls = [page.url for page in crawler.iter_crawl(main_url)]
+    finally:
+        for server in (main, other):
+            server.shutdown()
+            server.server_close()
+    other_host = other_url.split('//', 1)[1]
+    assert fetched[other_host] is False
+    if backend == 'async':
+        # The start URL's robots.txt (and sitemaps) are fetched in a thread too
+        assert fetched[main_url.split('//', 1)[1]] is False
+    assert other_url + '/public' in urls
+    assert other_url + '/private' not in urls
@@ -0,0 +1,58 @@
+"""TrapDetector refuses trap-shaped URLs and near-duplicate pages"""
+
+import rovercrawler
+
+from rovercrawler import get_all_urls
+
+
+def detector(**options):
+    settings = dict(pattern_cap=3, max_segments=6, max_path=80, repeat=3, distance=6, min_links=8)
+    settings.update(options)
+    return rovercrawler.TrapDetector(**settings)
+
+
+def test_pattern_cap():
+    traps = detector()
+    admitted = [traps.admit(f"https://example.com/cal/2024/{month}") for month in range(1, 7)]
+    assert admitted == [True, True, True, False, False, False]
+    # Query strings do not make a new template
+    assert not traps.admit("https://example.com/cal/2024/9?view=week")
+    assert traps.admit("https://example.com/about")
+    assert traps.counts()['pattern_cap'] == 4
+
+
+def test_repeated_segments_and_long_paths():
+    traps = detector()
+    assert not traps.admit("https://example.com/a/b/a/b/a")
+    assert not traps.admit("https://example.com/" + "/".join(f"s{i}" for i in range(7)))
+    assert not traps.admit("https://example.com/" + "x" * 100)
+    assert traps.admit("https://example.com/a/b/a")
+    assert traps.counts() == {'pattern_cap': 0, 'repeated_segments': 1, 'long_path': 2}
+
+
+def test_near_duplicate_link_sets():
+    traps = detector()
+    links = [f"https://example.com/item/{i}" for i in range(40)]
+    assert traps.duplicate_of("https://example.com/list?page=1", links) is None
+    # One link swapped out of forty: the same page in all but name
+    similar = links[:-1] + ["https://example.com/item/other"]
+    assert traps.duplicate_of("https://example.com/list?page=2", similar) == "https://example.com/list?page=1"
+    different = [f"https://example.com/post/{i}" for i in range(40)]
+    assert traps.duplicate_of("https://example.com/blog", different) is None
+    # Too few links to judge
+    assert traps.duplicate_of("https://example.com/tiny", links[:3]) is None
+
+
+def test_crawl_stops_at_the_pattern_cap():
+    site = rovercrawler.SyntheticSite(fanout=4, depth=3, page_size=1000, duplication=0, latency=0)
+    url = site.start()
+    try:
+        crawler = rovercrawler.RoverCrawler(max_pages=500, rate_limit=0, retries=0, trap_detect=True,
+                                            trap_pattern_cap=5)
+        tree = crawler.crawl(url)
+    finally:
+        site.stop()
+    # Every page but the root is /n/#, so only five of them are crawled
+    pages = [url for url in get_all_urls(tree) if '/n/' in url]
+    assert len(pages) == 5
+    assert crawler.traps.counts()['pattern_cap'] > 0